@@ -0,0 +1,47 @@
+"""章节解析吞吐量测试：对比线程内解析与不同进程数的解析池
+
+用法: python -m benchmarks.bench_parse_pool [章节数]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.parsing import parse_chapter_html
+from core.parse_pool import ParsePool
+
+FETCH_THREADS = 16
+
+def make_page(index: int) -> bytes:
+    """生成一个接近真实站点大小的章节页面"""
+    paragraphs = ''.join(
+        f'<p>&nbsp;&nbsp;&nbsp;&nbsp;第{index}章第{i}段，这是用于测试解析速度的正文内容。</p><br/>'
+        for i in range(120)
+    )
+    noise = ''.join(f'<li><a href="/book/1/{i}.html">链接{i}</a></li>' for i in range(200))
+    html = (f'<html><head><title>第{index}章</title></head><body><ul>{noise}</ul>'
+            f'<div id="chaptercontent">{paragraphs}请收藏本站：https://www.example.com</div>'
+            f'</body></html>')
+    return html.encode('utf-8')
+
+def run(pages, parser) -> float:
+    """用下载线程池模拟抓取，返回每秒处理的章节数"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=FETCH_THREADS) as executor:
+        list(executor.map(parser, pages))
+    return len(pages) / (time.perf_counter() - started)
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    pages = [make_page(i) for i in range(count)]
+    print(f"章节数: {count}, 下载线程: {FETCH_THREADS}, CPU核数: {os.cpu_count()}")
+    print(f"线程内解析: {run(pages, parse_chapter_html):.1f} 章/秒")
+    for workers in range(1, (os.cpu_count() or 1) + 1):
+        with ParsePool(workers) as pool:
+            pool.parse(pages[0])  # 预热子进程
+            print(f"解析进程 {workers}: {run(pages, pool.parse):.1f} 章/秒")
+
+if __name__ == '__main__':
+    main()
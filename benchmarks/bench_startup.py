@@ -0,0 +1,74 @@
+"""启动耗时测试：统计各入口模块的导入耗时（-X importtime），并检查是否加载了不需要的重型依赖
+
+用法: python -m benchmarks.bench_startup [--repeat N]
+超出耗时预算或提前加载了重型依赖时返回非零退出码
+"""
+import os
+import sys
+import argparse
+import subprocess
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口模块 -> 导入耗时预算（毫秒）
+STARTUP_BUDGET_MS = {
+    'cli': 30,
+    'main': 60,
+    'core.crawler': 80,
+    'core.downloader': 100,
+    'core.scheduler': 100,
+    'core.watchlist': 100,
+}
+
+# 只导入入口模块时不应真正加载的重型依赖
+HEAVY_MODULES = ('tkinter', 'requests', 'bs4', 'lxml')
+
+CHECK_LOADED = (
+    "import sys, importlib; importlib.import_module({module!r}); "
+    "print(','.join(m for m in {heavy!r} if m in sys.modules "
+    "and type(sys.modules[m]).__name__ != '_LazyModule'))"
+)
+
+def import_time(module: str) -> Tuple[float, List[Tuple[int, str]]]:
+    """返回导入耗时（毫秒）和自身耗时最多的模块"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    total = next((cumulative for _, cumulative, name in rows if name == module), 0)
+    top = sorted(((self_us, name) for self_us, _, name in rows if name != 'site'), reverse=True)
+    return total / 1000, top[:3]
+
+def loaded_heavy(module: str) -> List[str]:
+    code = CHECK_LOADED.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    return [m for m in result.stdout.strip().split(',') if m]
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3, help='每个模块测量次数，取最小值')
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in STARTUP_BUDGET_MS.items():
+        samples = [import_time(module) for _ in range(args.repeat)]
+        ms, top = min(samples, key=lambda s: s[0])
+        heavy = loaded_heavy(module)
+        ok = ms <= budget and not heavy
+        failed |= not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {module:<18} {ms:7.1f} ms（预算 {budget} ms）"
+              + (f" 提前加载: {', '.join(heavy)}" if heavy else ''))
+        for us, name in top:
+            print(f"       {us / 1000:7.1f} ms  {name}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""命令行下载入口（不依赖图形界面）
+
+标准输出为 JSON 行格式的进度事件，日志输出到标准错误和日志文件。
+
+用法:
+    python cli.py 书号或书名 [--start N] [--end N] [--format txt|epub] [--threads N] [--output-dir 目录]
+    python cli.py 书号 --resume       从断点继续
+    python cli.py 书号 --reprocess    从缓存重新生成
+    python cli.py 书号 --status       查看断点进度（不访问网络）
+
+退出码:
+    0 全部完成  1 有失败章节  2 参数错误  3 未找到书籍  4 下载出错  5 被中断（已保存断点，可继续）
+"""
+import sys
+import json
+import signal
+import argparse
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+# 将项目根目录添加到 Python 路径
+project_root = str(Path(__file__).parent)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config import NOVELS_DIR
+from utils.helpers import output_formats_arg
+
+EXIT_OK = 0
+EXIT_FAILED_CHAPTERS = 1
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+EXIT_ERROR = 4
+EXIT_INTERRUPTED = 5
+
+class JsonProgress:
+    """以 JSON 行的形式输出事件，每行一个事件"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = Lock()
+
+    def emit(self, event: str, **fields) -> None:
+        line = json.dumps({'event': event, **fields}, ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python cli.py', description='命令行下载小说')
+    parser.add_argument('book', help='书号，或用于搜索的书名关键字')
+    parser.add_argument('--start', type=int, default=1, help='起始章节（默认 1）')
+    parser.add_argument('--end', type=int, help='结束章节（默认到最新章节）')
+    parser.add_argument('--format', type=output_formats_arg, default='txt',
+                        help='输出格式，多种格式用逗号分隔（如 txt,epub）')
+    parser.add_argument('--threads', type=int, default=3, help='下载线程数')
+    parser.add_argument('--output-dir', default=NOVELS_DIR, help='下载目录')
+    parser.add_argument('--pick', type=int, default=1, help='按书名搜索时选择第几个结果')
+    parser.add_argument('--no-retry', action='store_true', help='不自动重试失败章节')
+    parser.add_argument('--parse-workers', type=int, default=0, help='解析进程数（0 表示不用进程池）')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--resume', action='store_true', help='从断点继续下载')
+    mode.add_argument('--reprocess', action='store_true', help='用缓存的原始页面重新生成，不访问网络')
+    mode.add_argument('--status', action='store_true', help='查看断点中的下载进度，不访问网络')
+    return parser
+
+def resolve_book(crawler, keyword: str, pick: int, progress: JsonProgress) -> Optional[Dict]:
+    """书号直接使用；书名按搜索结果选择"""
+    if keyword.isdigit():
+        return {'book_id': keyword}
+    results: List[Dict] = crawler.search_novel(keyword).get('results', [])
+    progress.emit('search', keyword=keyword, results=[
+        {'book_id': r.get('book_id'), 'title': r.get('title'), 'author': r.get('author')}
+        for r in results
+    ])
+    if not 1 <= pick <= len(results) or not results[pick - 1].get('book_id'):
+        return None
+    return results[pick - 1]
+
+def show_status(book_id: str, output_dir: str, progress: JsonProgress) -> int:
+    """输出断点记录的进度，只读取本地文件"""
+    from core.checkpoint import Checkpoint
+
+    checkpoint = Checkpoint.find(book_id, output_dir)
+    if not checkpoint:
+        progress.emit('status', book_id=book_id, found=False)
+        return EXIT_NOT_FOUND
+    data = checkpoint.to_dict()
+    progress.emit('status', book_id=book_id, found=True, title=checkpoint.novel_info.get('title'),
+                  save_dir=checkpoint.save_dir, start=data['start_chapter'], end=data['end_chapter'],
+                  done=len(data['completed']), paused=data['paused'])
+    return EXIT_OK
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.threads < 1 or args.start < 1 or (args.end is not None and args.end < args.start):
+        print("参数错误：线程数和章节范围必须为正数，且结束章节不小于起始章节", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.status:
+        return show_status(args.book, args.output_dir, JsonProgress())
+
+    from utils.helpers import setup_logging
+    from core.crawler import Crawler
+    from core.downloader import Downloader
+
+    setup_logging()
+    progress = JsonProgress()
+    crawler = Crawler(output_dir=args.output_dir)
+
+    book = resolve_book(crawler, args.book, args.pick, progress)
+    if not book:
+        progress.emit('finished', status='not_found', book=args.book)
+        return EXIT_NOT_FOUND
+    book_id = str(book['book_id'])
+
+    downloader = Downloader(crawler, args.output_dir, args.parse_workers)
+    downloader.auto_retry = not args.no_retry
+    downloader.progress_callback = lambda done, total: progress.emit(
+        'progress', book_id=book_id, done=done, total=total)
+
+    def interrupt(signum, frame):
+        progress.emit('interrupted', book_id=book_id, signal=signum)
+        downloader.pause()
+    signal.signal(signal.SIGINT, interrupt)
+    signal.signal(signal.SIGTERM, interrupt)
+
+    progress.emit('start', book_id=book_id, title=book.get('title'), start=args.start, end=args.end,
+                  format=args.format, threads=args.threads,
+                  mode='resume' if args.resume else 'reprocess' if args.reprocess else 'download')
+    try:
+        if args.resume:
+            ok = downloader.resume(book_id)
+        elif args.reprocess:
+            ok = downloader.reprocess_from_cache(book_id, args.start, args.end, args.threads, args.format)
+        else:
+            ok = downloader.start_download(book_id, args.start, args.end, args.threads, args.format)
+    except Exception as e:
+        progress.emit('finished', status='error', book_id=book_id, error=str(e))
+        return EXIT_ERROR
+
+    failed = [
+        {'index': c.get('index'), 'title': c.get('title'), 'error': c.get('error')}
+        for c in downloader.failed_chapters
+    ]
+    if downloader.is_paused:
+        status, code = 'interrupted', EXIT_INTERRUPTED
+    elif not ok:
+        status, code = 'error', EXIT_ERROR
+    elif failed:
+        status, code = 'partial', EXIT_FAILED_CHAPTERS
+    else:
+        status, code = 'ok', EXIT_OK
+    progress.emit('finished', status=status, book_id=book_id, save_dir=downloader.save_dir,
+                  done=downloader.download_count, total=downloader.total_chapters, failed=failed)
+    return code
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,6 +33,119 @@ HEADERS = {
     'Cache-Control': 'max-age=0'
 }
 
+# 下载目录
+NOVELS_DIR = 'novels'
+CHAPTER_INDEX_FILE = 'chapters.jsonl'  # 章节索引（按顺序每行一章，供输出格式使用）
+MERGED_INDEX_SUFFIX = '.idx.json'  # 合并TXT的章节偏移索引（与TXT同名，加此后缀）
+OUTPUT_FORMATS = ('txt', 'epub', 'txt.gz', 'txt.bz2', 'txt.xz', 'jsonl')  # 支持的输出格式，多种格式用逗号分隔同时生成
+OUTPUT_QUEUE_SIZE = 32  # 同时生成多种格式时每种格式最多缓冲的章节数
+
+# 压缩TXT输出配置（格式 txt.gz / txt.bz2 / txt.xz）
+COMPRESS_LEVEL = None  # 压缩级别，None 表示使用各算法的默认级别
+COMPRESS_CHUNK_SIZE = 1024 * 1024  # 每个独立压缩块的原始字节数，读取单章时只需解压所在的块
+
+# EPUB输出配置
+EPUB_VOLUME_CHAPTERS = 0  # 每卷最多章节数，0 表示不按章节数分卷
+EPUB_VOLUME_MB = 0  # 每卷最多的章节文本大小（MB），0 表示不按大小分卷
+EPUB_BUILD_WORKERS = 0  # 同时生成的卷数（进程数），0 表示按CPU核数
+EPUB_COMPRESSION = 'deflate'  # deflate 压缩 / store 不压缩（生成最快，文件较大）
+EPUB_COMPRESS_LEVEL = 6  # deflate 压缩级别 1-9，越小越快
+EPUB_RENDER_BATCH = 32  # 多进程渲染章节时每批的章节数
+
+# 断点续传配置
+CHECKPOINT_FILE = 'checkpoint.json'  # 断点文件名（位于小说保存目录）
+CHECKPOINT_SAVE_EVERY = 20  # 每完成多少章保存一次断点
+CHECKPOINT_SAVE_INTERVAL = 10  # 距上次保存超过多少秒也保存一次
+
+# 失败章节重试配置
+FAILED_CHAPTERS_FILE = 'failed_chapters.jsonl'  # 失败章节日志（每行一个JSON记录）
+RETRY_ROUNDS = 3  # 自动重试轮数
+RETRY_BACKOFF = {  # 各错误类型的初始等待秒数，之后每轮翻倍
+    'timeout': 0,     # 超时：立即重试
+    'parse': 0,       # 解析失败：立即用备用解析器重试
+    'throttled': 5,   # 被限流：指数退避
+    'http': 2,
+    'network': 1,
+    'empty': 1,
+    'unknown': 1,
+    'write': 1,
+    'placeholder': 5,  # 占位页：站点尚未更新，等待后重试
+    'duplicate': 2,
+    'truncated': 2,
+}
+RETRY_BACKOFF_MAX = 60  # 单次等待上限（秒）
+
+# 章节写入配置
+WRITER_QUEUE_SIZE = 64  # 待写入章节队列长度，队列满时下载线程等待
+WRITER_BATCH_SIZE = 16  # 每批最多写入的章节数
+WRITER_FSYNC = 'none'  # 落盘策略：none 不主动落盘 / file 每章落盘 / batch 每批落盘一次目录
+
+# 原始页面缓存（修改解析规则后可从缓存重新生成，无需重新下载）
+RAW_CACHE_ENABLED = True  # 是否缓存下载的原始页面
+RAW_CACHE_DIR = '.cache'  # 缓存目录，位于下载目录下
+RAW_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 缓存总大小上限，超出后淘汰最久未使用的页面
+RAW_CACHE_SAVE_EVERY = 100  # 每写入多少个页面保存一次缓存索引
+
+# 封面图片
+COVER_ENABLED = True  # 是否下载封面并嵌入EPUB
+COVER_CACHE_DIR = os.path.join(RAW_CACHE_DIR, 'covers')  # 封面缓存目录（位于下载目录下），按图片URL缓存
+COVER_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 封面缓存总大小上限，超出后淘汰最久未使用的图片
+COVER_FETCH_WORKERS = 8  # 同时下载的封面数
+COVER_TIMEOUT = 15  # 下载封面的超时时间（秒）
+COVER_PREFETCH = True  # 搜索后在后台预取当前页结果的封面
+COVER_MAX_WIDTH = 600  # 嵌入EPUB的封面最大宽度（像素），需要安装 Pillow，0 表示不缩放
+COVER_FILE = 'cover'  # 小说目录中封面文件的文件名（不含扩展名）
+
+# 多进程解析配置
+PARSE_WORKERS = 0  # 解析进程数，0 表示在下载线程中直接解析
+PARSE_CHUNK_SIZE = 8  # 每批发给解析进程的页面数
+PARSE_FLUSH_INTERVAL = 0.02  # 凑批最多等待的秒数
+
+# 章节内容检查
+PLACEHOLDER_SIGNATURES = [  # 占位页特征
+    '正在手打中',
+    '手打中，请稍后',
+    '章节内容正在更新',
+    '内容正在更新',
+    '请稍后刷新',
+    '本章节尚未更新',
+]
+PLACEHOLDER_MAX_LENGTH = 500  # 只有短于此长度且含特征文字的正文才视为占位页
+TRUNCATED_RATIO = 0.3  # 正文长度低于全书中位数的此比例视为被截断
+CONTENT_MIN_SAMPLES = 10  # 至少有这么多章节后才按中位数判断截断
+
+# 预读模式：读者位置之后保持下载的章节数
+READ_AHEAD_WINDOW = 20
+
+# 限速与调度配置
+HOST_RATE_LIMIT = 5  # 每个站点每秒最多请求数（所有书籍共享）
+SCHEDULER_MAX_CONCURRENCY = 8  # 队列下载时全局并发请求数上限
+SCHEDULER_MAX_ACTIVE_JOBS = 3  # 队列中同时进行的书籍数
+HTTP_POOL_SIZE = 16  # 每个站点保持的复用连接数
+
+# 常驻下载服务配置（python -m core.daemon）
+DAEMON_HOST = '127.0.0.1'  # 只监听本机
+DAEMON_PORT = 8766
+DAEMON_EVENT_QUEUE_SIZE = 256  # 每个事件流连接最多缓存的事件数，超出时丢弃旧事件
+DAEMON_HEARTBEAT = 15  # 事件流空闲时发送心跳的间隔（秒）
+
+# 追更配置
+WATCHLIST_FILE = os.path.join(NOVELS_DIR, 'watchlist.json')  # 追更列表
+WATCH_INTERVAL_INITIAL = 3600  # 新加入书籍的检查间隔（秒）
+WATCH_INTERVAL_MIN = 900  # 频繁更新的书最短检查间隔
+WATCH_INTERVAL_MAX = 24 * 3600  # 长期未更新的书最长检查间隔
+WATCH_BACKOFF = 1.5  # 每次未更新时间隔乘以该系数，更新时除以该系数
+WATCH_JITTER = 0.2  # 检查时间的随机抖动比例
+WATCH_WEIGHT = 0.5  # 追更检查在全局并发预算中的权重
+
+# 分布式下载配置（python -m core.distributed）
+DISTRIBUTED_HOST = '127.0.0.1'  # 协调进程监听地址，跨机器使用时改为 0.0.0.0
+DISTRIBUTED_PORT = 8765  # 协调进程监听端口
+LEASE_SIZE = 10  # 每个租约包含的章节数
+LEASE_TIMEOUT = 60  # 租约超时秒数，工作进程每提交一章都会续期
+LEASE_MAX_ATTEMPTS = 3  # 单章最多分配次数，超过后记为失败章节
+WORKER_THREADS = 3  # 每个工作进程的下载线程数
+
 # 调试配置
 DEBUG = True  # 是否保存调试信息
 DEBUG_DIR = 'debug'  # 调试文件保存目录
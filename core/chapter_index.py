@@ -0,0 +1,129 @@
+import os
+import json
+import logging
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+from core.chapter_table import Chapter
+from config import CHAPTER_INDEX_FILE
+from utils.helpers import atomic_write
+
+class IndexEntry(NamedTuple):
+    """章节索引中的一章"""
+    index: int
+    title: str
+    file: str  # 相对于小说目录的文件名
+    length: int  # 文件字节数
+    hash: Optional[str] = None  # 正文指纹（开启内容检查时记录）
+
+def chapter_hash(path: str) -> Optional[str]:
+    """从章节文件重新计算正文指纹，与下载时内容检查记录的指纹相同"""
+    # 输出模块依赖本模块，在函数内导入
+    from core.content_check import fingerprint
+    from outputs.base import split_chapter
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            _, text = split_chapter(f.read())
+    except (OSError, UnicodeDecodeError):
+        return None
+    return fingerprint(text)
+
+class ChapterIndex:
+    """有序的章节索引，保存在小说目录下的 chapters.jsonl 中
+
+    下载完成后由下载器生成，输出格式直接按索引的顺序读取章节文件，
+    不再扫描目录、解析文件名，目录中的其他文件也不会影响章节顺序。
+    """
+
+    def __init__(self, save_dir: str, entries: Optional[List[IndexEntry]] = None):
+        self.save_dir = save_dir
+        self.entries: List[IndexEntry] = entries or []
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.save_dir, CHAPTER_INDEX_FILE)
+
+    @classmethod
+    def build(cls, save_dir: str, chapters: Iterable[Chapter]) -> 'ChapterIndex':
+        """按章节表生成索引，只收录文件已存在的章节
+
+        与已有的索引合并：之前下载、不在本次范围内但文件仍在的章节保留在索引中。
+        章节没有记录指纹（如从断点恢复、本次没有重新下载）时沿用已有索引中的指纹，
+        没有可用的指纹时从章节文件重新计算
+        """
+        previous = cls.load(save_dir)
+        known = {entry.index: entry for entry in previous} if previous else {}
+        entries = {}
+        for entry in known.values():
+            try:
+                length = os.path.getsize(os.path.join(save_dir, entry.file))
+            except OSError:
+                continue
+            if length != entry.length:
+                entry = entry._replace(length=length, hash=None)
+            entries[entry.index] = entry
+
+        for chapter in chapters:
+            path = chapter.save_path
+            if not path:
+                continue
+            try:
+                length = os.path.getsize(path)
+            except OSError:
+                entries.pop(chapter.index, None)
+                continue
+            file = os.path.relpath(path, save_dir)
+            digest = chapter.hash
+            old = entries.get(chapter.index)
+            if digest is None and old and old.file == file and old.length == length:
+                digest = old.hash
+            entries[chapter.index] = IndexEntry(chapter.index, chapter.title, file, length, digest)
+
+        for index, entry in entries.items():
+            if entry.hash is None:
+                entries[index] = entry._replace(hash=chapter_hash(os.path.join(save_dir, entry.file)))
+        return cls(save_dir, sorted(entries.values(), key=lambda e: e.index))
+
+    @classmethod
+    def load(cls, save_dir: str) -> Optional['ChapterIndex']:
+        """读取索引，不存在或已损坏时返回 None"""
+        index = cls(save_dir)
+        if not os.path.exists(index.path):
+            return None
+        try:
+            with open(index.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        index.entries.append(IndexEntry(**{field: record.get(field)
+                                                           for field in IndexEntry._fields}))
+        except Exception as e:
+            logging.error(f"读取章节索引失败: {str(e)}")
+            return None
+        return index
+
+    def save(self) -> None:
+        lines = [json.dumps(entry._asdict(), ensure_ascii=False) for entry in self.entries]
+        atomic_write(self.path, '\n'.join(lines) + '\n')
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"删除章节索引失败: {str(e)}")
+
+    def select(self, start_index: Optional[int] = None,
+               end_index: Optional[int] = None) -> List[IndexEntry]:
+        """返回序号范围内的章节（索引已按序号排列）"""
+        if start_index is None or end_index is None:
+            return list(self.entries)
+        return [e for e in self.entries if start_index <= e.index <= end_index]
+
+    def file_path(self, entry: IndexEntry) -> str:
+        return os.path.join(self.save_dir, entry.file)
+
+    def __iter__(self) -> Iterator[IndexEntry]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,189 @@
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from utils.helpers import clean_filename
+
+class Chapter:
+    """章节记录
+
+    使用 __slots__ 节省内存，URL 和保存路径都拆成共享的目录前缀和文件名两部分。
+    同时支持原来字典式的访问（chapter['title']、chapter.get('error')），
+    值为 None 的字段视为不存在。
+    """
+
+    __slots__ = ('index', 'title', '_prefix', '_name', '_dir', '_stem', '_file',
+                 'error', 'error_detail', 'attempts', 'hash', 'length')
+
+    def __init__(self, title: str, url: str, prefix_pool: Optional[Dict[str, str]] = None):
+        self.index: Optional[int] = None
+        self.title = title
+        self._set_url(url, prefix_pool if prefix_pool is not None else {})
+        self._dir: Optional[str] = None
+        self._stem: Optional[str] = None  # 清理后的标题，多数情况下就是 title 本身
+        self._file: Optional[str] = None  # 直接指定的文件名（从失败记录等恢复时）
+        self.error: Optional[str] = None
+        self.error_detail: Optional[str] = None
+        self.attempts: Optional[int] = None
+        self.hash: Optional[str] = None
+        self.length: Optional[int] = None
+
+    def _set_url(self, url: str, prefix_pool: Dict[str, str]) -> None:
+        prefix, sep, name = url.rpartition('/')
+        prefix += sep
+        # 同一本书的章节URL前缀相同，只保存一份
+        self._prefix = prefix_pool.setdefault(prefix, sys.intern(prefix))
+        self._name = name
+
+    @property
+    def url(self) -> str:
+        return self._prefix + self._name
+
+    @url.setter
+    def url(self, value: str) -> None:
+        self._set_url(value, {})
+
+    @property
+    def save_path(self) -> Optional[str]:
+        if self._file is not None:
+            return self._dir + self._file
+        if self._stem is None:
+            return None
+        return f"{self._dir}{self.index:04d}-{self._stem}.txt"
+
+    @save_path.setter
+    def save_path(self, value: Optional[str]) -> None:
+        self._stem = None
+        if value is None:
+            self._dir = self._file = None
+            return
+        dir_name, file_name = os.path.split(value)
+        self._dir = os.path.join(dir_name, '') if dir_name else ''
+        self._file = file_name
+
+    def bind_path(self, dir_prefix: str, index: int) -> None:
+        """按序号和标题确定保存路径，dir_prefix 为整张表共享的目录前缀（以分隔符结尾）"""
+        self.index = index
+        self._dir = dir_prefix
+        # 文件名清理只做一次；标题不含非法字符时不会产生新的字符串
+        self._stem = clean_filename(self.title)
+        self._file = None
+
+    # 兼容字典式访问
+    def __getitem__(self, key: str):
+        value = getattr(self, key, None) if key in self.keys() else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self.keys():
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys() and getattr(self, key) is not None
+
+    def get(self, key: str, default=None):
+        if key not in self.keys():
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def pop(self, key: str, default=None):
+        value = self.get(key, default)
+        if key in self.keys():
+            setattr(self, key, None)
+        return value
+
+    @staticmethod
+    def keys() -> Tuple[str, ...]:
+        return ('index', 'title', 'url', 'save_path', 'error', 'error_detail',
+                'attempts', 'hash', 'length')
+
+    def to_dict(self) -> Dict:
+        return {key: self.get(key) for key in self.keys() if key in self}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Chapter':
+        if isinstance(data, Chapter):
+            return data
+        chapter = cls(data.get('title', ''), data.get('url', ''))
+        for key in chapter.keys():
+            if key not in ('title', 'url') and data.get(key) is not None:
+                setattr(chapter, key, data[key])
+        if chapter.index is None and chapter.save_path:
+            number = os.path.basename(chapter.save_path).split('-')[0]
+            chapter.index = int(number) if number.isdigit() else None
+        return chapter
+
+    def __repr__(self) -> str:
+        return f"Chapter({self.index}, {self.title!r})"
+
+class ChapterTable:
+    """整本书的章节表
+
+    章节记录按目录顺序排列，URL 前缀在整张表内共享；
+    保存路径由 bind 统一计算一次，供下载、重试和输出共同使用。
+    """
+
+    def __init__(self, chapters: Optional[List[Chapter]] = None,
+                 prefix_pool: Optional[Dict[str, str]] = None):
+        self.chapters: List[Chapter] = chapters if chapters is not None else []
+        self.prefix_pool: Dict[str, str] = prefix_pool if prefix_pool is not None else {}
+        self.save_dir: Optional[str] = None
+
+    def append(self, title: str, url: str) -> Chapter:
+        chapter = Chapter(title, url, self.prefix_pool)
+        self.chapters.append(chapter)
+        return chapter
+
+    @classmethod
+    def coerce(cls, chapters: Iterable[Union[Chapter, Dict]]) -> 'ChapterTable':
+        """把章节字典列表转换为章节表"""
+        if isinstance(chapters, ChapterTable):
+            return chapters
+        table = cls()
+        for item in chapters:
+            if isinstance(item, Chapter):
+                table.chapters.append(item)
+            else:
+                chapter = table.append(item['title'], item['url'])
+                for key in ('index', 'save_path'):
+                    if item.get(key) is not None:
+                        setattr(chapter, key, item[key])
+        return table
+
+    def bind(self, save_dir: str, start_index: int) -> None:
+        """为每个章节计算序号和保存路径（只计算一次）"""
+        if self.save_dir == save_dir and self.chapters and self.chapters[0].index == start_index:
+            return
+        dir_prefix = sys.intern(os.path.join(save_dir, ''))
+        for index, chapter in enumerate(self.chapters, start_index):
+            chapter.bind_path(dir_prefix, index)
+        self.save_dir = save_dir
+
+    def by_index(self, index: int) -> Optional[Chapter]:
+        """按章节序号查找"""
+        if not self.chapters or self.chapters[0].index is None:
+            return None
+        pos = index - self.chapters[0].index
+        if 0 <= pos < len(self.chapters) and self.chapters[pos].index == index:
+            return self.chapters[pos]
+        for chapter in self.chapters:
+            if chapter.index == index:
+                return chapter
+        return None
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    def __iter__(self) -> Iterator[Chapter]:
+        return iter(self.chapters)
+
+    def __bool__(self) -> bool:
+        return bool(self.chapters)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return ChapterTable(self.chapters[key], self.prefix_pool)
+        return self.chapters[key]
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import logging
+from threading import Lock
+from typing import Dict, Optional, Set
+from config import CHECKPOINT_FILE, CHECKPOINT_SAVE_EVERY, CHECKPOINT_SAVE_INTERVAL
+from utils.helpers import atomic_write
+
+class Checkpoint:
+    """下载断点信息，保存在小说目录下的 checkpoint.json 中"""
+
+    def __init__(self, save_dir: str, book_id: str, start_chapter: int = 1,
+                 end_chapter: Optional[int] = None, thread_num: int = 3,
+                 output_format: str = "txt", novel_info: Optional[Dict] = None,
+                 completed: Optional[Set[int]] = None):
+        self.save_dir = save_dir
+        self.book_id = str(book_id)
+        self.start_chapter = start_chapter
+        self.end_chapter = end_chapter
+        self.thread_num = thread_num
+        self.output_format = output_format
+        self.novel_info = novel_info or {}
+        self.completed: Set[int] = set(completed or ())
+        self.paused = False
+        self.lock = Lock()
+        self._unsaved = 0
+        self._last_save = time.time()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.save_dir, CHECKPOINT_FILE)
+
+    def is_done(self, chapter_index: int) -> bool:
+        """章节是否已在之前下载完成"""
+        with self.lock:
+            return chapter_index in self.completed
+
+    def mark_done(self, chapter_index: int) -> None:
+        """标记章节完成，达到阈值时自动落盘"""
+        with self.lock:
+            self.completed.add(chapter_index)
+            self._unsaved += 1
+            need_save = (self._unsaved >= CHECKPOINT_SAVE_EVERY or
+                         time.time() - self._last_save >= CHECKPOINT_SAVE_INTERVAL)
+        if need_save:
+            self.save()
+
+    def unmark(self, chapter_index: int) -> None:
+        """撤销章节完成标记（复查发现内容有问题时）"""
+        with self.lock:
+            self.completed.discard(chapter_index)
+            self._unsaved += 1
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                'book_id': self.book_id,
+                'start_chapter': self.start_chapter,
+                'end_chapter': self.end_chapter,
+                'thread_num': self.thread_num,
+                'output_format': self.output_format,
+                'novel_info': self.novel_info,
+                'completed': sorted(self.completed),
+                'paused': self.paused,
+                'updated': time.time(),
+            }
+
+    def save(self) -> None:
+        """原子写入断点文件"""
+        data = json.dumps(self.to_dict(), ensure_ascii=False)
+        try:
+            atomic_write(self.path, data, fsync=True)
+            with self.lock:
+                self._unsaved = 0
+                self._last_save = time.time()
+        except Exception as e:
+            logging.error(f"保存断点失败: {str(e)}")
+
+    def remove(self) -> None:
+        """任务完成后删除断点文件"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @classmethod
+    def load(cls, save_dir: str) -> Optional['Checkpoint']:
+        """从小说目录读取断点"""
+        path = os.path.join(save_dir, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            checkpoint = cls(
+                save_dir,
+                data['book_id'],
+                data.get('start_chapter', 1),
+                data.get('end_chapter'),
+                data.get('thread_num', 3),
+                data.get('output_format', 'txt'),
+                data.get('novel_info'),
+                set(data.get('completed', [])),
+            )
+            checkpoint.paused = data.get('paused', False)
+            return checkpoint
+        except Exception as e:
+            logging.error(f"读取断点文件 {path} 失败: {str(e)}")
+            return None
+
+    @classmethod
+    def find(cls, book_id: str, root: str) -> Optional['Checkpoint']:
+        """在下载根目录中查找指定书号的断点"""
+        if not os.path.isdir(root):
+            return None
+        for name in os.listdir(root):
+            save_dir = os.path.join(root, name)
+            if not os.path.exists(os.path.join(save_dir, CHECKPOINT_FILE)):
+                continue
+            checkpoint = cls.load(save_dir)
+            if checkpoint and checkpoint.book_id == str(book_id):
+                return checkpoint
+        return None
@@ -0,0 +1,103 @@
+import hashlib
+import re
+from statistics import median
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from core.errors import (ChapterFetchError, ERROR_PLACEHOLDER, ERROR_DUPLICATE,
+                         ERROR_TRUNCATED)
+from utils.helpers import get_chapter_number
+from config import (PLACEHOLDER_SIGNATURES, PLACEHOLDER_MAX_LENGTH, TRUNCATED_RATIO,
+                    CONTENT_MIN_SAMPLES)
+
+# 由内容检查产生的错误类型
+CONTENT_ERRORS = (ERROR_PLACEHOLDER, ERROR_DUPLICATE, ERROR_TRUNCATED)
+
+_WHITESPACE = re.compile(r'\s+')
+
+def fingerprint(content: str) -> str:
+    """计算正文指纹（忽略空白差异）"""
+    normalized = _WHITESPACE.sub('', content)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+class ContentChecker:
+    """章节内容检查：识别占位页、与相邻章节重复的正文和被截断的正文
+
+    每本书一个实例，记录已接受章节的指纹和长度。
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.hashes: Dict[int, str] = {}
+        self.lengths: Dict[int, int] = {}
+        self.flagged: Dict[int, Tuple[str, str]] = {}  # 序号 -> (错误类型, 指纹)
+
+    def median_length(self) -> Optional[float]:
+        """已接受章节的正文长度中位数，样本不足时返回 None"""
+        if len(self.lengths) < CONTENT_MIN_SAMPLES:
+            return None
+        return median(self.lengths.values())
+
+    def validate(self, chapter: Dict, content: str) -> None:
+        """供 Crawler.download_chapter 使用，检查不通过时抛出 ChapterFetchError"""
+        index = chapter.get('index') or get_chapter_number(chapter.get('save_path', '')) or 0
+        kind = self.check(index, content)
+        chapter['hash'] = self.hashes.get(index)
+        if kind:
+            raise ChapterFetchError(kind, "正文检查未通过")
+
+    def check(self, index: int, content: str) -> Optional[str]:
+        """检查单章正文，通过时记录指纹并返回 None，否则返回错误类型"""
+        digest = fingerprint(content)
+        length = len(content)
+        with self.lock:
+            kind = self._classify(index, digest, content)
+            # 重新下载得到完全相同的短章节或重复章节，说明站点本身如此，予以接受
+            stable = kind in (ERROR_DUPLICATE, ERROR_TRUNCATED) and \
+                self.flagged.get(index) == (kind, digest)
+            if stable:
+                kind = None
+            if kind:
+                self.flagged[index] = (kind, digest)
+                return kind
+            if not stable:
+                self.flagged.pop(index, None)
+            self.hashes[index] = digest
+            self.lengths[index] = length
+            return None
+
+    def _classify(self, index: int, digest: str, content: str) -> Optional[str]:
+        if len(content) <= PLACEHOLDER_MAX_LENGTH and \
+                any(signature in content for signature in PLACEHOLDER_SIGNATURES):
+            return ERROR_PLACEHOLDER
+        if digest in (self.hashes.get(index - 1), self.hashes.get(index + 1)):
+            return ERROR_DUPLICATE
+        mid = self.median_length()
+        if mid and len(content) < mid * TRUNCATED_RATIO:
+            return ERROR_TRUNCATED
+        return None
+
+    def recheck(self, chapters: List[Dict]) -> List[Dict]:
+        """全部下载后按最终的中位数和相邻指纹复查，返回新发现的问题章节"""
+        flagged = []
+        with self.lock:
+            mid = self.median_length()
+            for chapter in chapters:
+                index = chapter.get('index')
+                digest = self.hashes.get(index)
+                if digest is None:
+                    continue
+                kind = None
+                # 重复时标记序号较大的一章（通常是站点返回了上一章的正文）
+                if digest == self.hashes.get(index - 1):
+                    kind = ERROR_DUPLICATE
+                elif mid and self.lengths[index] < mid * TRUNCATED_RATIO:
+                    kind = ERROR_TRUNCATED
+                # 已确认过的稳定内容不再标记
+                if kind and self.flagged.get(index, (None, None))[1] != digest:
+                    self.flagged[index] = (kind, digest)
+                    del self.hashes[index]
+                    del self.lengths[index]
+                    chapter['error'] = kind
+                    chapter['error_detail'] = "正文复查未通过"
+                    flagged.append(chapter)
+        return flagged
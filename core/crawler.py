@@ -1,27 +1,70 @@
-import requests
 import logging
-import re
 import time
 import random
-from bs4 import BeautifulSoup
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Union
 from threading import Lock
-from config import BASE_URL, USER_AGENTS
-from utils.helpers import clean_filename
+from config import (NOVELS_DIR, BASE_URL, USER_AGENTS, HOST_RATE_LIMIT, HTTP_POOL_SIZE, RAW_CACHE_ENABLED,
+                    RAW_CACHE_DIR, COVER_ENABLED, COVER_CACHE_DIR, COVER_CACHE_MAX_BYTES, COVER_FETCH_WORKERS,
+                    COVER_TIMEOUT, COVER_PREFETCH)
+from core.rate_limiter import RateLimiter
+from core.raw_cache import RawCache
+from core.chapter_table import ChapterTable
+from core.errors import (ChapterFetchError, ERROR_TIMEOUT, ERROR_THROTTLED, ERROR_HTTP,
+                         ERROR_NETWORK, ERROR_EMPTY, ERROR_PARSE, ERROR_PLACEHOLDER,
+                         ERROR_DUPLICATE, ERROR_TRUNCATED, ERROR_WRITE, ERROR_UNKNOWN)
+from core.parsing import parse_chapter_html
+from utils.helpers import clean_filename, atomic_write, lazy_import, image_type
 import os
 from urllib.parse import urlencode
-from urllib.parse import quote
+from urllib.parse import quote, urljoin
 from threading import Thread
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# 网络和HTML解析库较重，第一次使用时才加载
+requests = lazy_import('requests')
+bs4 = lazy_import('bs4')
+
 class Crawler:
-    def __init__(self, gui=None):
+    def __init__(self, gui=None, output_dir: str = NOVELS_DIR, cache: bool = RAW_CACHE_ENABLED):
+        """output_dir 为下载目录，页面和封面缓存保存在其中；cache 为 False 时不缓存原始页面"""
         self.base_url = BASE_URL
         self.gui = gui
         self.log_lock = Lock()
         self.ua_index = 0
         self.status_cache = {}  # 添加状态缓存
         self.cache_lock = Lock()  # 缓存锁
+        self.rate_limiter = RateLimiter(HOST_RATE_LIMIT)  # 按站点限速，多本书共享
+        self._session = None
+        self.session_lock = Lock()
+        self.raw_cache: Optional[RawCache] = RawCache(os.path.join(output_dir, RAW_CACHE_DIR)) if cache else None
+        # 封面单独缓存，不占用原始页面缓存的空间
+        self.cover_cache: Optional[RawCache] = \
+            RawCache(os.path.join(output_dir, COVER_CACHE_DIR), COVER_CACHE_MAX_BYTES) if COVER_ENABLED else None
+        self.offline = False  # 离线模式：只从缓存读取页面，不访问网络
+
+    def offline_copy(self) -> 'Crawler':
+        """离线模式的副本：共用日志和缓存，只从缓存读取页面
+
+        离线状态只属于副本，共用原对象的其他下载任务（队列、追更）照常访问网络
+        """
+        crawler = Crawler(self.gui, cache=False)
+        crawler.raw_cache = self.raw_cache
+        crawler.cover_cache = self.cover_cache
+        crawler.offline = True
+        return crawler
+
+    @property
+    def session(self) -> 'requests.Session':
+        """复用连接，避免每个请求重新建立 TCP/TLS 连接（第一次请求时创建）"""
+        if self._session is None:
+            with self.session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
 
     def get_headers(self) -> Dict[str, str]:
         """获取随机UA"""
@@ -31,6 +74,65 @@ class Crawler:
             'Referer': self.base_url
         }
 
+    def _get(self, url: str, timeout: int = 10, cache: bool = False) -> 'requests.Response':
+        """发送限速后的GET请求
+
+        cache 为 True 时成功的应答会保存到原始页面缓存；离线模式下直接从缓存构造应答
+        """
+        if self.offline:
+            data = self.raw_cache.get(url) if self.raw_cache else None
+            if data is None:
+                raise requests.ConnectionError(f"离线模式下缓存中没有该页面: {url}")
+            response = requests.Response()
+            response._content = data
+            response.status_code = 200
+            response.url = url
+            return response
+
+        self.rate_limiter.wait(url)
+        response = self.session.get(url, headers=self.get_headers(), timeout=timeout)
+        if cache and self.raw_cache and response.status_code == 200:
+            try:
+                self.raw_cache.put(url, response.content)
+            except Exception as e:
+                logging.error(f"缓存页面失败: {str(e)}")
+        return response
+
+    def get_cover(self, url: str) -> Optional[bytes]:
+        """下载封面图片，按URL缓存在磁盘上，再次使用时不重新下载
+
+        下载失败或返回的不是图片时返回 None
+        """
+        if not url or self.cover_cache is None:
+            return None
+        url = urljoin(self.base_url, url)
+        data = self.cover_cache.get(url)
+        if data is not None:
+            return data
+        try:
+            response = self._get(url, timeout=COVER_TIMEOUT)
+        except Exception as e:
+            logging.warning(f"下载封面失败: {url} {str(e)}")
+            return None
+        if response.status_code != 200 or not image_type(response.content):
+            logging.warning(f"封面地址没有返回图片: {url} (HTTP {response.status_code})")
+            return None
+        try:
+            self.cover_cache.put(url, response.content)
+        except Exception as e:
+            logging.error(f"缓存封面失败: {str(e)}")
+        return response.content
+
+    def get_covers(self, urls: List[str]) -> Dict[str, bytes]:
+        """并发下载多张封面，返回 URL -> 图片，失败的不包含在结果中"""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls or self.cover_cache is None:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(COVER_FETCH_WORKERS, len(urls))) as executor:
+            covers = dict(zip(urls, executor.map(self.get_cover, urls)))
+        self.cover_cache.flush()
+        return {url: data for url, data in covers.items() if data is not None}
+
     def log(self, message: str) -> None:
         """线程安全的日志输出"""
         with self.log_lock:
@@ -46,11 +148,7 @@ class Crawler:
             # 增加超时时间，添加重试逻辑
             for retry in range(3):
                 try:
-                    response = requests.get(
-                        url, 
-                        headers=self.get_headers(), 
-                        timeout=30
-                    )
+                    response = self._get(url, timeout=30, cache=True)
                     response.encoding = 'utf-8'
                     break
                 except requests.Timeout:
@@ -60,7 +158,7 @@ class Crawler:
                     time.sleep(2)  # 重试前等待
                     continue
                 
-            soup = BeautifulSoup(response.text, 'lxml')
+            soup = bs4.BeautifulSoup(response.text, 'lxml')
 
             info = {}
             
@@ -97,6 +195,11 @@ class Crawler:
             if intro:
                 info['intro'] = intro.text.strip()
 
+            # 获取封面
+            cover = soup.select_one('div.cover img, #fmimg img')
+            if cover and cover.get('src'):
+                info['cover'] = urljoin(url, cover['src'])
+
             # 获取最新章节
             latest_chapter = soup.find('div', class_='newest')
             if latest_chapter and latest_chapter.find('a'):
@@ -125,93 +228,124 @@ class Crawler:
             self.log(f"\n获取小说信息失败: {str(e)}")
             return {}
 
-    def get_chapter_list(self, book_id: str) -> List[Dict]:
+    def get_chapter_list(self, book_id: str) -> ChapterTable:
         """获取小说章节列表"""
         url = f'{self.base_url}/book/{book_id}/'
         try:
-            response = requests.get(url, headers=self.get_headers(), timeout=10)
+            response = self._get(url, timeout=10, cache=True)
             response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'lxml')
+            soup = bs4.BeautifulSoup(response.text, 'lxml')
 
             chapter_container = soup.find('div', class_='listmain')
             if not chapter_container:
                 self.log("找不到章节列表容器")
-                return []
+                return ChapterTable()
 
-            chapters = []
+            chapters = ChapterTable()
             for dd in chapter_container.find_all('dd'):
                 a_tag = dd.find('a')
                 if a_tag and not 'javascript:' in a_tag.get('href', ''):  # 过滤掉展开按钮
-                    chapters.append({
-                        'title': a_tag.text.strip(),
-                        'url': a_tag['href']
-                    })
+                    chapters.append(a_tag.text.strip(), a_tag['href'])
 
             return chapters
 
         except Exception as e:
             self.log(f"获取章节列表失败: {str(e)}")
-            return []
+            return ChapterTable()
+
+    def fetch_chapter_raw(self, url: str) -> bytes:
+        """获取章节页面的原始字节，失败时抛出带错误类型的 ChapterFetchError"""
+        try:
+            response = self._get(url, timeout=10, cache=True)
+        except requests.Timeout as e:
+            raise ChapterFetchError(ERROR_TIMEOUT, str(e))
+        except requests.RequestException as e:
+            raise ChapterFetchError(ERROR_NETWORK, str(e))
+
+        if response.status_code in (429, 503):
+            raise ChapterFetchError(ERROR_THROTTLED, f"HTTP {response.status_code}", response.status_code)
+        if response.status_code >= 400:
+            raise ChapterFetchError(ERROR_HTTP, f"HTTP {response.status_code}", response.status_code)
+        return response.content
+
+    def fetch_chapter_content(self, url: str, alternate: bool = False,
+                              parser: Optional[Callable[[bytes, bool], str]] = None) -> str:
+        """获取章节内容，失败时抛出带错误类型的 ChapterFetchError
+
+        parser 用于替换默认的解析函数（如交给进程池解析）
+        """
+        html = self.fetch_chapter_raw(url)
+        return (parser or self.parse_chapter_html)(html, alternate)
+
+    def parse_chapter_html(self, html: Union[str, bytes], alternate: bool = False) -> str:
+        """从章节页面中提取并清理正文，alternate 为 True 时使用备用解析器和选择器"""
+        return parse_chapter_html(html, alternate)
 
     def get_chapter_content(self, url: str) -> Optional[str]:
         """获取章节内容"""
         try:
-            response = requests.get(url, headers=self.get_headers(), timeout=10)
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'lxml')
-
-            content_div = soup.find('div', id='chaptercontent')
-            if not content_div:
-                return None
-
-            # 移除不需要的元素
-            for elem in content_div.find_all(['p', 'div'], class_='readinline'):
-                elem.decompose()
-
-            # 理内容
-            content = content_div.get_text('\n', strip=True)
-            content = re.sub(r'(www|http:|https:).+?com', '', content)
-            content = re.sub(r'笔趣阁.*?最新章节！', '', content)
-            content = re.sub(r'手机用户请访问.*?阅读！', '', content)
-            content = re.sub(r'请收藏本站.*', '', content)
-            content = re.sub(r'『点此报错』', '', content)
-            content = re.sub(r'『加入书签』', '', content)
-            content = re.sub(r'\s*<br\s*/?>\s*', '\n', content)
-            content = re.sub(r'^\s+|\s+$', '', content, flags=re.MULTILINE)
-
-            return content if content.strip() else None
-
+            return self.fetch_chapter_content(url)
         except Exception as e:
             self.log(f"获取章节内容失败: {str(e)}")
             return None
 
-    def download_chapter(self, chapter: Dict, save_path: str) -> bool:
-        """下载单个章节"""
+    @staticmethod
+    def format_chapter(title: str, content: str) -> str:
+        """生成章节文件的文本"""
+        return (
+            f"{title}\n"
+            f"{'='*40}\n\n"
+            f"{content}\n\n"
+            f"{'='*40}\n"
+        )
+
+    def fetch_chapter(self, chapter: Dict, alternate: bool = False,
+                      validator: Optional[Callable[[Dict, str], None]] = None,
+                      parser: Optional[Callable[[bytes, bool], str]] = None) -> Optional[str]:
+        """获取单个章节并生成章节文本（不写文件），失败时在 chapter['error'] 中记录错误类型
+
+        validator 用于检查正文，发现问题时抛出 ChapterFetchError；parser 用于替换默认的解析函数
+        """
         if not chapter.get('title') or not chapter.get('url'):
-            return False
+            chapter['error'] = ERROR_PARSE
+            return None
 
         try:
-            time.sleep(random.uniform(0.5, 1))
+            if not self.offline:
+                time.sleep(random.uniform(0.5, 1))
             url = f'{self.base_url}{chapter["url"]}'
-            content = self.get_chapter_content(url)
-            
-            if not content:
-                return False
-
-            chapter_text = (
-                f"{chapter['title']}\n"
-                f"{'='*40}\n\n"
-                f"{content}\n\n"
-                f"{'='*40}\n"
-            )
-
-            with open(save_path, 'w', encoding='utf-8') as f:
-                f.write(chapter_text)
+            content = self.fetch_chapter_content(url, alternate, parser)
+            if validator:
+                validator(chapter, content)
+
+            chapter.pop('error', None)
+            chapter.pop('error_detail', None)
+            return self.format_chapter(chapter['title'], content)
+
+        except ChapterFetchError as e:
+            chapter['error'] = e.kind
+            chapter['error_detail'] = str(e)
+            self.log(f"获取章节内容失败: {chapter['title']} [{e.kind}] {str(e)}")
+            return None
+        except Exception as e:
+            chapter['error'] = ERROR_UNKNOWN
+            chapter['error_detail'] = str(e)
+            self.log(f"下载章节失败: {str(e)}")
+            return None
 
+    def download_chapter(self, chapter: Dict, save_path: str, alternate: bool = False,
+                         validator: Optional[Callable[[Dict, str], None]] = None) -> bool:
+        """下载单个章节并原子写入文件"""
+        chapter_text = self.fetch_chapter(chapter, alternate, validator)
+        if chapter_text is None:
+            return False
+        try:
+            atomic_write(save_path, chapter_text)
             return True
-
         except Exception as e:
-            self.log(f"下载章节失败: {str(e)}")
+            chapter['error'] = ERROR_WRITE
+            chapter['error_detail'] = str(e)
+            self.log(f"写入章节失败: {str(e)}")
             return False
 
     def search_by_id(self, book_id: str) -> Optional[Dict]:
@@ -230,7 +364,8 @@ class Crawler:
                 'author': novel_info.get('author', '未知'),
                 'book_id': book_id,
                 'latest_chapter': novel_info.get('intro', '')[:50] + '...',
-                'url': f'/book/{book_id}/'
+                'url': f'/book/{book_id}/',
+                'cover': novel_info.get('cover', '')
             }
             
             self.log(f"找到小说：{result['title']}")
@@ -323,6 +458,11 @@ class Crawler:
                 page_novels = novels[start_idx:end_idx]
                 
                 self.log(f"第{page}页: 显示{len(page_novels)}/{total}本相关小说")
+
+                if COVER_PREFETCH:
+                    # 后台预取本页封面，不阻塞搜索结果的返回
+                    Thread(target=self.get_covers, args=([novel.get('cover') for novel in page_novels],),
+                           daemon=True).start()
                 
                 return {
                     'total': total,
@@ -354,9 +494,9 @@ class Crawler:
         """获取小说详细信息"""
         try:
             url = f'{self.base_url}/book/{book_id}/'
-            response = requests.get(url, headers=self.get_headers(), timeout=30)
+            response = self._get(url, timeout=30)
             response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'lxml')
+            soup = bs4.BeautifulSoup(response.text, 'lxml')
 
             info = {}
             
@@ -426,7 +566,7 @@ class Crawler:
         """解析搜索页面的HTML内容"""
         try:
             self.log("开始解析搜索页面HTML")
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = bs4.BeautifulSoup(html_content, 'html.parser')
             
             # 查找搜索结果容器
             type_show = soup.find('div', class_='type_show')
@@ -538,7 +678,7 @@ class Crawler:
             response = self.make_request(search_url)
             response.encoding = 'utf-8'
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = bs4.BeautifulSoup(response.text, 'html.parser')
             results = self.parse_search_results(soup)
             
             if not results:
@@ -551,7 +691,7 @@ class Crawler:
             self.logger.error(f'搜索过程发生错误: {str(e)}')
             return None
 
-    def _get_book_status(self, session: requests.Session, book: Dict) -> Optional[Dict]:
+    def _get_book_status(self, session: 'requests.Session', book: Dict) -> Optional[Dict]:
         """获取单本书的状态信息(带缓存)"""
         book_id = book['url_list'].split('/')[-2]
         
@@ -577,7 +717,7 @@ class Crawler:
             book_url = self.base_url + book['url_list']
             book_response = session.get(book_url, timeout=10)
             book_response.encoding = 'utf-8'
-            book_soup = BeautifulSoup(book_response.text, 'lxml')
+            book_soup = bs4.BeautifulSoup(book_response.text, 'lxml')
             
             status = '连载中'
             small_info = book_soup.find('div', class_='small')
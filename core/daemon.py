@@ -0,0 +1,262 @@
+"""常驻下载服务：一个进程持有同一套 Crawler 和下载队列，通过本地 HTTP 接口管理作业
+
+连接、状态缓存、站点限速等状态在作业之间共享，提交作业不必每次启动新进程。
+
+接口（JSON）:
+    GET  /health                  服务状态
+    GET  /jobs                    作业列表
+    POST /jobs                    提交作业 {"book_id", "start", "end", "format", "priority", "weight", "threads"}
+    GET  /jobs/<id>               作业详情
+    POST /jobs/<id>/pause         暂停（保存断点）
+    POST /jobs/<id>/resume        继续
+    POST /jobs/<id>/cancel        取消
+    GET  /events[?job=<id>]       进度事件流（JSON 行，连接保持到客户端断开）
+
+用法:
+    python -m core.daemon [--host H] [--port P] [--output-dir 目录]
+"""
+import json
+import signal
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue, Empty, Full
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from core.crawler import Crawler
+from core.scheduler import DownloadScheduler, DownloadJob
+from utils.helpers import output_formats_arg
+from config import NOVELS_DIR, DAEMON_HOST, DAEMON_PORT, DAEMON_EVENT_QUEUE_SIZE, DAEMON_HEARTBEAT
+
+class EventHub:
+    """把作业进度广播给所有订阅者，订阅者处理不过来时丢弃旧事件"""
+
+    def __init__(self, queue_size: int = DAEMON_EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.lock = Lock()
+        self.subscribers: List[Queue] = []
+
+    def subscribe(self) -> Queue:
+        queue: Queue = Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: Queue) -> None:
+        with self.lock:
+            if queue in self.subscribers:
+                self.subscribers.remove(queue)
+
+    def publish(self, event: Dict) -> None:
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for queue in subscribers:
+            while True:
+                try:
+                    queue.put_nowait(event)
+                    break
+                except Full:
+                    try:
+                        queue.get_nowait()
+                    except Empty:
+                        pass
+
+class DownloadDaemon:
+    """常驻服务：共享一个 Crawler 和一个下载队列"""
+
+    def __init__(self, host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                 output_dir: str = NOVELS_DIR, crawler: Optional[Crawler] = None):
+        self.crawler = crawler or Crawler(output_dir=output_dir)
+        self.events = EventHub()
+        self.scheduler = DownloadScheduler(self.crawler, output_dir=output_dir,
+                                           on_progress=self._on_progress)
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.owner = self
+        self.stopped = Event()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.server.server_address[:2]
+
+    def serve_forever(self) -> None:
+        self.scheduler.start()
+        self.crawler.log(f"下载服务已启动: http://{self.address[0]}:{self.address[1]}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def shutdown(self) -> None:
+        """停止服务：进行中的作业暂停并保存断点"""
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        self.scheduler.shutdown(wait=True)
+        self.server.shutdown()
+
+    def _on_progress(self, job: DownloadJob) -> None:
+        self.events.publish({'event': 'job', **job.to_dict()})
+
+    # 以下方法由请求处理器调用，返回 (状态码, 应答)
+    def submit(self, data: Dict) -> Tuple[int, Dict]:
+        book_id = str(data.get('book_id', ''))
+        if not book_id.isdigit():
+            return 400, {'error': '书号必须为纯数字'}
+        try:
+            # 与命令行相同的格式校验，避免下载完成后才发现格式无效
+            output_format = output_formats_arg(str(data.get('format', 'txt')))
+        except argparse.ArgumentTypeError as e:
+            return 400, {'error': str(e)}
+        try:
+            job = self.scheduler.submit(
+                book_id,
+                int(data.get('start', 1)),
+                int(data['end']) if data.get('end') is not None else None,
+                output_format,
+                int(data.get('priority', 0)),
+                float(data.get('weight', 1)),
+                int(data['threads']) if data.get('threads') else None,
+            )
+        except (TypeError, ValueError) as e:
+            return 400, {'error': f"参数错误: {str(e)}"}
+        return 201, job.to_dict()
+
+    def get_job(self, job_id: str) -> Tuple[int, Dict]:
+        job = self.scheduler.jobs.get(job_id)
+        if not job:
+            return 404, {'error': f"作业不存在: {job_id}"}
+        return 200, job.to_dict()
+
+    def control(self, job_id: str, action: str) -> Tuple[int, Dict]:
+        if job_id not in self.scheduler.jobs:
+            return 404, {'error': f"作业不存在: {job_id}"}
+        actions = {
+            'pause': ('暂停', self.scheduler.pause),
+            'resume': ('继续', self.scheduler.resume),
+            'cancel': ('取消', self.scheduler.cancel),
+        }
+        if action not in actions:
+            return 404, {'error': f"未知操作: {action}"}
+        name, handler = actions[action]
+        if not handler(job_id):
+            return 409, {'error': f"作业当前状态不能{name}", **self.scheduler.jobs[job_id].to_dict()}
+        return 200, self.scheduler.jobs[job_id].to_dict()
+
+    def health(self) -> Tuple[int, Dict]:
+        jobs = self.scheduler.list_jobs()
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return 200, {'ok': True, 'jobs': counts}
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP 请求处理"""
+
+    server_version = 'NovelDownloader'
+
+    @property
+    def daemon(self) -> DownloadDaemon:
+        return self.server.owner
+
+    def log_message(self, format: str, *args) -> None:
+        logging.info(f"{self.address_string()} {format % args}")
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        if parts == ['health']:
+            self._send(*self.daemon.health())
+        elif parts == ['jobs']:
+            self._send(200, {'jobs': [job.to_dict() for job in self.daemon.scheduler.list_jobs()]})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            self._send(*self.daemon.get_job(parts[1]))
+        elif parts == ['events']:
+            self._stream_events(parse_qs(url.query).get('job', [None])[0])
+        else:
+            self._send(404, {'error': '接口不存在'})
+
+    def do_POST(self) -> None:
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        if parts == ['jobs']:
+            data = self._read_json()
+            if data is None:
+                self._send(400, {'error': '请求体必须是 JSON 对象'})
+            else:
+                self._send(*self.daemon.submit(data))
+        elif len(parts) == 3 and parts[0] == 'jobs':
+            self._send(*self.daemon.control(parts[1], parts[2]))
+        else:
+            self._send(404, {'error': '接口不存在'})
+
+    def _read_json(self) -> Optional[Dict]:
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _send(self, status: int, body: Dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream_events(self, job_id: Optional[str]) -> None:
+        """按 JSON 行持续推送进度事件，空闲时发送心跳以便发现断开的连接"""
+        queue = self.daemon.events.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            # 先推送当前状态，客户端不必再单独查询
+            for job in self.daemon.scheduler.list_jobs():
+                if job_id in (None, job.job_id):
+                    self._write_event({'event': 'job', **job.to_dict()})
+            while not self.daemon.stopped.is_set():
+                try:
+                    event = queue.get(timeout=DAEMON_HEARTBEAT)
+                except Empty:
+                    self._write_event({'event': 'heartbeat'})
+                    continue
+                if job_id in (None, event.get('job_id')):
+                    self._write_event(event)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.daemon.events.unsubscribe(queue)
+            self.close_connection = True
+
+    def _write_event(self, event: Dict) -> None:
+        self.wfile.write(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from utils.helpers import setup_logging
+
+    parser = argparse.ArgumentParser(prog='python -m core.daemon', description='常驻下载服务')
+    parser.add_argument('--host', default=DAEMON_HOST)
+    parser.add_argument('--port', type=int, default=DAEMON_PORT)
+    parser.add_argument('--output-dir', default=NOVELS_DIR)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    daemon = DownloadDaemon(args.host, args.port, args.output_dir)
+
+    def stop(signum, frame):
+        logging.info("收到停止信号，正在暂停作业并保存断点...")
+        # serve_forever 在主线程中运行，shutdown 需要在其他线程调用
+        Thread(target=daemon.shutdown, daemon=True).start()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    daemon.serve_forever()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,429 @@
+"""分布式下载：协调进程把一本书的章节按租约分给多个工作进程
+
+协议为 TCP 上的 JSON 行，每个请求一行、每个应答一行：
+    {"op": "lease", "worker": ID}                -> {"lease_id", "ttl", "chapters"} / {"wait": 秒} / {"done": true}
+    {"op": "result", "lease_id", "index", "content"}          提交正文（同时为租约续期）
+    {"op": "result", "lease_id", "index", "error", "error_detail"}
+    {"op": "complete", "lease_id"}               归还租约，未提交的章节重新排队
+
+用法:
+    python -m core.distributed coordinator 书号 [--start N] [--end N] [--format txt|epub]
+    python -m core.distributed worker [--host H] [--port P] [--threads N]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import socketserver
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Deque, Dict, List, Optional, Set, Union
+from core.crawler import Crawler, ChapterFetchError, ERROR_PARSE, ERROR_UNKNOWN, ERROR_WRITE
+from core.chapter_table import Chapter
+from core.downloader import Downloader
+from core.writer import ChapterWriter
+from utils.helpers import output_formats_arg
+from config import (NOVELS_DIR, DISTRIBUTED_HOST, DISTRIBUTED_PORT, LEASE_SIZE, LEASE_TIMEOUT,
+                    LEASE_MAX_ATTEMPTS, WORKER_THREADS, RETRY_BACKOFF, RETRY_BACKOFF_MAX)
+
+POLL_INTERVAL = 1  # 暂无可分配章节时工作进程的等待秒数
+
+class Lease:
+    """分配给某个工作进程的一批章节"""
+
+    def __init__(self, lease_id: str, worker: str, indices: List[int], ttl: float):
+        self.lease_id = lease_id
+        self.worker = worker
+        self.indices = indices
+        self.ttl = ttl
+        self.deadline = time.time() + ttl
+
+    def renew(self) -> None:
+        self.deadline = time.time() + self.ttl
+
+    @property
+    def expired(self) -> bool:
+        return time.time() > self.deadline
+
+class _Handler(socketserver.StreamRequestHandler):
+    """每个连接逐行读取请求并应答"""
+
+    def handle(self) -> None:
+        coordinator = self.server.coordinator
+        lease_ids = set()
+        try:
+            for line in self.rfile:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    reply = coordinator.handle(json.loads(line))
+                except Exception as e:
+                    logging.error(f"处理工作进程请求失败: {str(e)}")
+                    reply = {'error': str(e)}
+                if 'lease_id' in reply:
+                    lease_ids.add(reply['lease_id'])
+                self.wfile.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+        except OSError:
+            pass
+        finally:
+            # 连接断开（工作进程退出）时立即回收其租约，不必等到超时
+            for lease_id in lease_ids:
+                coordinator.handle({'op': 'complete', 'lease_id': lease_id})
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class Coordinator(Downloader):
+    """协调进程
+
+    沿用 Downloader 的完整流程（断点、内容检查、失败重试、格式转换），
+    只是章节不在本进程下载，而是按租约分给工作进程；结果由本进程统一检查并写入。
+    租约超时（工作进程退出或失联）后，其中未完成的章节重新分配。
+    """
+
+    def __init__(self, crawler: Crawler, output_dir: str = NOVELS_DIR,
+                 host: str = DISTRIBUTED_HOST, port: int = DISTRIBUTED_PORT,
+                 lease_size: int = LEASE_SIZE, lease_timeout: float = LEASE_TIMEOUT):
+        super().__init__(crawler, output_dir)
+        self.host = host
+        self.port = port
+        self.lease_size = lease_size
+        self.lease_timeout = lease_timeout
+        self.auto_retry = True
+        self.server: Optional[_Server] = None
+        self.lock = Lock()
+        self.closed = False
+        # 当前一轮分发的状态
+        self.round_chapters: Dict[int, Chapter] = {}
+        self.pending: Deque[int] = deque()
+        self.outstanding: Set[int] = set()  # 尚未得到结果的章节
+        self.assigned: Dict[int, str] = {}  # 章节序号 -> 租约
+        self.leases: Dict[str, Lease] = {}
+        self.round_failed: List[Chapter] = []
+        self.round_done = Event()
+
+    @property
+    def address(self):
+        return self.server.server_address if self.server else (self.host, self.port)
+
+    def start(self) -> None:
+        """开始监听工作进程"""
+        self.server = _Server((self.host, self.port), _Handler)
+        self.server.coordinator = self
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.crawler.log(f"协调进程已启动，监听 {self.address[0]}:{self.address[1]}")
+
+    def close(self) -> None:
+        self.closed = True
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def run(self, book_id: str, start_chapter: int = 1, end_chapter: Optional[int] = None,
+            output_format: str = "txt") -> bool:
+        """启动服务并下载整本书，完成后关闭服务"""
+        self.start()
+        try:
+            return self.start_download(book_id, start_chapter, end_chapter, WORKER_THREADS, output_format)
+        finally:
+            self.close()
+
+    # 以下两个方法替换 Downloader 中的本地下载
+    def download_chapters(self, book_id: str, chapters: List[Chapter], save_dir: str,
+                          start_chapter: int, thread_num: int) -> List[Chapter]:
+        """把断点中未完成的章节分发给工作进程"""
+        pending = [
+            chapter for chapter in chapters
+            if not (self.checkpoint.is_done(chapter.index) and os.path.exists(chapter.save_path))
+        ]
+        return self._distribute(pending)
+
+    def retry_failed_chapters(self, book_id: str, failed_chapters: List[Union[Chapter, Dict]], save_dir: str,
+                              thread_num: int = 3) -> List[Chapter]:
+        """失败章节重新分发一轮"""
+        self.crawler.log("\n开始重新分发失败章节...")
+        failed_chapters = [Chapter.from_dict(chapter) for chapter in failed_chapters]
+        for chapter in failed_chapters:
+            chapter.attempts = 0
+        return self._distribute([chapter for chapter in failed_chapters if chapter.get('save_path')])
+
+    def _distribute(self, chapters: List[Chapter]) -> List[Chapter]:
+        """进行一轮分发，所有章节有结果（或暂停）后返回失败的章节"""
+        if not chapters:
+            return []
+        self.download_count = 0
+        self.total_chapters = len(chapters)
+        self.writer = ChapterWriter().start()
+        with self.lock:
+            self.round_chapters = {chapter.index: chapter for chapter in chapters}
+            self.pending = deque(sorted(self.round_chapters))
+            self.outstanding = set(self.round_chapters)
+            self.assigned = {}
+            self.leases = {}
+            self.round_failed = []
+            self.round_done.clear()
+        self.crawler.log(f"等待工作进程下载 {len(chapters)} 章...")
+
+        while not self.round_done.wait(0.5):
+            if not self.is_downloading:
+                break
+            with self.lock:
+                self._reap()
+
+        with self.lock:
+            # 结束本轮：之后到达的结果一律忽略
+            self.round_chapters = {}
+            self.pending.clear()
+            self.leases = {}
+        self.writer.close()
+        with self.lock:
+            # 写入失败的章节在写入线程结束后才能确定
+            failed = list(self.round_failed)
+        return sorted(failed, key=lambda x: x.index or 0)
+
+    def handle(self, message: Dict) -> Dict:
+        """处理一条工作进程请求"""
+        op = message.get('op')
+        if op == 'lease':
+            return self._lease(str(message.get('worker', '')))
+        if op == 'result':
+            return self._result(message)
+        if op == 'complete':
+            return self._complete(message.get('lease_id'))
+        return {'error': f"未知请求: {op}"}
+
+    def _lease(self, worker: str) -> Dict:
+        with self.lock:
+            if self.closed:
+                return {'done': True}
+            self._reap()
+            if not self.round_chapters or not self.is_downloading:
+                return {'wait': POLL_INTERVAL}
+            lease = Lease(uuid.uuid4().hex, worker, [], self.lease_timeout)
+            while self.pending and len(lease.indices) < self.lease_size:
+                index = self.pending.popleft()
+                if index in self.outstanding and index not in self.assigned:
+                    self.assigned[index] = lease.lease_id
+                    lease.indices.append(index)
+            if not lease.indices:
+                return {'wait': POLL_INTERVAL}
+            self.leases[lease.lease_id] = lease
+            indices = lease.indices
+            chapters = []
+            for index in indices:
+                chapter = self.round_chapters[index]
+                chapters.append({
+                    'index': index,
+                    'title': chapter.title,
+                    'url': chapter.url,
+                    # 上次解析失败的章节改用备用解析方式
+                    'alternate': chapter.get('error') == ERROR_PARSE,
+                })
+        logging.info(f"分配租约 {lease.lease_id[:8]} 给 {worker}: {len(indices)} 章（从第{indices[0]}章起）")
+        return {'lease_id': lease.lease_id, 'ttl': self.lease_timeout, 'chapters': chapters}
+
+    def _reap(self) -> None:
+        """回收超时租约，未完成的章节重新排队（调用方持有锁）"""
+        for lease_id, lease in list(self.leases.items()):
+            if lease.expired:
+                self.crawler.log(f"工作进程 {lease.worker} 的租约超时，重新分配其中的章节")
+                self._release(lease)
+
+    def _release(self, lease: Lease) -> None:
+        self.leases.pop(lease.lease_id, None)
+        requeue = [
+            index for index in lease.indices
+            if self.assigned.get(index) == lease.lease_id and index in self.outstanding
+        ]
+        for index in requeue:
+            del self.assigned[index]
+        self.pending.extendleft(reversed(requeue))
+
+    def _complete(self, lease_id: str) -> Dict:
+        with self.lock:
+            lease = self.leases.get(lease_id)
+            if lease:
+                self._release(lease)
+        return {'ok': True}
+
+    def _result(self, message: Dict) -> Dict:
+        index = message.get('index')
+        with self.lock:
+            lease = self.leases.get(message.get('lease_id'))
+            if lease:
+                lease.renew()
+            chapter = self.round_chapters.get(index)
+            if chapter is None or index not in self.outstanding:
+                # 租约已超时并由其他工作进程完成
+                return {'ok': False}
+            if self.assigned.get(index) == message.get('lease_id'):
+                del self.assigned[index]
+
+        text = None
+        if 'content' in message:
+            try:
+                if self.content_checker:
+                    self.content_checker.validate(chapter, message['content'])
+                text = self.crawler.format_chapter(chapter.title, message['content'])
+            except ChapterFetchError as e:
+                chapter.error = e.kind
+                chapter.error_detail = str(e)
+        else:
+            chapter.error = message.get('error') or ERROR_UNKNOWN
+            chapter.error_detail = message.get('error_detail')
+
+        with self.lock:
+            if index not in self.outstanding or chapter is not self.round_chapters.get(index):
+                return {'ok': False}
+            chapter.attempts = (chapter.attempts or 0) + 1
+            if text is not None:
+                chapter.error = chapter.error_detail = None
+                self.outstanding.discard(index)
+                future = self.writer.submit(chapter.save_path, text)
+                future.add_done_callback(lambda f: self._written(chapter, f))
+            elif chapter.attempts < LEASE_MAX_ATTEMPTS:
+                self.pending.append(index)
+            else:
+                self.crawler.log(f"章节多次下载失败: {chapter.title} [{chapter.error}]")
+                self.outstanding.discard(index)
+                self.round_failed.append(chapter)
+            if not self.outstanding:
+                self.round_done.set()
+        return {'ok': True}
+
+    def _written(self, chapter: Chapter, future: Future) -> None:
+        try:
+            future.result()
+        except Exception as e:
+            chapter.error = ERROR_WRITE
+            chapter.error_detail = str(e)
+            with self.lock:
+                self.round_failed.append(chapter)
+            return
+        if self.checkpoint:
+            self.checkpoint.mark_done(chapter.index)
+        self.update_progress()
+
+class Worker:
+    """工作进程：向协调进程领取租约，下载章节正文并逐章提交"""
+
+    def __init__(self, crawler: Crawler, host: str = DISTRIBUTED_HOST, port: int = DISTRIBUTED_PORT,
+                 threads: int = WORKER_THREADS, worker_id: Optional[str] = None,
+                 reconnect: int = 5):
+        self.crawler = crawler
+        self.host = host
+        self.port = port
+        self.threads = threads
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.reconnect = reconnect
+        self.lock = Lock()
+        self.sock: Optional[socket.socket] = None
+        self.reader = None
+
+    def run(self) -> None:
+        """循环领取租约，直到协调进程通知结束或无法连接"""
+        self.crawler.log(f"工作进程 {self.worker_id} 连接 {self.host}:{self.port}")
+        try:
+            while True:
+                reply = self._call({'op': 'lease', 'worker': self.worker_id})
+                if reply is None or reply.get('done'):
+                    break
+                if 'lease_id' in reply:
+                    self._work(reply)
+                else:
+                    time.sleep(reply.get('wait', POLL_INTERVAL))
+        finally:
+            self._disconnect()
+        self.crawler.log(f"工作进程 {self.worker_id} 退出")
+
+    def _work(self, lease: Dict) -> None:
+        lease_id = lease['lease_id']
+        with ThreadPoolExecutor(max_workers=max(1, self.threads)) as executor:
+            list(executor.map(lambda chapter: self._fetch_and_report(lease_id, chapter),
+                              lease['chapters']))
+        self._call({'op': 'complete', 'lease_id': lease_id})
+
+    def _fetch_and_report(self, lease_id: str, chapter: Dict) -> None:
+        message = {'op': 'result', 'lease_id': lease_id, 'index': chapter['index']}
+        try:
+            time.sleep(random.uniform(0.5, 1))
+            url = f"{self.crawler.base_url}{chapter['url']}"
+            message['content'] = self.crawler.fetch_chapter_content(url, chapter.get('alternate', False))
+        except ChapterFetchError as e:
+            message.update(error=e.kind, error_detail=str(e))
+            self.crawler.log(f"获取章节内容失败: {chapter['title']} [{e.kind}] {str(e)}")
+            # 被限流等情况先等待再继续，避免同一IP持续请求
+            time.sleep(min(RETRY_BACKOFF.get(e.kind, 1), RETRY_BACKOFF_MAX))
+        except Exception as e:
+            message.update(error=ERROR_UNKNOWN, error_detail=str(e))
+            self.crawler.log(f"下载章节失败: {str(e)}")
+        self._call(message)
+
+    def _call(self, message: Dict) -> Optional[Dict]:
+        """发送一条请求并读取应答，连接断开时重连，重连失败返回 None"""
+        data = json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n'
+        with self.lock:
+            for attempt in range(self.reconnect):
+                try:
+                    if not self.sock:
+                        self._connect()
+                    self.sock.sendall(data)
+                    line = self.reader.readline()
+                    if not line:
+                        raise ConnectionError("连接已关闭")
+                    return json.loads(line)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"与协调进程通信失败（第{attempt + 1}次）: {str(e)}")
+                    self._disconnect()
+                    time.sleep(POLL_INTERVAL)
+        return None
+
+    def _connect(self) -> None:
+        self.sock = socket.create_connection((self.host, self.port), timeout=LEASE_TIMEOUT)
+        self.reader = self.sock.makefile('rb')
+
+    def _disconnect(self) -> None:
+        if self.sock:
+            try:
+                self.reader.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.reader = None
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from utils.helpers import setup_logging
+
+    parser = argparse.ArgumentParser(prog='python -m core.distributed', description='分布式下载小说')
+    sub = parser.add_subparsers(dest='role', required=True)
+    coordinator = sub.add_parser('coordinator', help='启动协调进程并下载指定书籍')
+    coordinator.add_argument('book_id')
+    coordinator.add_argument('--start', type=int, default=1)
+    coordinator.add_argument('--end', type=int)
+    coordinator.add_argument('--format', type=output_formats_arg, default='txt')
+    coordinator.add_argument('--output-dir', default=NOVELS_DIR)
+    worker = sub.add_parser('worker', help='启动工作进程')
+    worker.add_argument('--threads', type=int, default=WORKER_THREADS)
+    for sub_parser in (coordinator, worker):
+        sub_parser.add_argument('--host', default=DISTRIBUTED_HOST)
+        sub_parser.add_argument('--port', type=int, default=DISTRIBUTED_PORT)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    if args.role == 'coordinator':
+        node = Coordinator(Crawler(output_dir=args.output_dir), args.output_dir, args.host, args.port)
+        return 0 if node.run(args.book_id, args.start, args.end, args.format) and not node.failed_chapters else 1
+    Worker(Crawler(), args.host, args.port, args.threads).run()
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
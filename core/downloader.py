@@ -1,136 +1,355 @@
 import os
-from typing import List, Dict, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from typing import Callable, List, Dict, Optional, Union
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from threading import Event, Lock
+from bisect import bisect_left
 from utils.helpers import clean_filename, ensure_dir
-from core.crawler import Crawler
-from outputs.epub_output import EpubOutput
+from core.crawler import Crawler, ERROR_WRITE
+from core.writer import ChapterWriter
+from core.chapter_table import Chapter, ChapterTable
+from core.checkpoint import Checkpoint
+from core.chapter_index import ChapterIndex
+from core.failure_journal import FailureJournal
+from core.content_check import ContentChecker, CONTENT_ERRORS
 from outputs.txt_output import TxtOutput
+from config import NOVELS_DIR, PARSE_WORKERS, RETRY_ROUNDS, RETRY_BACKOFF, RETRY_BACKOFF_MAX
 import time
 
 class Downloader:
-    def __init__(self, crawler: Crawler):
+    def __init__(self, crawler: Crawler, output_dir: str = NOVELS_DIR,
+                 parse_workers: int = PARSE_WORKERS):
         self.crawler = crawler
+        self.output_dir = output_dir
+        self.parse_workers = parse_workers  # 大于0时使用多进程解析章节页面
+        self.parse_pool = None  # ParsePool，需要时才创建（会启动子进程）
         self.download_count = 0
         self.total_chapters = 0
+        # 失败章节重试的进度单独计数，不改变下载进度
+        self.retry_done = 0
+        self.retry_total = 0
         self.download_lock = Lock()
         self.is_downloading = False
+        self.is_paused = False
+        self.checkpoint: Optional[Checkpoint] = None
+        self.failed_chapters: List[Chapter] = []
+        self.content_checker: Optional[ContentChecker] = None
+        self.writer: Optional[ChapterWriter] = None
+        self.save_dir: Optional[str] = None
+        self.chapters: Optional[ChapterTable] = None  # 当前下载范围的章节表
+        # 由下载队列设置：进度回调、自动重试、全局并发预算
+        self.progress_callback: Optional[Callable[[int, int], None]] = None
+        self.auto_retry: Optional[bool] = None
+        self.budget = None
+        self.job_id: Optional[str] = None
+        # 预读模式：read_ahead 为读者位置之后保持下载的章节数，None 表示普通模式
+        self.read_ahead: Optional[int] = None
+        self.reader_cursor: Optional[int] = None
+        self.readable_until = 0  # 从起始章节开始连续可读的最后一章
+        self.chapter_ready_callback: Optional[Callable[[int, Chapter], None]] = None
+        self.cursor_event = Event()
+        self.redo_all = False  # 忽略断点，重新处理范围内的全部章节（从缓存重新生成时）
+
+    def pause(self) -> None:
+        """暂停下载：不再提交新章节，等待进行中的请求完成后保存断点"""
+        if self.is_downloading:
+            self.is_paused = True
+            self.is_downloading = False
+            self.crawler.log("正在暂停下载，等待进行中的章节完成...")
+
+    def stop(self) -> None:
+        """停止下载（同样会保存断点，之后仍可继续）"""
+        self.is_downloading = False
+
+    def resume(self, book_id: str) -> bool:
+        """从断点继续下载，可在新进程中调用"""
+        checkpoint = Checkpoint.find(book_id, self.output_dir)
+        if not checkpoint:
+            self.crawler.log(f"未找到书号 {book_id} 的断点记录")
+            return False
+        self.crawler.log(f"从断点继续下载，已完成 {len(checkpoint.completed)} 章")
+        return self.start_download(
+            book_id,
+            checkpoint.start_chapter,
+            checkpoint.end_chapter,
+            checkpoint.thread_num,
+            checkpoint.output_format
+        )
+
+    def reprocess_from_cache(self, book_id: str, start_chapter: int = 1, end_chapter: Optional[int] = None,
+                             thread_num: int = 3, output_format: str = "txt") -> bool:
+        """用缓存的原始页面重新解析、清理并生成输出，全程不访问网络"""
+        if not self.crawler.raw_cache:
+            self.crawler.log("未启用原始页面缓存，无法从缓存重新生成")
+            return False
+        self.crawler.log("从缓存重新生成，不访问网络")
+        # 换用单独的离线 Crawler，与其他任务共用的 Crawler 不进入离线模式
+        crawler = self.crawler
+        self.crawler = crawler.offline_copy()
+        self.redo_all = True
+        try:
+            return self.start_download(book_id, start_chapter, end_chapter, thread_num, output_format)
+        finally:
+            self.crawler = crawler
+            self.redo_all = False
 
     def update_progress(self) -> None:
         """更新下载进度"""
         with self.download_lock:
             self.download_count += 1
-            if self.crawler.gui:
+            if self.progress_callback:
+                self.progress_callback(self.download_count, self.total_chapters)
+            elif self.crawler.gui:
                 self.crawler.gui.update_progress(self.download_count, self.total_chapters)
 
-    def download_chapters(self, book_id: str, chapters: List[Dict], save_dir: str,
-                        start_index: int, thread_num: int = 3) -> List[Dict]:
-        """下载多个章节"""
+    def _fetch_one(self, chapter: Chapter, alternate: bool = False) -> Optional[str]:
+        """获取单个章节文本，队列模式下先占用全局并发预算"""
+        validator = self.content_checker.validate if self.content_checker else None
+        parser = self.parse_pool.parse if self.parse_pool else None
+        if self.budget is None:
+            return self.crawler.fetch_chapter(chapter, alternate, validator, parser)
+        with self.budget.slot(self.job_id):
+            return self.crawler.fetch_chapter(chapter, alternate, validator, parser)
+
+    def _download_one(self, chapter: Chapter, save_path: str, alternate: bool = False) -> Optional[Future]:
+        """获取章节后交给写入线程，返回写入完成时结束的 Future，获取失败时返回 None
+
+        写入队列已满时在此等待，从而限制下载速度
+        """
+        chapter_text = self._fetch_one(chapter, alternate)
+        if chapter_text is None:
+            return None
+        return self.writer.submit(save_path, chapter_text)
+
+    def _write_succeeded(self, chapter: Chapter, future: Future) -> bool:
+        """等待章节写入完成，写入失败时记录错误类型"""
+        try:
+            return future.result()
+        except Exception as e:
+            chapter.error = ERROR_WRITE
+            chapter.error_detail = str(e)
+            self.crawler.log(f"写入章节 {chapter.title} 失败: {str(e)}")
+            return False
+
+    def _should_retry(self) -> bool:
+        """是否重试失败章节：队列模式下自动决定，否则询问界面"""
+        if self.auto_retry is not None:
+            return self.auto_retry
+        return bool(self.crawler.gui and self.crawler.gui.ask_retry())
+
+    def set_reader_cursor(self, chapter_index: Optional[int]) -> None:
+        """设置读者当前阅读的章节序号，预读模式下会优先下载其后的章节"""
+        self.reader_cursor = chapter_index
+        self.cursor_event.set()
+
+    def _next_pending(self, pending: List[int], frontier: int) -> Optional[int]:
+        """选择下一个要下载的章节：总是优先序号最小的未完成章节"""
+        if not pending:
+            return None
+        if self.read_ahead is None:
+            return pending.pop(0)
+        # 预读模式：只下载读者位置之后窗口内的章节
+        cursor = frontier if self.reader_cursor is None else self.reader_cursor
+        pos = bisect_left(pending, cursor)
+        if pos < len(pending) and pending[pos] < cursor + self.read_ahead:
+            return pending.pop(pos)
+        # 读者跳读时，窗口内已无待下载章节再补齐之前的章节
+        if pos > 0:
+            return pending.pop(0)
+        return None
+
+    def download_chapters(self, book_id: str, chapters: ChapterTable, save_dir: str,
+                        start_index: int, thread_num: int = 3) -> List[Chapter]:
+        """下载多个章节（同时进行的请求数不超过线程数，便于暂停时排空）"""
         failed_chapters = []
-        
-        with ThreadPoolExecutor(max_workers=thread_num) as executor:
-            future_to_chapter = {}
-            
-            for i, chapter in enumerate(chapters):
-                chapter_index = start_index + i
-                save_path = os.path.join(
-                    save_dir,
-                    f"{chapter_index:04d}-{clean_filename(chapter['title'])}.txt"
-                )
-                
-                self.crawler.log(f"正在下载: {chapter['title']}")
-                future = executor.submit(
-                    self.crawler.download_chapter,
-                    chapter,
-                    save_path
-                )
-                future_to_chapter[future] = chapter
-
-            for future in as_completed(future_to_chapter):
-                chapter = future_to_chapter[future]
-                try:
-                    success = future.result()
+        chapter_map = {}
+        pending = []  # 待下载章节序号（升序）
+        resolved = set()  # 已结束（成功或失败）的章节序号
+        succeeded = set()
+        chapters = ChapterTable.coerce(chapters)
+        chapters.bind(save_dir, start_index)
+        for chapter in chapters:
+            chapter_index = chapter.index
+            chapter_map[chapter_index] = chapter
+            if self.checkpoint and self.checkpoint.is_done(chapter_index) \
+                    and os.path.exists(chapter.save_path):
+                resolved.add(chapter_index)
+                succeeded.add(chapter_index)
+            else:
+                pending.append(chapter_index)
+
+        frontier = start_index  # 第一个尚未结束的章节
+        self.readable_until = start_index - 1
+
+        def advance() -> None:
+            """推进连续可读位置，并通知已可阅读的章节"""
+            nonlocal frontier
+            while frontier in resolved:
+                frontier += 1
+            while self.readable_until + 1 in succeeded:
+                self.readable_until += 1
+                if self.chapter_ready_callback:
+                    self.chapter_ready_callback(self.readable_until, chapter_map[self.readable_until])
+
+        advance()
+        self.writer = ChapterWriter().start()
+        try:
+            with ThreadPoolExecutor(max_workers=thread_num) as executor:
+                fetching = {}  # 下载中的章节
+                writing = {}  # 已下载、等待写入完成的章节
+
+                def fill() -> None:
+                    # 暂停或停止后只等待进行中的请求完成，不再提交新章节
+                    while self.is_downloading and len(fetching) < thread_num:
+                        chapter_index = self._next_pending(pending, frontier)
+                        if chapter_index is None:
+                            return
+                        chapter = chapter_map[chapter_index]
+                        self.crawler.log(f"正在下载: {chapter.title}")
+                        future = executor.submit(
+                            self._download_one,
+                            chapter,
+                            chapter.save_path
+                        )
+                        fetching[future] = (chapter_index, chapter)
+
+                def finish(chapter_index: int, chapter: Chapter, success: bool) -> None:
+                    resolved.add(chapter_index)
                     if not success:
                         failed_chapters.append(chapter)
-                        self.crawler.log(f"下载失败: {chapter['title']}")
+                        self.crawler.log(f"下载失败: {chapter.title}")
                     else:
-                        self.crawler.log(f"下载成功: {chapter['title']}")
+                        succeeded.add(chapter_index)
+                        if self.checkpoint:
+                            self.checkpoint.mark_done(chapter_index)
+                        self.crawler.log(f"下载成功: {chapter.title}")
                     self.update_progress()
-                except Exception as e:
-                    self.crawler.log(f"下载章节 {chapter['title']} 时发生错误: {str(e)}")
-                    failed_chapters.append(chapter)
 
-                if not self.is_downloading:
-                    executor.shutdown(wait=False)
-                    break
+                fill()
+                while fetching or writing or (pending and self.is_downloading):
+                    if not fetching and not writing:
+                        # 预读窗口已满，等待读者前进
+                        self.cursor_event.wait(0.5)
+                        self.cursor_event.clear()
+                        fill()
+                        continue
 
-        if failed_chapters:
+                    done, _ = wait(list(fetching) + list(writing), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in writing:
+                            chapter_index, chapter = writing.pop(future)
+                            finish(chapter_index, chapter, self._write_succeeded(chapter, future))
+                            continue
+
+                        chapter_index, chapter = fetching.pop(future)
+                        try:
+                            write_future = future.result()
+                        except Exception as e:
+                            self.crawler.log(f"下载章节 {chapter.title} 时发生错误: {str(e)}")
+                            write_future = None
+                        if write_future is None:
+                            finish(chapter_index, chapter, False)
+                        else:
+                            # 章节文件写入完成后才算下载成功
+                            writing[write_future] = (chapter_index, chapter)
+
+                    advance()
+                    fill()
+        finally:
+            self.writer.close()
+
+        if not self.is_downloading:
+            self.crawler.log(f"\n下载已暂停，共完成 {self.download_count}/{self.total_chapters} 章")
+        elif failed_chapters:
             self.crawler.log(f"\n下载完成，共 {len(failed_chapters)} 个章节下载失败")
         else:
             self.crawler.log("\n所有章节下载成功！")
 
         return failed_chapters
 
-    def retry_failed_chapters(self, book_id: str, failed_chapters: List[Dict], save_dir: str, thread_num: int = 1) -> List[Dict]:
-        """单线程重试失败的章节"""
-        still_failed = []
+    def retry_failed_chapters(self, book_id: str, failed_chapters: List[Union[Chapter, Dict]], save_dir: str,
+                              thread_num: int = 3) -> List[Chapter]:
+        """按错误类型并行重试失败的章节"""
         self.crawler.log("\n开始重试失败章节...")
-        
-        # 按章节序号排序
-        def get_chapter_number(chapter):
-            # 从文件名中提取章节序号
-            filename = os.path.basename(chapter.get('save_path', ''))
-            try:
-                # 提取文件名开头的数字部分
-                number = int(filename.split('-')[0])
-                return number
-            except:
-                return 0
-        
-        # 对失败章节按序号排序
-        sorted_chapters = sorted(failed_chapters, key=get_chapter_number)
-        
-        for chapter in sorted_chapters:
-            if not self.is_downloading:
+        failed_chapters = [Chapter.from_dict(chapter) for chapter in failed_chapters]
+        still_failed = [chapter for chapter in failed_chapters if chapter.get('save_path')]
+        for chapter in failed_chapters:
+            if not chapter.get('save_path'):
+                self.crawler.log(f"缺少保存路径，无法重试: {chapter.get('title', '')}")
+
+        for retry_round in range(1, RETRY_ROUNDS + 1):
+            if not still_failed or not self.is_downloading:
                 break
-            
-            try:
-                self.crawler.log(f"重试下载: {chapter['title']}")
-                success = self.crawler.download_chapter(chapter, chapter['save_path'])
-                
-                if not success:
-                    still_failed.append(chapter)
-                    self.crawler.log(f"重试失败: {chapter['title']}")
-                else:
-                    self.crawler.log(f"重试成功: {chapter['title']}")
-                    
-                self.update_progress()
-                
-            except Exception as e:
-                self.crawler.log(f"重试章节时出错: {str(e)}")
-                still_failed.append(chapter)
-                
-            time.sleep(1)  # 避免请求过快
+            kinds = {}
+            for chapter in still_failed:
+                kinds[chapter.get('error', 'unknown')] = kinds.get(chapter.get('error', 'unknown'), 0) + 1
+            summary = '，'.join(f"{kind} {count} 章" for kind, count in sorted(kinds.items()))
+            self.crawler.log(f"第 {retry_round} 轮重试，共 {len(still_failed)} 章（{summary}）")
 
+            self.retry_done = 0
+            self.retry_total = len(still_failed)
+            round_failed = []
+            # 按章节序号提交，序号小的先完成
+            sorted_chapters = sorted(still_failed, key=lambda x: x.index or 0)
+            self.writer = ChapterWriter()
+            with self.writer, ThreadPoolExecutor(max_workers=max(1, thread_num)) as executor:
+                future_to_chapter = {
+                    executor.submit(self._retry_one, chapter): chapter
+                    for chapter in sorted_chapters
+                }
+                for future in as_completed(future_to_chapter):
+                    chapter = future_to_chapter[future]
+                    try:
+                        success = future.result()
+                    except Exception as e:
+                        self.crawler.log(f"重试章节时出错: {str(e)}")
+                        success = False
+                    self.retry_done += 1
+                    progress = f"{self.retry_done}/{self.retry_total}"
+                    if success:
+                        self.crawler.log(f"重试成功: {chapter.title}（{progress}）")
+                        if self.checkpoint:
+                            self.checkpoint.mark_done(chapter.index)
+                    else:
+                        round_failed.append(chapter)
+                        self.crawler.log(f"重试失败: {chapter.title} [{chapter.get('error', 'unknown')}]（{progress}）")
+            still_failed = round_failed
+
+        journal = FailureJournal(save_dir)
         if still_failed:
             self.crawler.log(f"\n重试完成，仍有 {len(still_failed)} 个章节下载失败")
             # 保存仍然失败的章节信息
-            self.save_failed_chapters(save_dir, still_failed)
+            journal.save(still_failed)
         else:
             self.crawler.log("\n所有失败章节重试成功！")
             # 删除失败章节记录文件
-            failed_file = os.path.join(save_dir, 'failed_chapters.txt')
-            if os.path.exists(failed_file):
-                os.remove(failed_file)
+            journal.clear()
             
         return still_failed
 
+    def _retry_one(self, chapter: Chapter) -> bool:
+        """按错误类型的策略重试单个章节"""
+        if not self.is_downloading:
+            return False
+        kind = chapter.get('error', 'unknown')
+        attempts = chapter.get('attempts', 1)
+        base = RETRY_BACKOFF.get(kind, RETRY_BACKOFF['unknown'])
+        delay = min(base * 2 ** (attempts - 1), RETRY_BACKOFF_MAX) if base else 0
+        if delay and not self.crawler.offline:
+            time.sleep(delay)
+        chapter.attempts = attempts + 1
+        self.crawler.log(f"重试下载: {chapter.title}")
+        # 解析失败时换用备用解析器
+        future = self._download_one(chapter, chapter.save_path, alternate=(kind == 'parse'))
+        return future is not None and self._write_succeeded(chapter, future)
+
     def start_download(self, book_id: str, start_chapter: int = 1, end_chapter: Optional[int] = None,
                       thread_num: int = 3, output_format: str = "txt") -> bool:
-        """开始下载小说"""
+        """开始下载小说（若存在同书号的断点则跳过已完成的章节）"""
         try:
             self.is_downloading = True
+            self.is_paused = False
             self.download_count = 0
+            self.failed_chapters = []
 
             # 获取小说信息
             self.crawler.log("正在获取小说信息...")
@@ -156,59 +375,134 @@ class Downloader:
                 return False
 
             # 获取需要下载的章节
-            chapters = all_chapters[start_chapter-1:end_chapter]
+            chapters = ChapterTable.coerce(all_chapters)[start_chapter-1:end_chapter]
             self.total_chapters = len(chapters)
             self.crawler.log(f"\n开始下载《{novel_info.get('title', '')}》")
             self.crawler.log(f"共 {self.total_chapters} 章，使用 {thread_num} 个线程下载\n")
 
             # 创建保存目录
             novel_title = clean_filename(novel_info['title'])
-            save_dir = os.path.join('novels', novel_title)
+            save_dir = os.path.join(self.output_dir, novel_title)
             ensure_dir(save_dir)
+            self.save_dir = save_dir
 
             # 保存小说信息
             self.save_novel_info(save_dir, novel_info, start_chapter, end_chapter)
 
-            # 为每个章节添加保存路径
-            for i, chapter in enumerate(chapters):
-                chapter_index = start_chapter + i
-                chapter['save_path'] = os.path.join(
-                    save_dir,
-                    f"{chapter_index:04d}-{clean_filename(chapter['title'])}.txt"
-                )
+            # 为每个章节计算序号和保存路径
+            chapters.bind(save_dir, start_chapter)
+            self.chapters = chapters
+
+            # 读取或创建断点
+            self.checkpoint = self._load_checkpoint(save_dir, book_id)
+            self.checkpoint.start_chapter = start_chapter
+            self.checkpoint.end_chapter = end_chapter
+            self.checkpoint.thread_num = thread_num
+            self.checkpoint.output_format = output_format
+            self.checkpoint.novel_info = novel_info
+            self.checkpoint.paused = False
+            if self.redo_all:
+                self.checkpoint.completed.clear()
+            self.download_count = sum(
+                1 for chapter in chapters
+                if self.checkpoint.is_done(chapter.index) and os.path.exists(chapter.save_path)
+            )
+            if self.download_count:
+                self.crawler.log(f"从断点继续，已完成 {self.download_count} 章")
+            self.checkpoint.save()
 
             # 下载章节
+            if self.parse_workers and not self.parse_pool:
+                from core.parse_pool import ParsePool
+                self.parse_pool = ParsePool(self.parse_workers).start()
+            self.content_checker = ContentChecker()
             failed_chapters = self.download_chapters(book_id, chapters, save_dir, start_chapter, thread_num)
 
+            # 复查内容并自动重新下载占位页、重复和被截断的章节
+            if self.is_downloading:
+                failed_chapters = self._requeue_suspicious(book_id, chapters, failed_chapters,
+                                                           save_dir, thread_num)
+
+            self.failed_chapters = failed_chapters
+
+            # 暂停或停止：保存断点后直接返回
+            if not self.is_downloading:
+                self._save_paused_state(save_dir, failed_chapters)
+                return True
+
             # 处理失败章节
             if failed_chapters:
                 self.save_failed_chapters(save_dir, failed_chapters)
-                self.crawler.log(f"\n失败章节已保存到: {os.path.join(save_dir, 'failed_chapters.txt')}")
+                self.crawler.log(f"\n失败章节已保存到: {FailureJournal(save_dir).path}")
                 
                 # 询问是否要重试
-                if self.crawler.gui and self.crawler.gui.ask_retry():
-                    # 单线程重试失败章节
-                    failed_chapters = self.retry_failed_chapters(book_id, failed_chapters, save_dir)
+                if self._should_retry():
+                    # 按错误类型并行重试失败章节
+                    failed_chapters = self.retry_failed_chapters(book_id, failed_chapters, save_dir, thread_num)
+
+            self.failed_chapters = failed_chapters
+            if not self.is_downloading:
+                self._save_paused_state(save_dir, failed_chapters)
+                return True
+            self.checkpoint.save()
 
             # 只有在没有失败章节或用户选择不重试的情况下才进行格式转换
             if not failed_chapters and self.is_downloading:
+                # 生成章节索引，输出格式按索引读取章节文件
+                index = ChapterIndex.build(save_dir, chapters)
+                index.save()
+                if 'epub' in output_format.split(","):
+                    self._save_cover(save_dir, novel_info)
+
                 # 转换格式
-                if output_format != "txt":
+                if "," in output_format or output_format == "jsonl":
+                    formats = output_format.split(",")
+                    self.crawler.log(f"\n正在生成 {'、'.join(formats)} 格式...")
+                    from outputs.pipeline import OutputPipeline
+                    converter = OutputPipeline(save_dir, novel_info, chapters, index, formats)
+                    # 各格式共用一次章节读取，全部完成后才删除章节文件
+                    merged = converter.convert() if start_chapter == 1 else \
+                        converter.merge_chapters(start_chapter, end_chapter or chapters[-1].index)
+                    if merged:
+                        self.crawler.log("全部格式生成完成")
+                    else:
+                        self.crawler.log("部分格式生成失败，章节文件已保留")
+                elif output_format.startswith("txt."):
+                    self.crawler.log(f"\n正在合并并压缩TXT文件（{output_format}）...")
+                    from outputs.compressed_txt import CompressedTxtOutput
+                    converter = CompressedTxtOutput(save_dir, novel_info, chapters, index,
+                                                    codec=output_format[len("txt."):])
+                    merged = converter.convert() if start_chapter == 1 else \
+                        converter.merge_chapters(start_chapter, end_chapter or chapters[-1].index)
+                    if merged:
+                        self.crawler.log("压缩TXT生成完成")
+                    else:
+                        self.crawler.log("压缩TXT生成失败")
+                elif output_format != "txt":
                     self.crawler.log("\n正在转换为EPUB格式...")
-                    converter = EpubOutput(save_dir, novel_info)
-                    if converter.convert():
+                    # EPUB 相关模块只在需要时导入
+                    from outputs.epub_output import EpubOutput
+                    converter = EpubOutput(save_dir, novel_info, chapters, index)
+                    # 追更时把新章节追加到已生成的EPUB末尾，不重新生成整本
+                    merged = converter.convert() if start_chapter == 1 else converter.append()
+                    if merged:
                         self.crawler.log("EPUB转换完成")
                     else:
                         self.crawler.log("EPUB转换失败")
                 else:
                     self.crawler.log("\n正在合并TXT文件...")
-                    converter = TxtOutput(save_dir, novel_info)
-                    if converter.convert():
+                    converter = TxtOutput(save_dir, novel_info, chapters, index)
+                    # 追更时把新章节追加到完整版末尾，不覆盖已合并的章节
+                    merged = converter.convert() if start_chapter == 1 else \
+                        converter.append(start_chapter, end_chapter or chapters[-1].index)
+                    if merged:
                         self.crawler.log("TXT合并完成")
                     else:
                         self.crawler.log("TXT合并失败")
 
                 if self.is_downloading:
+                    # 任务已完成，断点不再需要
+                    self.checkpoint.remove()
                     self.crawler.log(f"\n下载完成！文件保存在：{os.path.abspath(save_dir)}")
             else:
                 self.crawler.log("\n由于存在下载失败的章节，跳过格式转换")
@@ -217,9 +511,63 @@ class Downloader:
 
         except Exception as e:
             self.crawler.log(f"下载过程出错: {str(e)}")
+            if self.checkpoint:
+                self.checkpoint.save()
             return False
         finally:
             self.is_downloading = False
+            if self.parse_pool:
+                self.parse_pool.close()
+                self.parse_pool = None
+            if self.crawler.raw_cache:
+                self.crawler.raw_cache.flush()
+
+    def _requeue_suspicious(self, book_id: str, chapters: ChapterTable, failed_chapters: List[Chapter],
+                            save_dir: str, thread_num: int) -> List[Chapter]:
+        """复查已下载章节的内容，把可疑章节与内容检查失败的章节一起自动重新下载"""
+        for _ in range(RETRY_ROUNDS):
+            flagged = self.content_checker.recheck(chapters)
+            for chapter in flagged:
+                self.crawler.log(f"内容复查未通过: {chapter.title} [{chapter.error}]")
+                if self.checkpoint:
+                    self.checkpoint.unmark(chapter.index)
+            failed_chapters = failed_chapters + flagged
+
+            suspicious = [c for c in failed_chapters if c.get('error') in CONTENT_ERRORS]
+            if not suspicious or not self.is_downloading:
+                break
+            self.crawler.log(f"\n发现 {len(suspicious)} 个内容可疑的章节，自动重新下载...")
+            others = [c for c in failed_chapters if c.get('error') not in CONTENT_ERRORS]
+            failed_chapters = others + self.retry_failed_chapters(book_id, suspicious, save_dir, thread_num)
+            # 重新下载后相邻章节的指纹可能变化，需要再复查一次
+        return failed_chapters
+
+    def _load_checkpoint(self, save_dir: str, book_id: str) -> Checkpoint:
+        """读取保存目录中的断点，书号不一致时重新创建"""
+        checkpoint = Checkpoint.load(save_dir)
+        if checkpoint and checkpoint.book_id == str(book_id):
+            return checkpoint
+        return Checkpoint(save_dir, book_id)
+
+    def _save_paused_state(self, save_dir: str, failed_chapters: List[Chapter]) -> None:
+        """暂停时保存断点和失败章节"""
+        if failed_chapters:
+            self.save_failed_chapters(save_dir, failed_chapters)
+        self.checkpoint.paused = self.is_paused
+        self.checkpoint.save()
+        state = "暂停" if self.is_paused else "停止"
+        self.crawler.log(f"下载已{state}，断点已保存，可稍后继续下载")
+
+    def _save_cover(self, save_dir: str, novel_info: Dict) -> None:
+        """下载封面保存到小说目录，生成EPUB时嵌入；已缓存的封面不重新下载"""
+        data = self.crawler.get_cover(novel_info.get('cover', ''))
+        if not data:
+            return
+        try:
+            from outputs.cover import save_cover
+            save_cover(save_dir, data)
+        except Exception as e:
+            self.crawler.log(f"保存封面失败: {str(e)}")
 
     def save_novel_info(self, save_dir: str, novel_info: Dict, start_chapter: int, end_chapter: int) -> None:
         """保存小说信息"""
@@ -234,13 +582,6 @@ class Downloader:
         with open(info_path, 'w', encoding='utf-8') as f:
             f.write(info_text)
 
-    def save_failed_chapters(self, save_dir: str, failed_chapters: List[Dict]) -> None:
-        """保存失败章节信息"""
-        failed_path = os.path.join(save_dir, 'failed_chapters.txt')
-        with open(failed_path, 'w', encoding='utf-8') as f:
-            # 按章节序号排序后保存
-            sorted_chapters = sorted(failed_chapters, 
-                                   key=lambda x: int(os.path.basename(x['save_path']).split('-')[0]))
-            for chapter in sorted_chapters:
-                f.write(f"{chapter['title']}\t{chapter['url']}\t{chapter['save_path']}\n")
-  
\ No newline at end of file
+    def save_failed_chapters(self, save_dir: str, failed_chapters: List[Chapter]) -> None:
+        """保存失败章节信息（含错误类型）"""
+        FailureJournal(save_dir).save(failed_chapters)
@@ -0,0 +1,26 @@
+from typing import Optional
+
+# 章节失败的错误类型
+ERROR_TIMEOUT = 'timeout'      # 请求超时
+ERROR_THROTTLED = 'throttled'  # 被限流（HTTP 429/503）
+ERROR_HTTP = 'http'            # 其他HTTP错误状态
+ERROR_NETWORK = 'network'      # 连接错误
+ERROR_EMPTY = 'empty'          # 正文为空
+ERROR_PARSE = 'parse'          # 页面结构无法解析
+ERROR_PLACEHOLDER = 'placeholder'  # 占位页（如“正在手打中”）
+ERROR_DUPLICATE = 'duplicate'  # 与相邻章节内容相同
+ERROR_TRUNCATED = 'truncated'  # 正文明显短于全书中位数
+ERROR_WRITE = 'write'          # 写入文件失败
+ERROR_UNKNOWN = 'unknown'
+
+class ChapterFetchError(Exception):
+    """章节获取失败，kind 为错误类型"""
+
+    def __init__(self, kind: str, message: str = '', status: Optional[int] = None):
+        super().__init__(message or kind)
+        self.kind = kind
+        self.status = status
+
+    def __reduce__(self):
+        # 保证可以在进程之间传递
+        return (self.__class__, (self.kind, str(self), self.status))
@@ -0,0 +1,82 @@
+import os
+import json
+import logging
+from typing import Dict, List
+from config import FAILED_CHAPTERS_FILE
+from utils.helpers import atomic_write, get_chapter_number
+
+LEGACY_FAILED_FILE = 'failed_chapters.txt'
+
+class FailureJournal:
+    """失败章节日志：每章一条记录，包含错误类型和重试次数"""
+
+    FIELDS = ('title', 'url', 'save_path', 'error', 'error_detail', 'attempts')
+
+    def __init__(self, save_dir: str):
+        self.save_dir = save_dir
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.save_dir, FAILED_CHAPTERS_FILE)
+
+    def save(self, failed_chapters: List[Dict]) -> None:
+        """按章节序号排序后写入日志"""
+        sorted_chapters = sorted(
+            failed_chapters,
+            key=lambda x: get_chapter_number(x.get('save_path', '')) or 0
+        )
+        lines = []
+        for chapter in sorted_chapters:
+            record = {field: chapter.get(field) for field in self.FIELDS}
+            record['index'] = get_chapter_number(chapter.get('save_path', ''))
+            record['error'] = record['error'] or 'unknown'
+            record['attempts'] = record['attempts'] or 1
+            lines.append(json.dumps(record, ensure_ascii=False))
+        atomic_write(self.path, '\n'.join(lines) + '\n')
+        # 旧格式文件已被新日志取代
+        self._remove_legacy()
+
+    def load(self) -> List[Dict]:
+        """读取失败章节，兼容旧的制表符分隔格式"""
+        chapters = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        logging.error(f"失败章节记录格式错误: {str(e)}")
+                        continue
+                    chapters.append({k: v for k, v in record.items() if v is not None})
+            return chapters
+
+        legacy_path = os.path.join(self.save_dir, LEGACY_FAILED_FILE)
+        if os.path.exists(legacy_path):
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) < 2:
+                        continue
+                    chapter = {'title': fields[0], 'url': fields[1], 'error': 'unknown'}
+                    if len(fields) >= 3:
+                        chapter['save_path'] = fields[2]
+                    chapters.append(chapter)
+        return chapters
+
+    def exists(self) -> bool:
+        return (os.path.exists(self.path) or
+                os.path.exists(os.path.join(self.save_dir, LEGACY_FAILED_FILE)))
+
+    def clear(self) -> None:
+        """删除失败章节记录"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._remove_legacy()
+
+    def _remove_legacy(self) -> None:
+        legacy_path = os.path.join(self.save_dir, LEGACY_FAILED_FILE)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
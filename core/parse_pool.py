@@ -0,0 +1,102 @@
+import os
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from queue import Queue, Empty
+from threading import Thread
+from typing import List, Optional, Tuple
+from core.errors import ChapterFetchError, ERROR_PARSE
+from core.parsing import parse_batch
+from config import PARSE_CHUNK_SIZE, PARSE_FLUSH_INTERVAL
+
+class ParsePool:
+    """多进程解析章节页面
+
+    下载线程只负责获取原始字节，解析和清理交给进程池，绕开 GIL 的限制。
+    提交的页面按批（chunk）发给子进程，减少进程间通信次数。
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = PARSE_CHUNK_SIZE,
+                 flush_interval: float = PARSE_FLUSH_INTERVAL):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.queue: Queue = Queue()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.thread: Optional[Thread] = None
+
+    def start(self) -> 'ParsePool':
+        if not self.executor:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, html: bytes, alternate: bool = False) -> Future:
+        """提交一个页面，返回解析结果的 Future"""
+        future: Future = Future()
+        self.queue.put((html, alternate, future))
+        return future
+
+    def parse(self, html: bytes, alternate: bool = False) -> str:
+        """解析一个页面并等待结果，可直接作为 Crawler.fetch_chapter 的 parser 参数"""
+        return self.submit(html, alternate).result()
+
+    def close(self) -> None:
+        if self.executor:
+            self.queue.put(None)
+            self.thread.join()
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            self.thread = None
+
+    def __enter__(self) -> 'ParsePool':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        """收集页面凑成一批后交给进程池；不足一批时最多等待 flush_interval 秒"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            chunk = [item]
+            stop = False
+            while len(chunk) < self.chunk_size:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                chunk.append(item)
+            self._dispatch(chunk)
+            if stop:
+                return
+
+    def _dispatch(self, chunk: List[Tuple[bytes, bool, Future]]) -> None:
+        futures = [future for _, _, future in chunk]
+        try:
+            batch_future = self.executor.submit(parse_batch, [(html, alt) for html, alt, _ in chunk])
+        except Exception as e:
+            logging.error(f"提交解析任务失败: {str(e)}")
+            for future in futures:
+                future.set_exception(ChapterFetchError(ERROR_PARSE, str(e)))
+            return
+        batch_future.add_done_callback(lambda f: self._resolve(f, futures))
+
+    @staticmethod
+    def _resolve(batch_future: Future, futures: List[Future]) -> None:
+        try:
+            results = batch_future.result()
+        except Exception as e:
+            for future in futures:
+                future.set_exception(ChapterFetchError(ERROR_PARSE, f"解析进程出错: {str(e)}"))
+            return
+        for future, result in zip(futures, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,60 @@
+import re
+from typing import List, Tuple, Union
+from core.errors import ChapterFetchError, ERROR_PARSE, ERROR_EMPTY
+from utils.helpers import lazy_import
+
+bs4 = lazy_import('bs4')
+
+# 正文清理规则
+CLEAN_PATTERNS = [
+    (re.compile(r'(www|http:|https:).+?com'), ''),
+    (re.compile(r'笔趣阁.*?最新章节！'), ''),
+    (re.compile(r'手机用户请访问.*?阅读！'), ''),
+    (re.compile(r'请收藏本站.*'), ''),
+    (re.compile(r'『点此报错』'), ''),
+    (re.compile(r'『加入书签』'), ''),
+    (re.compile(r'\s*<br\s*/?>\s*'), '\n'),
+    (re.compile(r'^\s+|\s+$', re.MULTILINE), ''),
+]
+
+def parse_chapter_html(html: Union[str, bytes], alternate: bool = False) -> str:
+    """从章节页面中提取并清理正文，alternate 为 True 时使用备用解析器和选择器
+
+    模块级函数，可以在进程池中执行。失败时抛出 ChapterFetchError。
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    soup = bs4.BeautifulSoup(html, 'html.parser' if alternate else 'lxml')
+
+    content_div = soup.find('div', id='chaptercontent')
+    if not content_div and alternate:
+        content_div = (soup.find('div', id='content') or
+                       soup.find('div', class_='content') or
+                       soup.find('div', id='chapterContent'))
+    if not content_div:
+        raise ChapterFetchError(ERROR_PARSE, "找不到正文容器")
+
+    # 移除不需要的元素
+    for elem in content_div.find_all(['p', 'div'], class_='readinline'):
+        elem.decompose()
+
+    # 理内容
+    content = content_div.get_text('\n', strip=True)
+    for pattern, repl in CLEAN_PATTERNS:
+        content = pattern.sub(repl, content)
+
+    if not content.strip():
+        raise ChapterFetchError(ERROR_EMPTY, "正文为空")
+    return content
+
+def parse_batch(items: List[Tuple[bytes, bool]]) -> List[Union[str, ChapterFetchError]]:
+    """批量解析章节页面，失败的章节返回异常对象（在进程池中按批执行以减少进程间通信）"""
+    results = []
+    for html, alternate in items:
+        try:
+            results.append(parse_chapter_html(html, alternate))
+        except ChapterFetchError as e:
+            results.append(e)
+        except Exception as e:
+            results.append(ChapterFetchError(ERROR_PARSE, str(e)))
+    return results
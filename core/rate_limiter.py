@@ -0,0 +1,35 @@
+import time
+from threading import Lock
+from typing import Dict
+from urllib.parse import urlparse
+
+class RateLimiter:
+    """按站点限速（令牌桶），同一个爬虫下的所有书籍共享"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.lock = Lock()
+        self.buckets: Dict[str, list] = {}  # host -> [tokens, last_time]
+
+    def wait(self, url: str) -> None:
+        """在请求前调用，必要时阻塞直到该站点有可用配额"""
+        if self.rate <= 0:
+            return
+        host = urlparse(url).netloc
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                bucket = self.buckets.setdefault(host, [float(self.burst), now])
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                delay = (1 - bucket[0]) / self.rate
+            time.sleep(delay)
+
+    def set_rate(self, rate: float) -> None:
+        """调整限速"""
+        with self.lock:
+            self.rate = rate
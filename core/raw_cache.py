@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional
+from config import NOVELS_DIR, RAW_CACHE_DIR, RAW_CACHE_MAX_BYTES, RAW_CACHE_SAVE_EVERY
+from utils.helpers import atomic_write
+
+INDEX_FILE = 'index.json'
+
+class RawCache:
+    """原始页面缓存
+
+    页面按内容的 SHA-256 保存在 objects 目录下（相同内容只存一份），
+    index.json 记录 URL 到内容哈希的映射和访问顺序；
+    总大小超过预算时按最近最少使用的顺序淘汰。
+    """
+
+    def __init__(self, root: str = os.path.join(NOVELS_DIR, RAW_CACHE_DIR),
+                 max_bytes: int = RAW_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        self.entries: Optional['OrderedDict[str, str]'] = None  # URL -> 哈希，越靠后越新
+        self.sizes: Dict[str, int] = {}  # 哈希 -> 字节数
+        self.refs: Dict[str, int] = {}  # 哈希 -> 引用该内容的URL数
+        self.total_bytes = 0
+        self._unsaved = 0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, INDEX_FILE)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def get(self, url: str) -> Optional[bytes]:
+        """读取缓存的页面，不存在或内容损坏时返回 None"""
+        with self.lock:
+            self._load()
+            digest = self.entries.get(url)
+            if digest is None:
+                return None
+            self.entries.move_to_end(url)
+            self._unsaved += 1
+        try:
+            with open(self.object_path(digest), 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = None
+        if data is None or hashlib.sha256(data).hexdigest() != digest:
+            logging.warning(f"缓存内容缺失或已损坏: {url}")
+            with self.lock:
+                if self.entries.get(url) == digest:
+                    self._drop(url)
+            return None
+        return data
+
+    def put(self, url: str, data: bytes) -> str:
+        """保存页面，返回内容哈希"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        with self.lock:
+            self._load()
+            exists = digest in self.sizes
+        if not exists:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+
+        with self.lock:
+            if self.entries.get(url) != digest:
+                if url in self.entries:
+                    self._drop(url)
+                self.entries[url] = digest
+                if digest not in self.sizes:
+                    if exists:
+                        # 相同内容在两次加锁之间被淘汰，重新写入
+                        atomic_write(path, data)
+                    self.sizes[digest] = len(data)
+                    self.total_bytes += len(data)
+                self.refs[digest] = self.refs.get(digest, 0) + 1
+            self.entries.move_to_end(url)
+            self._unsaved += 1
+            self._evict()
+            need_save = self._unsaved >= RAW_CACHE_SAVE_EVERY
+        if need_save:
+            self.flush()
+        return digest
+
+    def __contains__(self, url: str) -> bool:
+        with self.lock:
+            self._load()
+            return url in self.entries
+
+    def flush(self) -> None:
+        """把索引写入磁盘"""
+        with self.lock:
+            if self.entries is None:
+                return
+            data = json.dumps({'entries': list(self.entries.items()), 'sizes': self.sizes})
+            self._unsaved = 0
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            atomic_write(self.index_path, data)
+        except Exception as e:
+            logging.error(f"保存缓存索引失败: {str(e)}")
+
+    def _load(self) -> None:
+        """首次使用时读取索引（调用方持有锁）"""
+        if self.entries is not None:
+            return
+        self.entries = OrderedDict()
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"读取缓存索引失败: {str(e)}")
+            return
+        sizes = data.get('sizes', {})
+        for url, digest in data.get('entries', []):
+            if digest not in sizes:
+                continue
+            self.entries[url] = digest
+            self.refs[digest] = self.refs.get(digest, 0) + 1
+        self.sizes = {digest: size for digest, size in sizes.items() if digest in self.refs}
+        self.total_bytes = sum(self.sizes.values())
+
+    def _drop(self, url: str) -> None:
+        """移除一个URL，内容不再被引用时删除文件（调用方持有锁）"""
+        digest = self.entries.pop(url)
+        self.refs[digest] -= 1
+        if self.refs[digest] > 0:
+            return
+        del self.refs[digest]
+        self.total_bytes -= self.sizes.pop(digest, 0)
+        try:
+            os.remove(self.object_path(digest))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            url = next(iter(self.entries))
+            self._drop(url)
@@ -0,0 +1,317 @@
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from threading import Condition, Lock, Thread
+from typing import Callable, Dict, List, Optional
+from core.crawler import Crawler
+from core.downloader import Downloader
+from config import NOVELS_DIR, SCHEDULER_MAX_CONCURRENCY, SCHEDULER_MAX_ACTIVE_JOBS
+
+class ConcurrencyBudget:
+    """全局并发预算：多本书共享请求槽位，按权重公平分配"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.cond = Condition()
+        self.weights: Dict[str, float] = {}
+        self.in_use: Dict[str, int] = {}
+        self.waiting: Dict[str, int] = {}
+
+    def register(self, job_id: str, weight: float = 1) -> None:
+        with self.cond:
+            self.weights[job_id] = max(weight, 0.01)
+            self.in_use.setdefault(job_id, 0)
+            self.waiting.setdefault(job_id, 0)
+
+    def unregister(self, job_id: str) -> None:
+        with self.cond:
+            self.weights.pop(job_id, None)
+            self.in_use.pop(job_id, None)
+            self.waiting.pop(job_id, None)
+            self.cond.notify_all()
+
+    def _share(self, job_id: str) -> float:
+        """作业的公平份额：只在有需求的作业之间按权重分配"""
+        active = [j for j in self.weights if self.in_use[j] or self.waiting[j] or j == job_id]
+        total_weight = sum(self.weights[j] for j in active)
+        return max(1.0, self.limit * self.weights[job_id] / total_weight)
+
+    def _can_acquire(self, job_id: str) -> bool:
+        if sum(self.in_use.values()) >= self.limit:
+            return False
+        if self.in_use[job_id] < self._share(job_id):
+            return True
+        # 超出份额时，只有其他作业都不缺槽位才借用空闲槽位
+        return not any(
+            self.waiting[other] and self.in_use[other] < self._share(other)
+            for other in self.weights if other != job_id
+        )
+
+    def acquire(self, job_id: str) -> None:
+        with self.cond:
+            if job_id not in self.weights:
+                self.register(job_id)
+            self.waiting[job_id] += 1
+            while not self._can_acquire(job_id):
+                self.cond.wait()
+            self.waiting[job_id] -= 1
+            self.in_use[job_id] += 1
+
+    def release(self, job_id: str) -> None:
+        with self.cond:
+            if job_id in self.in_use:
+                self.in_use[job_id] -= 1
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self, job_id: str):
+        """占用一个请求槽位"""
+        self.acquire(job_id)
+        try:
+            yield
+        finally:
+            self.release(job_id)
+
+class DownloadJob:
+    """队列中的一本书"""
+
+    def __init__(self, job_id: str, book_id: str, start_chapter: int = 1,
+                 end_chapter: Optional[int] = None, output_format: str = "txt",
+                 priority: int = 0, weight: float = 1, thread_num: Optional[int] = None):
+        self.job_id = job_id
+        self.book_id = str(book_id)
+        self.start_chapter = start_chapter
+        self.end_chapter = end_chapter
+        self.output_format = output_format
+        self.priority = priority
+        self.weight = weight
+        self.thread_num = thread_num
+        self.status = 'queued'  # queued/running/paused/done/failed/cancelled
+        self.done = 0
+        self.total = 0
+        self.failed = 0
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.downloader: Optional[Downloader] = None
+        self.cancelled = False  # 已请求取消（运行中的作业在下载器停止后才结束）
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'book_id': self.book_id,
+            'start_chapter': self.start_chapter,
+            'end_chapter': self.end_chapter,
+            'output_format': self.output_format,
+            'priority': self.priority,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'failed': self.failed,
+        }
+
+class DownloadScheduler:
+    """多本书下载队列：按优先级调度，共享全局并发预算和站点限速"""
+
+    def __init__(self, crawler: Crawler, max_concurrency: int = SCHEDULER_MAX_CONCURRENCY,
+                 max_active_jobs: int = SCHEDULER_MAX_ACTIVE_JOBS, output_dir: str = NOVELS_DIR,
+                 on_progress: Optional[Callable[[DownloadJob], None]] = None):
+        self.crawler = crawler
+        self.max_concurrency = max_concurrency
+        self.max_active_jobs = max_active_jobs
+        self.output_dir = output_dir
+        self.on_progress = on_progress
+        self.budget = ConcurrencyBudget(max_concurrency)
+        self.cond = Condition()
+        self.queue: List = []  # (-priority, seq, job)
+        self.jobs: Dict[str, DownloadJob] = {}
+        self.active: Dict[str, Thread] = {}
+        self.seq = itertools.count(1)
+        self.running = False
+        self.loop_thread: Optional[Thread] = None
+        self.notify_lock = Lock()
+
+    def submit(self, book_id: str, start_chapter: int = 1, end_chapter: Optional[int] = None,
+               output_format: str = "txt", priority: int = 0, weight: float = 1,
+               thread_num: Optional[int] = None) -> DownloadJob:
+        """添加一本书到下载队列"""
+        with self.cond:
+            seq = next(self.seq)
+            job = DownloadJob(f"job-{seq}", book_id, start_chapter, end_chapter,
+                              output_format, priority, weight, thread_num)
+            self.jobs[job.job_id] = job
+            heapq.heappush(self.queue, (-priority, seq, job))
+            self.cond.notify_all()
+        self.crawler.log(f"已加入下载队列: 书号 {book_id}（{job.job_id}，优先级 {priority}）")
+        self._notify(job)
+        return job
+
+    def start(self) -> None:
+        """启动调度线程"""
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.loop_thread = Thread(target=self._run_loop, daemon=True)
+        self.loop_thread.start()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """停止调度：不再启动新作业，进行中的作业暂停并保存断点"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+            active = list(self.active)
+        for job_id in active:
+            self.pause(job_id)
+        if wait:
+            for thread in list(self.active.values()):
+                thread.join()
+
+    def pause(self, job_id: str) -> bool:
+        """暂停作业（保存断点），之后可用 resume 重新排队"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return False
+        with self.cond:
+            if job.status == 'queued':
+                self._remove_queued(job)
+                job.status = 'paused'
+                self._notify(job)
+                return True
+        if job.status == 'running' and job.downloader:
+            job.downloader.pause()
+            return True
+        return False
+
+    def resume(self, job_id: str) -> bool:
+        """重新排队已暂停的作业，下载会从断点继续"""
+        job = self.jobs.get(job_id)
+        if not job or job.status not in ('paused', 'failed'):
+            return False
+        with self.cond:
+            job.status = 'queued'
+            heapq.heappush(self.queue, (-job.priority, next(self.seq), job))
+            self.cond.notify_all()
+        self._notify(job)
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """取消作业"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return False
+        with self.cond:
+            if job.status in ('done', 'cancelled'):
+                return False
+            # 先标记取消：作业刚被取出、下载器还没创建时，运行线程启动前会检查这个标记
+            job.cancelled = True
+            queued = job.status in ('queued', 'paused', 'failed')
+            if queued:
+                self._remove_queued(job)
+            job.status = 'cancelled'
+            downloader = job.downloader
+        if queued:
+            self._notify(job)
+        elif downloader:
+            downloader.stop()
+        return True
+
+    def list_jobs(self) -> List[DownloadJob]:
+        with self.cond:
+            return sorted(self.jobs.values(), key=lambda j: j.created)
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """等待队列清空，返回是否全部结束"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while self.queue or self.active:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def _remove_queued(self, job: DownloadJob) -> None:
+        self.queue = [item for item in self.queue if item[2] is not job]
+        heapq.heapify(self.queue)
+
+    def _run_loop(self) -> None:
+        """调度循环：有空闲名额时取出优先级最高的作业"""
+        while True:
+            with self.cond:
+                while self.running and (not self.queue or len(self.active) >= self.max_active_jobs):
+                    self.cond.wait()
+                if not self.running:
+                    return
+                _, _, job = heapq.heappop(self.queue)
+                job.status = 'running'
+                thread = Thread(target=self._run_job, args=(job,), daemon=True)
+                self.active[job.job_id] = thread
+            thread.start()
+
+    def _run_job(self, job: DownloadJob) -> None:
+        """在独立线程中执行一个作业"""
+        downloader = Downloader(self.crawler, self.output_dir)
+        downloader.budget = self.budget
+        downloader.job_id = job.job_id
+        downloader.auto_retry = True
+        downloader.progress_callback = lambda done, total: self._on_job_progress(job, done, total)
+        with self.cond:
+            job.downloader = downloader
+            cancelled = job.cancelled
+        self.budget.register(job.job_id, job.weight)
+        self._notify(job)
+        try:
+            if cancelled:
+                return
+            ok = downloader.start_download(
+                job.book_id,
+                job.start_chapter,
+                job.end_chapter,
+                job.thread_num or self.max_concurrency,
+                job.output_format
+            )
+            job.failed = len(downloader.failed_chapters)
+            if job.cancelled:
+                pass
+            elif downloader.is_paused:
+                job.status = 'paused'
+            elif ok and not downloader.failed_chapters:
+                job.status = 'done'
+            else:
+                job.status = 'failed'
+        except Exception as e:
+            logging.error(f"队列作业 {job.job_id} 出错: {str(e)}")
+            job.status = 'failed'
+        finally:
+            if job.cancelled:
+                # 取消的作业不再继续，停止时保存的断点一并删除
+                job.status = 'cancelled'
+                if downloader.checkpoint:
+                    try:
+                        downloader.checkpoint.remove()
+                    except OSError as e:
+                        logging.error(f"删除断点失败: {str(e)}")
+            job.finished = time.time()
+            self.budget.unregister(job.job_id)
+            with self.cond:
+                self.active.pop(job.job_id, None)
+                self.cond.notify_all()
+            self._notify(job)
+
+    def _on_job_progress(self, job: DownloadJob, done: int, total: int) -> None:
+        if job.cancelled and job.downloader and job.downloader.is_downloading:
+            # 在下载器开始运行之前请求的取消，在第一次进度更新时生效
+            job.downloader.stop()
+        job.done = done
+        job.total = total
+        self._notify(job)
+
+    def _notify(self, job: DownloadJob) -> None:
+        if self.on_progress:
+            with self.notify_lock:
+                try:
+                    self.on_progress(job)
+                except Exception as e:
+                    logging.error(f"进度回调出错: {str(e)}")
@@ -0,0 +1,158 @@
+"""流式获取章节：直接在内存中逐章返回清理后的正文，不写入任何文件
+
+    from core.streaming import iter_chapters
+
+    for chapter in iter_chapters('12345', 1, 100, concurrency=5):
+        if chapter.error is None:
+            index(chapter.title, chapter.content)
+
+    async for chapter in aiter_chapters('12345', ordered=False):
+        ...
+"""
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Event
+from typing import AsyncIterator, Deque, Dict, Iterator, NamedTuple, Optional
+from core.crawler import Crawler, ChapterFetchError, ERROR_PARSE, ERROR_UNKNOWN
+from core.chapter_table import Chapter, ChapterTable
+from core.content_check import ContentChecker
+from config import RETRY_ROUNDS, RETRY_BACKOFF, RETRY_BACKOFF_MAX
+
+class ChapterText(NamedTuple):
+    """流式返回的一章"""
+    index: int
+    title: str
+    content: Optional[str]  # 清理后的正文，失败时为 None
+    error: Optional[str] = None  # 失败时的错误类型
+
+class ChapterStream:
+    """按章节序号（ordered=True）或完成顺序逐章返回正文
+
+    同时进行的请求数不超过 concurrency；已下载但尚未被取走的章节与进行中的请求合计不超过 buffer，
+    消费方处理得慢时下载会随之暂停。提前结束迭代会取消尚未开始的请求。
+    """
+
+    def __init__(self, book_id: str, start_chapter: int = 1, end_chapter: Optional[int] = None,
+                 concurrency: int = 3, ordered: bool = True, buffer: Optional[int] = None,
+                 crawler: Optional[Crawler] = None, retries: int = RETRY_ROUNDS,
+                 check_content: bool = True):
+        self.book_id = str(book_id)
+        self.start_chapter = start_chapter
+        self.end_chapter = end_chapter
+        self.concurrency = max(1, concurrency)
+        self.ordered = ordered
+        self.buffer = max(self.concurrency, buffer or self.concurrency * 2)
+        # 默认不缓存原始页面，流式获取不写入任何文件
+        self.crawler = crawler or Crawler(cache=False)
+        self.retries = retries
+        self.checker = ContentChecker() if check_content else None
+        self.closed = Event()
+        self.total = 0
+
+    def __iter__(self) -> Iterator[ChapterText]:
+        chapters = self._chapters()
+        self.total = len(chapters)
+        if not chapters:
+            return
+        queue = list(chapters)
+        queue.reverse()  # 从尾部弹出，序号小的先提交
+        running: Dict[Future, Chapter] = {}
+        ready: Dict[int, ChapterText] = {}  # 有序模式：按序号等待取走的章节
+        completed: Deque[ChapterText] = deque()  # 无序模式：按完成顺序排队的章节
+        next_index = chapters[0].index
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            while queue or running or ready or completed:
+                # 补充请求：进行中和已缓冲的章节合计不超过 buffer；
+                # 有序模式下还要保证不超过下一章之后 buffer 章的范围
+                while queue and len(running) < self.concurrency and \
+                        len(running) + len(ready) + len(completed) < self.buffer and \
+                        (not self.ordered or queue[-1].index < next_index + self.buffer):
+                    chapter = queue.pop()
+                    running[executor.submit(self._fetch, chapter)] = chapter
+
+                if self.ordered and next_index in ready:
+                    yield ready.pop(next_index)
+                    next_index += 1
+                    continue
+                if completed:
+                    yield completed.popleft()
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    chapter = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logging.error(f"获取章节 {chapter.title} 出错: {str(e)}")
+                        result = ChapterText(chapter.index, chapter.title, None, ERROR_UNKNOWN)
+                    if self.ordered:
+                        ready[result.index] = result
+                    else:
+                        completed.append(result)
+        finally:
+            # 消费方提前结束（break 或异常）时放弃尚未开始的请求
+            self.closed.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _chapters(self) -> ChapterTable:
+        all_chapters = ChapterTable.coerce(self.crawler.get_chapter_list(self.book_id))
+        end_chapter = min(self.end_chapter or len(all_chapters), len(all_chapters))
+        chapters = all_chapters[self.start_chapter - 1:end_chapter]
+        for index, chapter in enumerate(chapters, self.start_chapter):
+            chapter.index = index
+        return chapters
+
+    def _fetch(self, chapter: Chapter) -> ChapterText:
+        """获取一章，按错误类型等待后重试"""
+        url = f'{self.crawler.base_url}{chapter.url}'
+        for attempt in range(self.retries + 1):
+            if self.closed.is_set():
+                break
+            try:
+                if not self.crawler.offline:
+                    time.sleep(random.uniform(0.5, 1))
+                content = self.crawler.fetch_chapter_content(url, chapter.error == ERROR_PARSE)
+                if self.checker:
+                    self.checker.validate(chapter, content)
+                return ChapterText(chapter.index, chapter.title, content)
+            except ChapterFetchError as e:
+                chapter.error = e.kind
+                chapter.error_detail = str(e)
+            except Exception as e:
+                chapter.error = ERROR_UNKNOWN
+                chapter.error_detail = str(e)
+            base = RETRY_BACKOFF.get(chapter.error, RETRY_BACKOFF['unknown'])
+            if base and attempt < self.retries:
+                self.closed.wait(min(base * 2 ** attempt, RETRY_BACKOFF_MAX))
+        self.crawler.log(f"获取章节失败: {chapter.title} [{chapter.error}] {chapter.error_detail or ''}")
+        return ChapterText(chapter.index, chapter.title, None, chapter.error)
+
+def iter_chapters(book_id: str, start_chapter: int = 1, end_chapter: Optional[int] = None,
+                  concurrency: int = 3, ordered: bool = True, buffer: Optional[int] = None,
+                  crawler: Optional[Crawler] = None, **kwargs) -> Iterator[ChapterText]:
+    """逐章返回清理后的正文（生成器），参数见 ChapterStream"""
+    return iter(ChapterStream(book_id, start_chapter, end_chapter, concurrency, ordered, buffer,
+                              crawler, **kwargs))
+
+async def aiter_chapters(book_id: str, start_chapter: int = 1, end_chapter: Optional[int] = None,
+                         concurrency: int = 3, ordered: bool = True, buffer: Optional[int] = None,
+                         crawler: Optional[Crawler] = None, **kwargs) -> AsyncIterator[ChapterText]:
+    """iter_chapters 的异步版本，下载在线程池中进行，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    chapters = iter_chapters(book_id, start_chapter, end_chapter, concurrency, ordered, buffer,
+                             crawler, **kwargs)
+    done = object()
+    try:
+        while True:
+            chapter = await loop.run_in_executor(None, next, chapters, done)
+            if chapter is done:
+                break
+            yield chapter
+    finally:
+        await loop.run_in_executor(None, chapters.close)
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import random
+import logging
+from threading import Condition, Thread
+from typing import Callable, Dict, List, Optional
+from core.crawler import Crawler
+from core.scheduler import DownloadScheduler
+from utils.helpers import atomic_write
+from config import (WATCHLIST_FILE, WATCH_INTERVAL_INITIAL, WATCH_INTERVAL_MIN, WATCH_INTERVAL_MAX,
+                    WATCH_BACKOFF, WATCH_JITTER, WATCH_WEIGHT)
+
+WATCH_JOB_ID = 'watchlist'  # 追更检查在全局并发预算中的作业名
+
+class WatchEntry:
+    """追更列表中的一本书"""
+
+    def __init__(self, book_id: str, title: str = '', output_format: str = 'txt',
+                 chapter_count: Optional[int] = None, latest_chapter: str = '',
+                 interval: float = WATCH_INTERVAL_INITIAL, next_check: float = 0,
+                 last_checked: Optional[float] = None, last_changed: Optional[float] = None):
+        self.book_id = str(book_id)
+        self.title = title
+        self.output_format = output_format
+        self.chapter_count = chapter_count  # 上次检查时的章节数，None 表示尚未检查
+        self.latest_chapter = latest_chapter
+        self.interval = interval  # 当前检查间隔（秒）
+        self.next_check = next_check
+        self.last_checked = last_checked
+        self.last_changed = last_changed
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'WatchEntry':
+        entry = cls(data['book_id'])
+        for key, value in data.items():
+            if hasattr(entry, key):
+                setattr(entry, key, value)
+        return entry
+
+class Watchlist:
+    """追更列表：后台按自适应间隔检查连载中的书籍，发现新章节时加入下载队列
+
+    每次检查只请求一次目录页，并占用全局并发预算和站点限速；
+    经常更新的书检查间隔逐渐缩短，长期未更新的书逐渐延长，每次间隔都加入随机抖动。
+    """
+
+    def __init__(self, crawler: Crawler, scheduler: DownloadScheduler, path: str = WATCHLIST_FILE,
+                 on_update: Optional[Callable[[WatchEntry, int, int], None]] = None):
+        self.crawler = crawler
+        self.scheduler = scheduler
+        self.path = path
+        self.on_update = on_update  # 发现新章节时回调 (书籍, 起始章节, 结束章节)
+        self.cond = Condition()
+        self.entries: Dict[str, WatchEntry] = {}
+        self.running = False
+        self.thread: Optional[Thread] = None
+        self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = [WatchEntry.from_dict(item) for item in data.get('books', [])]
+            now = time.time()
+            for entry in entries:
+                if entry.next_check < now:
+                    # 程序重新启动后把过期的检查打散，避免集中请求
+                    entry.next_check = now + random.uniform(0, min(entry.interval, WATCH_INTERVAL_MIN))
+            with self.cond:
+                self.entries = {entry.book_id: entry for entry in entries}
+        except Exception as e:
+            logging.error(f"读取追更列表失败: {str(e)}")
+
+    def save(self) -> None:
+        with self.cond:
+            data = {'books': [entry.to_dict() for entry in self.entries.values()]}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False, indent=2))
+        except Exception as e:
+            logging.error(f"保存追更列表失败: {str(e)}")
+
+    def add(self, book_id: str, title: str = '', output_format: str = 'txt') -> WatchEntry:
+        """加入追更列表，首次检查只记录当前章节数，不会下载"""
+        with self.cond:
+            entry = self.entries.get(str(book_id))
+            if entry is None:
+                entry = WatchEntry(book_id, title, output_format)
+                entry.next_check = time.time() + random.uniform(0, WATCH_JITTER * WATCH_INTERVAL_MIN)
+                self.entries[entry.book_id] = entry
+            self.cond.notify_all()
+        self.save()
+        self.crawler.log(f"已加入追更列表: {title or book_id}")
+        return entry
+
+    def remove(self, book_id: str) -> bool:
+        with self.cond:
+            removed = self.entries.pop(str(book_id), None) is not None
+        if removed:
+            self.save()
+        return removed
+
+    def list_books(self) -> List[WatchEntry]:
+        with self.cond:
+            return sorted(self.entries.values(), key=lambda e: e.next_check)
+
+    def start(self) -> None:
+        """启动后台检查线程"""
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.scheduler.budget.register(WATCH_JOB_ID, WATCH_WEIGHT)
+        self.thread = Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.scheduler.budget.unregister(WATCH_JOB_ID)
+        self.save()
+
+    def _run_loop(self) -> None:
+        while True:
+            with self.cond:
+                while self.running:
+                    due = min(self.entries.values(), key=lambda e: e.next_check, default=None)
+                    if due is not None and due.next_check <= time.time():
+                        break
+                    self.cond.wait(None if due is None else due.next_check - time.time())
+                if not self.running:
+                    return
+            self.check(due)
+            self.save()
+
+    def check(self, entry: WatchEntry) -> bool:
+        """检查一本书，有新章节时加入下载队列并返回 True"""
+        with self.scheduler.budget.slot(WATCH_JOB_ID):
+            chapters = self.crawler.get_chapter_list(entry.book_id)
+        now = time.time()
+        entry.last_checked = now
+        if not chapters:
+            # 请求失败：保持间隔，稍后再试
+            self._schedule(entry, now)
+            return False
+
+        count = len(chapters)
+        latest = chapters[count - 1].title
+        changed = entry.chapter_count is not None and \
+            (count != entry.chapter_count or latest != entry.latest_chapter)
+        if changed and count > entry.chapter_count:
+            start_chapter = entry.chapter_count + 1
+            self.crawler.log(f"追更: {entry.title or entry.book_id} 新增第{start_chapter}-{count}章")
+            self.scheduler.submit(entry.book_id, start_chapter, count, entry.output_format)
+            if self.on_update:
+                self.on_update(entry, start_chapter, count)
+
+        if changed:
+            entry.last_changed = now
+            entry.interval = max(WATCH_INTERVAL_MIN, entry.interval / WATCH_BACKOFF)
+        elif entry.chapter_count is not None:
+            entry.interval = min(WATCH_INTERVAL_MAX, entry.interval * WATCH_BACKOFF)
+        entry.chapter_count = count
+        entry.latest_chapter = latest
+        self._schedule(entry, now)
+        return changed
+
+    @staticmethod
+    def _schedule(entry: WatchEntry, now: float) -> None:
+        """按当前间隔加随机抖动安排下次检查，避免大量书籍同时请求"""
+        jitter = random.uniform(1 - WATCH_JITTER, 1 + WATCH_JITTER)
+        entry.next_check = now + entry.interval * jitter
@@ -0,0 +1,109 @@
+import os
+import logging
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Thread
+from typing import List, Optional, Tuple
+from utils.helpers import atomic_write
+from config import WRITER_QUEUE_SIZE, WRITER_BATCH_SIZE, WRITER_FSYNC
+
+FSYNC_POLICIES = ('none', 'file', 'batch')
+
+class ChapterWriter:
+    """独立的章节写入线程
+
+    下载线程把章节文本放入有界队列后立即返回，只有队列满时才会等待；
+    写入线程按批取出并原子写入（临时文件 + 重命名），不会留下半截文件。
+    """
+
+    def __init__(self, queue_size: int = WRITER_QUEUE_SIZE, batch_size: int = WRITER_BATCH_SIZE,
+                 fsync: str = WRITER_FSYNC):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"未知的落盘策略: {fsync}")
+        self.queue: Queue = Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.thread: Optional[Thread] = None
+
+    def start(self) -> 'ChapterWriter':
+        if not self.thread:
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, path: str, data: str) -> Future:
+        """提交写入任务，返回写入完成时结束的 Future（队列满时阻塞）"""
+        future: Future = Future()
+        self.queue.put((path, data.encode('utf-8'), future))
+        return future
+
+    def close(self) -> None:
+        """写完队列中剩余的章节后停止写入线程"""
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self) -> 'ChapterWriter':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Tuple[str, bytes, Future]]) -> None:
+        """原子写入一批章节"""
+        dirs = set()
+        for path, data, future in batch:
+            try:
+                atomic_write(path, data, fsync=self.fsync != 'none')
+                dirs.add(os.path.dirname(path) or '.')
+                if self.fsync == 'file':
+                    self._fsync_dir(os.path.dirname(path) or '.')
+            except Exception as e:
+                logging.error(f"写入章节文件 {path} 失败: {str(e)}")
+                future.set_exception(e)
+                continue
+            if self.fsync != 'batch':
+                future.set_result(True)
+
+        if self.fsync == 'batch':
+            # 整批文件写完后每个目录只落盘一次
+            for dir_name in dirs:
+                self._fsync_dir(dir_name)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(True)
+
+    @staticmethod
+    def _fsync_dir(dir_name: str) -> None:
+        """目录落盘，保证重命名持久化（部分平台不支持）"""
+        try:
+            fd = os.open(dir_name, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -4,6 +4,11 @@ from threading import Thread
 from typing import Optional
 from core.crawler import Crawler
 from core.downloader import Downloader
+from core.scheduler import DownloadScheduler, DownloadJob
+from core.watchlist import Watchlist
+from core.failure_journal import FailureJournal
+from utils.helpers import clean_filename
+from config import READ_AHEAD_WINDOW
 import os
 
 class SearchDialog(tk.Toplevel):
@@ -122,6 +127,7 @@ class MainWindow:
         # 初始化变量
         self.download_all = tk.BooleanVar(value=True)
         self.output_format = tk.StringVar(value="txt")
+        self.read_order = tk.BooleanVar(value=False)
         self.is_downloading = False
         self.download_thread: Optional[Thread] = None
         self.current_book_id: Optional[str] = None
@@ -131,6 +137,8 @@ class MainWindow:
         # 创建爬虫和下载器实例
         self.crawler = Crawler(self)
         self.downloader = Downloader(self.crawler)
+        self.scheduler: Optional[DownloadScheduler] = None
+        self.watchlist: Optional[Watchlist] = None
 
         self._init_ui()
 
@@ -408,6 +416,8 @@ class MainWindow:
                        variable=self.output_format, value="txt").pack(side=tk.LEFT, padx=20)
         ttk.Radiobutton(format_frame, text="EPUB电子书",
                        variable=self.output_format, value="epub").pack(side=tk.LEFT)
+        ttk.Checkbutton(format_frame, text="按阅读顺序优先下载",
+                       variable=self.read_order).pack(side=tk.LEFT, padx=20)
 
     def _create_button_frame(self, parent):
         """创建按钮区域"""
@@ -422,6 +432,22 @@ class MainWindow:
                                   command=self.retry_failed, state='disabled', width=15)
         self.retry_btn.pack(side=tk.LEFT, padx=5)
 
+        self.pause_btn = ttk.Button(button_frame, text="暂停/继续",
+                                  command=self.toggle_pause, width=15)
+        self.pause_btn.pack(side=tk.LEFT, padx=5)
+
+        self.queue_btn = ttk.Button(button_frame, text="加入队列",
+                                  command=self.add_to_queue, width=15)
+        self.queue_btn.pack(side=tk.LEFT, padx=5)
+
+        self.watch_btn = ttk.Button(button_frame, text="加入追更",
+                                  command=self.add_to_watchlist, width=15)
+        self.watch_btn.pack(side=tk.LEFT, padx=5)
+
+        self.reprocess_btn = ttk.Button(button_frame, text="从缓存重新生成",
+                                  command=self.reprocess_from_cache, width=15)
+        self.reprocess_btn.pack(side=tk.LEFT, padx=5)
+
     def _create_progress_frame(self, parent):
         """创建进度显示区域"""
         progress_frame = ttk.LabelFrame(parent, text="下载进度", padding="10")
@@ -569,6 +595,15 @@ class MainWindow:
         # 保存当前书号
         self.current_book_id = book_id
 
+        # 预读模式：优先下载靠前的章节，连续可读时即时提示
+        if self.read_order.get():
+            self.downloader.read_ahead = READ_AHEAD_WINDOW
+            self.downloader.chapter_ready_callback = lambda index, chapter: self.window.after(
+                0, self.log, f"可阅读: {chapter['title']}")
+        else:
+            self.downloader.read_ahead = None
+            self.downloader.chapter_ready_callback = None
+
         # 启动下载
         self.is_downloading = True
         self.downloader.is_downloading = True
@@ -579,6 +614,115 @@ class MainWindow:
         )
         self.download_thread.start()
 
+    def toggle_pause(self):
+        """暂停当前下载，或从断点继续下载"""
+        if self.download_thread and self.download_thread.is_alive():
+            self.downloader.pause()
+            self.is_downloading = False
+            return
+
+        book_id = self.book_id.get().strip() or self.current_book_id
+        if not book_id or not book_id.isdigit():
+            messagebox.showerror("错误", "请输入正确的书号（纯数字）")
+            return
+
+        self.progress["value"] = 0
+        self.status["text"] = ""
+        self.current_book_id = book_id
+        self.is_downloading = True
+        self.download_thread = Thread(
+            target=self.downloader.resume,
+            args=(book_id,),
+            daemon=True
+        )
+        self.download_thread.start()
+
+    def reprocess_from_cache(self):
+        """修改解析规则后，用缓存的原始页面重新生成整本书"""
+        if self.download_thread and self.download_thread.is_alive():
+            messagebox.showwarning("提示", "请等待当前下载完成")
+            return
+
+        book_id = self.book_id.get().strip() or self.current_book_id
+        if not book_id or not book_id.isdigit():
+            messagebox.showerror("错误", "请输入正确的书号（纯数字）")
+            return
+
+        start_chapter, end_chapter = 1, None
+        if not self.download_all.get():
+            try:
+                start_chapter = int(self.start_chapter.get())
+                end_chapter = int(self.end_chapter.get())
+            except ValueError:
+                messagebox.showerror("错误", "请输入正确的章节范围")
+                return
+
+        self.log_text.delete(1.0, tk.END)
+        self.progress["value"] = 0
+        self.status["text"] = ""
+        self.current_book_id = book_id
+        self.is_downloading = True
+        self.download_thread = Thread(
+            target=self.downloader.reprocess_from_cache,
+            args=(book_id, start_chapter, end_chapter, int(self.thread_num.get()), self.output_format.get()),
+            daemon=True
+        )
+        self.download_thread.start()
+
+    def add_to_queue(self):
+        """把当前书号加入批量下载队列"""
+        book_id = self.book_id.get().strip()
+        if not book_id.isdigit():
+            messagebox.showerror("错误", "请输入正确的书号（纯数字）")
+            return
+
+        start_chapter, end_chapter = 1, None
+        if not self.download_all.get():
+            try:
+                start_chapter = int(self.start_chapter.get())
+                end_chapter = int(self.end_chapter.get())
+            except ValueError:
+                messagebox.showerror("错误", "请输入正确的章节范围")
+                return
+
+        self._ensure_scheduler().submit(book_id, start_chapter, end_chapter, self.output_format.get())
+
+    def _ensure_scheduler(self) -> DownloadScheduler:
+        """首次使用时创建并启动下载队列"""
+        if not self.scheduler:
+            self.scheduler = DownloadScheduler(
+                self.crawler,
+                on_progress=lambda job: self.window.after(0, self.update_job_progress, job)
+            )
+            self.scheduler.start()
+        return self.scheduler
+
+    def add_to_watchlist(self):
+        """把当前书号加入追更列表，后台发现新章节时自动加入下载队列"""
+        book_id = self.book_id.get().strip()
+        if not book_id.isdigit():
+            messagebox.showerror("错误", "请输入正确的书号（纯数字）")
+            return
+
+        if not self.watchlist:
+            self.watchlist = Watchlist(self.crawler, self._ensure_scheduler())
+            self.watchlist.start()
+        title = self.novel_info.get('title', '') if self.novel_info else ''
+        self.watchlist.add(book_id, title, self.output_format.get())
+
+    def update_job_progress(self, job: DownloadJob):
+        """显示队列作业进度"""
+        jobs = self.scheduler.list_jobs()
+        finished = sum(1 for j in jobs if j.status in ('done', 'failed', 'cancelled'))
+        self.status["text"] = (
+            f"队列: {finished}/{len(jobs)} 本完成 | "
+            f"书号 {job.book_id}: {job.done}/{job.total} ({job.status})"
+        )
+        if job.total:
+            self.progress["value"] = job.done / job.total * 100
+        if job.status in ('done', 'failed', 'paused', 'cancelled'):
+            self.log(f"[队列] 书号 {job.book_id} {job.status}，完成 {job.done}/{job.total} 章")
+
     def retry_failed(self):
         """重试失败的章节"""
         if not self.current_book_id or not self.novel_info:
@@ -589,22 +733,18 @@ class MainWindow:
             messagebox.showwarning("提示", "请等待当前下载完成")
             return
 
-        # 获取失败章节文件路径
-        novel_title = self.novel_info.get('title', '')
-        novel_title = self.crawler.clean_filename(novel_title)
-        failed_file = os.path.join('.', 'novels', novel_title, 'failed_chapters.txt')
+        # 获取失败章节记录
+        novel_title = clean_filename(self.novel_info.get('title', ''))
+        save_dir = os.path.join(self.downloader.output_dir, novel_title)
+        journal = FailureJournal(save_dir)
         
-        if not os.path.exists(failed_file):
+        if not journal.exists():
             messagebox.showinfo("提示", "没有发现失败章节记录")
             return
 
         try:
             # 读取失败章节信息
-            with open(failed_file, 'r', encoding='utf-8') as f:
-                failed_chapters = []
-                for line in f:
-                    title, url = line.strip().split('\t')
-                    failed_chapters.append({'title': title, 'url': url})
+            failed_chapters = journal.load()
 
             if not failed_chapters:
                 messagebox.showinfo("提示", "没有需要重试的章节")
@@ -626,8 +766,8 @@ class MainWindow:
                 args=(
                     self.current_book_id,
                     failed_chapters,
-                    thread_num,
-                    self.output_format.get()
+                    save_dir,
+                    thread_num
                 ),
                 daemon=True
             )
@@ -651,8 +791,8 @@ class MainWindow:
         """询问是否要重试失败的章节"""
         return messagebox.askyesno(
             "下载失败",
-            "有章节下载失败，是否使用单线程重试下载失败的章节？\n\n" +
-            "单线程下载可能会更稳定，但速度较慢。",
+            "有章节下载失败，是否重试下载失败的章节？\n\n" +
+            "将按失败原因分别处理：超时立即重试，被限流时逐步延长等待，解析失败时换用备用解析器。",
             icon='question'
         )
 
@@ -10,7 +10,6 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from utils.helpers import setup_logging
-from gui.main_window import MainWindow
 
 def handle_exception(exc_type, exc_value, exc_traceback):
     """处理未捕获的异常"""
@@ -27,6 +26,9 @@ def main():
     os.makedirs('novels', exist_ok=True)
     
     try:
+        # 图形界面（tkinter）在这里才导入，导入本模块不会加载它
+        from gui.main_window import MainWindow
+
         # 创建并运行主窗口
         window = MainWindow()
         window.run()
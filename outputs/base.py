@@ -1,14 +1,78 @@
+import os
+import glob
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+from core.chapter_index import ChapterIndex, IndexEntry
+from core.chapter_table import ChapterTable
+from utils.helpers import get_chapter_number, stripped_range
+
+def read_chapter_bytes(file_path: str) -> bytes:
+    """读取章节文件去掉首尾空白后的字节"""
+    offset, length = stripped_range(file_path)
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+def split_chapter(content: str) -> Tuple[str, str]:
+    """把章节文件的文本拆分为 (标题, 正文)，正文为两条分隔线之间的内容"""
+    title, _, rest = content.partition('\n')
+    head, separator, body = rest.partition('='*40)
+    if not separator:
+        # 没有分隔线（手工整理的章节文件），标题之后的内容都是正文
+        return title, rest.strip()
+    return title, body.partition('='*40)[0].strip()
 
 class BaseOutput(ABC):
     """输出格式的基类"""
-    
-    def __init__(self, save_dir: str, book_info: Dict):
+
+    def __init__(self, save_dir: str, book_info: Dict, chapters: Optional[ChapterTable] = None,
+                 index: Optional[ChapterIndex] = None):
         self.save_dir = save_dir
         self.book_info = book_info
+        self.chapters = chapters
+        if index is None:
+            index = ChapterIndex.build(save_dir, chapters) if chapters is not None else \
+                ChapterIndex.load(save_dir)
+        self.index = index
+
+    def get_chapter_entries(self, start_index: Optional[int] = None,
+                            end_index: Optional[int] = None) -> List[IndexEntry]:
+        """按章节顺序返回章节索引项，可指定序号范围
+
+        直接使用章节索引；只有旧版本下载、没有索引的目录才扫描目录并按文件名中的序号排序
+        """
+        if self.index is not None:
+            return self.index.select(start_index, end_index)
+        entries = []
+        for path in glob.glob(os.path.join(self.save_dir, '[0-9]*.txt')):
+            name = os.path.basename(path)
+            title = os.path.splitext(name)[0].partition('-')[2]
+            entries.append(IndexEntry(get_chapter_number(path) or 0, title, name, os.path.getsize(path)))
+        entries.sort(key=lambda e: e.index)
+        if start_index is not None and end_index is not None:
+            entries = [e for e in entries if start_index <= e.index <= end_index]
+        return entries
+
+    def get_chapter_files(self, start_index: Optional[int] = None,
+                          end_index: Optional[int] = None) -> List[str]:
+        """按章节顺序返回章节文件，可指定序号范围"""
+        return [self.chapter_path(entry) for entry in self.get_chapter_entries(start_index, end_index)]
+
+    def chapter_path(self, entry: IndexEntry) -> str:
+        return os.path.join(self.save_dir, entry.file)
+
+    def remove_chapter_files(self, chapter_files: List[str]) -> None:
+        """删除已合并的章节文件和章节索引"""
+        for file_path in chapter_files:
+            try:
+                os.remove(file_path)
+            except Exception as e:
+                logging.error(f"删除章节文件 {file_path} 时出错: {str(e)}")
+        if self.index is not None:
+            self.index.remove()
 
     @abstractmethod
     def convert(self) -> bool:
         """转换文件格式"""
-        pass 
\ No newline at end of file
+        pass
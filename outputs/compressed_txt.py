@@ -0,0 +1,219 @@
+import os
+import bz2
+import gzip
+import json
+import lzma
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from core.chapter_index import IndexEntry
+from outputs.base import BaseOutput, read_chapter_bytes
+from outputs.txt_output import CHAPTER_SEPARATOR, book_header, range_line
+from utils.helpers import atomic_write, write_all
+from config import COMPRESS_LEVEL, COMPRESS_CHUNK_SIZE, MERGED_INDEX_SUFFIX
+
+class Codec(NamedTuple):
+    compress: Callable[[bytes, int], bytes]
+    decompress: Callable[[bytes], bytes]
+    default_level: int
+
+# 每个块单独压缩成一个完整的 gzip 成员 / bz2 流 / xz 流，
+# 多个块直接拼接后仍是合法的压缩文件，可以用 gunzip、bunzip2、xz 等工具整体解压
+CODECS: Dict[str, Codec] = {
+    'gz': Codec(lambda data, level: gzip.compress(data, level, mtime=0), gzip.decompress, 6),
+    'bz2': Codec(lambda data, level: bz2.compress(data, level), bz2.decompress, 9),
+    'xz': Codec(lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 6),
+}
+
+class CompressedTxtOutput(BaseOutput):
+    """压缩TXT输出：合并时边读取章节边按块压缩写入，不生成未压缩的中间文件
+
+    旁边的 .idx.json 记录每个块的位置和每章所在的块，读取单章时只需解压一个块
+    """
+
+    def __init__(self, save_dir: str, book_info: Dict, chapters=None, index=None,
+                 codec: str = 'gz', level: Optional[int] = COMPRESS_LEVEL,
+                 chunk_size: int = COMPRESS_CHUNK_SIZE):
+        super().__init__(save_dir, book_info, chapters, index)
+        if codec not in CODECS:
+            raise ValueError(f"不支持的压缩格式: {codec}")
+        self.codec = codec
+        self.level = level
+        self.chunk_size = chunk_size
+
+    def output_path(self, range_text: str = '') -> str:
+        return os.path.join(self.save_dir, f'{self.book_info.get("title", "novel")}{range_text}.txt.{self.codec}')
+
+    def convert(self) -> bool:
+        """将所有章节合并压缩为单个文件，完成后删除章节文件"""
+        try:
+            entries = self.get_chapter_entries()
+            if not entries:
+                logging.error("没有找到任何章节文件")
+                return False
+            written = self._write(self.output_path('_完整版'), book_header(self.book_info), entries)
+            if len(written) < len(entries):
+                # 有章节没有写入压缩文件，保留全部章节文件以便重新生成
+                logging.error(f"{len(entries) - len(written)} 个章节读取失败，已保留章节文件")
+                return False
+            self.remove_chapter_files([self.chapter_path(entry) for entry in written])
+            return True
+        except Exception as e:
+            logging.error(f"生成压缩TXT文件失败: {str(e)}")
+            return False
+
+    def merge_chapters(self, start_index: int, end_index: int) -> bool:
+        """合并压缩指定范围的章节，保留章节文件"""
+        try:
+            entries = self.get_chapter_entries(start_index, end_index)
+            if not entries:
+                logging.error("指定范围内没有找到任何章节文件")
+                return False
+            written = self._write(self.output_path(f'_{start_index}-{end_index}'),
+                                  book_header(self.book_info, range_line(start_index, end_index)), entries)
+            return len(written) == len(entries)
+        except Exception as e:
+            logging.error(f"合并压缩章节失败: {str(e)}")
+            return False
+
+    def _write(self, output_path: str, header: str, entries: List[IndexEntry]) -> List[IndexEntry]:
+        """写入压缩文件，返回实际写入的章节（读取失败的章节跳过）"""
+        written: List[IndexEntry] = []
+        writer = CompressedTxtWriter(output_path, header, self.book_info, self.codec, self.level,
+                                     self.chunk_size)
+        try:
+            for entry in entries:
+                file_path = self.chapter_path(entry)
+                try:
+                    content = read_chapter_bytes(file_path)
+                except Exception as e:
+                    logging.error(f"处理章节文件 {file_path} 时出错: {str(e)}")
+                    continue
+                writer.add(entry, content)
+                written.append(entry)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        return written
+
+class CompressedTxtWriter:
+    """逐章按块压缩写入，关闭时在同名的 .idx.json 中写入块索引"""
+
+    def __init__(self, output_path: str, header: str, book_info: Dict, codec: str = 'gz',
+                 level: Optional[int] = COMPRESS_LEVEL, chunk_size: int = COMPRESS_CHUNK_SIZE):
+        if codec not in CODECS:
+            raise ValueError(f"不支持的压缩格式: {codec}")
+        self.output_path = output_path
+        self.book_info = book_info
+        self.codec = codec
+        self.level = CODECS[codec].default_level if level is None else level
+        self.chunk_size = chunk_size
+        self.chunks: List[List[int]] = []  # [压缩后偏移, 压缩后字节数]
+        self.chapters: List[list] = []  # [序号, 标题, 块号, 块内偏移, 字节数]
+        self.buffer = bytearray(header.encode('utf-8'))
+        self.header_length = len(self.buffer)
+        self.position = 0
+        self.file = open(output_path, 'wb', buffering=0)
+
+    def add(self, entry: IndexEntry, content: bytes) -> None:
+        """追加一章已去掉首尾空白的内容"""
+        # 章节不跨块：放不下时先压缩当前块
+        if self.buffer and len(self.buffer) + len(content) > self.chunk_size:
+            self._flush()
+        self.chapters.append([entry.index, entry.title, len(self.chunks), len(self.buffer), len(content)])
+        self.buffer += content
+        self.buffer += CHAPTER_SEPARATOR
+
+    def _flush(self) -> None:
+        if not self.buffer:
+            return
+        data = CODECS[self.codec].compress(bytes(self.buffer), self.level)
+        write_all(self.file, data)
+        self.chunks.append([self.position, len(data)])
+        self.position += len(data)
+        self.buffer.clear()
+
+    def close(self) -> str:
+        self._flush()
+        self.file.close()
+        index = {
+            'book': {key: self.book_info.get(key, '') for key in ('title', 'author', 'status', 'intro')},
+            'codec': self.codec,
+            'size': self.position,
+            'header': self.header_length,
+            'chunks': self.chunks,
+            'chapters': self.chapters,
+        }
+        atomic_write(self.output_path + MERGED_INDEX_SUFFIX, json.dumps(index, ensure_ascii=False))
+        return self.output_path
+
+    def abort(self) -> None:
+        """放弃写入，删除未完成的文件"""
+        self.file.close()
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
+
+class CompressedChapter(NamedTuple):
+    index: int
+    title: str
+    chunk: int
+    offset: int  # 块内（解压后）的偏移
+    length: int
+
+class CompressedTxt:
+    """按块索引随机读取压缩TXT中的章节"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + MERGED_INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.book_info: Dict = data.get('book', {})
+        self.codec = CODECS[data['codec']]
+        self.chunks: List[Tuple[int, int]] = [tuple(chunk) for chunk in data['chunks']]
+        self.chapters = [CompressedChapter(*item) for item in data['chapters']]
+        self._numbers = [chapter.index for chapter in self.chapters]
+        self._file = open(path, 'rb')
+        if os.fstat(self._file.fileno()).st_size != data['size']:
+            self._file.close()
+            raise ValueError(f"块索引与文件不一致（文件已被修改）: {path}")
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'CompressedTxt':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def read_chunk(self, number: int) -> bytes:
+        offset, length = self.chunks[number]
+        self._file.seek(offset)
+        return self.codec.decompress(self._file.read(length))
+
+    def chapter(self, index: int) -> Optional[str]:
+        """读取单章正文（含标题行），只解压所在的块"""
+        position = bisect_left(self._numbers, index)
+        if position == len(self._numbers) or self._numbers[position] != index:
+            return None
+        chapter = self.chapters[position]
+        data = self.read_chunk(chapter.chunk)
+        return data[chapter.offset:chapter.offset + chapter.length].decode('utf-8')
+
+    def read_range(self, start_index: int, end_index: int) -> Optional[bytes]:
+        """读取范围内的章节（含章节之间的分隔），只解压涉及的块"""
+        first = bisect_left(self._numbers, start_index)
+        last = bisect_right(self._numbers, end_index) - 1
+        if first > last:
+            return None
+        head, tail = self.chapters[first], self.chapters[last]
+        parts = []
+        for number in range(head.chunk, tail.chunk + 1):
+            data = self.read_chunk(number)
+            start = head.offset if number == head.chunk else 0
+            end = tail.offset + tail.length + len(CHAPTER_SEPARATOR) if number == tail.chunk else len(data)
+            parts.append(data[start:end])
+        return b''.join(parts)
@@ -0,0 +1,58 @@
+import io
+import os
+import logging
+from typing import Optional
+from utils.helpers import atomic_write, image_type
+from config import COVER_FILE, COVER_MAX_WIDTH
+
+# 小说目录中可能存在的封面扩展名
+COVER_EXTENSIONS = ('.jpg', '.png', '.gif', '.webp')
+
+def downscale_image(data: bytes, max_width: int = COVER_MAX_WIDTH) -> bytes:
+    """把宽度超过 max_width 的图片等比缩小并转为 JPEG
+
+    需要 Pillow；没有安装、max_width 为 0 或图片无法解析时原样返回
+    """
+    if not max_width:
+        return data
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width <= max_width:
+                return data
+            height = max(1, round(image.height * max_width / image.width))
+            resized = image.convert('RGB').resize((max_width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, 'JPEG', quality=85, optimize=True)
+        return output.getvalue()
+    except Exception as e:
+        logging.warning(f"缩放封面失败，使用原图: {str(e)}")
+        return data
+
+def find_cover(save_dir: str) -> Optional[str]:
+    """小说目录中已保存的封面文件"""
+    for ext in COVER_EXTENSIONS:
+        path = os.path.join(save_dir, f'{COVER_FILE}{ext}')
+        if os.path.exists(path):
+            return path
+    return None
+
+def save_cover(save_dir: str, data: bytes, max_width: int = COVER_MAX_WIDTH) -> Optional[str]:
+    """把封面（按需缩小）保存到小说目录，生成EPUB时嵌入；不是图片时返回 None"""
+    data = downscale_image(data, max_width)
+    kind = image_type(data)
+    if not kind:
+        return None
+    path = os.path.join(save_dir, f'{COVER_FILE}{kind[1]}')
+    # 换了格式时删除旧的封面文件
+    old_path = find_cover(save_dir)
+    atomic_write(path, data)
+    if old_path and old_path != path:
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+    return path
@@ -1,104 +1,404 @@
 import os
-import glob
-import re
-from ebooklib import epub
-from typing import Dict
-from outputs.base import BaseOutput
-from utils.helpers import get_chapter_number
 import logging
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from html import escape
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+from core.chapter_index import IndexEntry
+from outputs.base import BaseOutput, read_chapter_bytes, split_chapter
+from outputs.cover import find_cover
+from outputs.epub_writer import EpubWriter, read_package
+from utils.helpers import image_type
+from config import (EPUB_VOLUME_CHAPTERS, EPUB_VOLUME_MB, EPUB_BUILD_WORKERS, EPUB_COMPRESSION,
+                    EPUB_COMPRESS_LEVEL, EPUB_RENDER_BATCH)
+
+# 默认CSS样式
+STYLE = '''
+    @namespace epub "http://www.idpf.org/2007/ops";
+    body { font-family: SimSun, serif; }
+    h1 { text-align: center; padding: 10px; }
+    p { text-indent: 2em; line-height: 1.5; margin: 0.5em 0; }
+    div.cover { text-align: center; }
+    div.cover img { max-width: 100%; max-height: 100%; }
+'''
+
+def split_volumes(entries: List[IndexEntry], max_chapters: int = 0,
+                  max_bytes: int = 0) -> List[List[IndexEntry]]:
+    """按章节数或字节数把章节分卷，两个上限都为 0 时不分卷"""
+    volumes: List[List[IndexEntry]] = []
+    current: List[IndexEntry] = []
+    size = 0
+    for entry in entries:
+        if current and ((max_chapters and len(current) >= max_chapters) or
+                        (max_bytes and size + entry.length > max_bytes)):
+            volumes.append(current)
+            current, size = [], 0
+        current.append(entry)
+        size += entry.length
+    if current:
+        volumes.append(current)
+    return volumes
+
+def render_chapter(content: bytes) -> Tuple[str, str]:
+    """把章节文件内容转换为 (标题, 正文 HTML)，正文按行分段并转义"""
+    title, text = split_chapter(content.decode('utf-8'))
+    formatted_text = escape(text).replace("\n", "</p><p>")
+    return title, f'<h1>{escape(title)}</h1><p>{formatted_text}</p>'
+
+def render_batch(contents: List[bytes]) -> List[Tuple[str, str]]:
+    """在子进程中渲染一批章节"""
+    return [render_chapter(content) for content in contents]
+
+class RenderedChapter(NamedTuple):
+    entry: IndexEntry
+    title: str
+    body: str  # 已转义的正文 HTML
+
+class ChapterRenderer:
+    """在进程池中按批渲染章节 XHTML，结果按送入的顺序（即阅读顺序）返回
+
+    feed 送入一章，返回已经渲染好、可以按顺序写入的章节；flush 等待剩余的批次。
+    进行中的批次数有上限，读取比渲染快时会等待，内存占用不随章节数增长。
+    workers 不大于 1 时不启动进程，直接在当前线程渲染。
+    """
+
+    def __init__(self, workers: Optional[int] = EPUB_BUILD_WORKERS, batch_size: int = EPUB_RENDER_BATCH):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.batch: List[Tuple[IndexEntry, bytes]] = []
+        self.pending: Deque[Tuple[List[IndexEntry], Future]] = deque()
+
+    def __enter__(self) -> 'ChapterRenderer':
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.executor:
+            for _, future in self.pending:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.batch.clear()
+        self.pending.clear()
+
+    def feed(self, entry: IndexEntry, content: bytes) -> List[RenderedChapter]:
+        if not self.executor:
+            return [RenderedChapter(entry, *render_chapter(content))]
+        self.batch.append((entry, content))
+        if len(self.batch) >= self.batch_size:
+            self._submit()
+        ready: List[RenderedChapter] = []
+        # 每个进程最多两批在途，超过时等待最早的一批
+        while len(self.pending) > self.workers * 2:
+            ready.extend(self._collect())
+        while self.pending and self.pending[0][1].done():
+            ready.extend(self._collect())
+        return ready
+
+    def flush(self) -> List[RenderedChapter]:
+        """提交未满的批次并等待全部结果"""
+        if self.batch:
+            self._submit()
+        ready: List[RenderedChapter] = []
+        while self.pending:
+            ready.extend(self._collect())
+        return ready
+
+    def _submit(self) -> None:
+        entries = [entry for entry, _ in self.batch]
+        contents = [content for _, content in self.batch]
+        self.pending.append((entries, self.executor.submit(render_batch, contents)))
+        self.batch = []
+
+    def _collect(self) -> List[RenderedChapter]:
+        entries, future = self.pending.popleft()
+        return [RenderedChapter(entry, title, body) for entry, (title, body) in zip(entries, future.result())]
+
+def volume_metadata(book_info: Dict, volume: int = 1, volume_count: int = 1) -> Dict[str, str]:
+    """一卷的元数据，分卷时书名带卷号并记录系列"""
+    title = book_info.get('title', 'Unknown Title')
+    metadata = {
+        'identifier': f'novel_{book_info.get("title", "unknown")}',
+        'title': title,
+        'author': book_info.get('author', 'Unknown Author'),
+    }
+    if volume_count > 1:
+        metadata.update(identifier=f'{metadata["identifier"]}_{volume}', title=f'{title} 第{volume}卷',
+                        series=title, series_index=str(volume))
+    return metadata
+
+def open_volume(epub_path: str, book_info: Dict, volume: int = 1, volume_count: int = 1,
+                compression: str = EPUB_COMPRESSION, level: int = EPUB_COMPRESS_LEVEL,
+                cover: Optional[str] = None) -> EpubWriter:
+    """创建一卷EPUB并写入封面（cover 为图片文件）和简介，各卷共用书名、作者、封面等信息"""
+    writer = EpubWriter(epub_path, volume_metadata(book_info, volume, volume_count), STYLE, compression, level)
+    if cover:
+        add_cover(writer, cover)
+    intro = escape(book_info.get('intro', '')).replace("\n", "</p><p>")
+    writer.add_document('intro', 'intro.xhtml', '简介', f'<h1>简介</h1><p>{intro}</p>')
+    return writer
+
+def add_cover(writer: EpubWriter, cover: str) -> None:
+    """嵌入封面图片并在最前面加一页封面，无法识别的图片跳过"""
+    with open(cover, 'rb') as f:
+        data = f.read()
+    kind = image_type(data)
+    if not kind:
+        logging.warning(f"封面文件不是可识别的图片: {cover}")
+        return
+    media_type, ext = kind
+    writer.add_item('cover', f'cover{ext}', data, media_type, properties='cover-image')
+    writer.add_document('cover_page', 'cover.xhtml', '封面',
+                        f'<div class="cover"><img src="cover{ext}" alt="封面"/></div>', in_toc=False)
+
+def chapter_id(index: int) -> str:
+    # 使用全书的章节序号，各卷之间、追加前后都不会重复
+    return f'chapter_{index:04d}'
+
+class EpubChapter(NamedTuple):
+    """已生成的EPUB中的一章"""
+    index: int
+    title: str
+    href: str
+    size: int  # XHTML 的字节数，追加时用于估算分卷大小
+    volume: str  # 所在的EPUB文件
+
+def read_epub_chapters(epub_path: str) -> List[EpubChapter]:
+    """读取本工具生成的EPUB中的章节（按阅读顺序）"""
+    chapters = []
+    with zipfile.ZipFile(epub_path) as epub:
+        _, items = read_package(epub)
+        for item in items:
+            if item.in_spine and item.id.startswith('chapter_') and item.id[len('chapter_'):].isdigit():
+                chapters.append(EpubChapter(int(item.id[len('chapter_'):]), item.title or '', item.href,
+                                            epub.getinfo(f'EPUB/{item.href}').file_size, epub_path))
+    return chapters
+
+def add_rendered(writer: EpubWriter, chapter: RenderedChapter) -> None:
+    item_id = chapter_id(chapter.entry.index)
+    writer.add_document(item_id, f'{item_id}.xhtml', chapter.title, chapter.body)
+
+def add_chapter(writer: EpubWriter, entry: IndexEntry, content: bytes) -> None:
+    add_rendered(writer, RenderedChapter(entry, *render_chapter(content)))
+
+def build_volume(save_dir: str, book_info: Dict, entries: List[IndexEntry], epub_path: str,
+                 volume: int = 1, volume_count: int = 1, compression: str = EPUB_COMPRESSION,
+                 level: int = EPUB_COMPRESS_LEVEL, cover: Optional[str] = None) -> str:
+    """生成一卷EPUB（在子进程中运行时各卷互不影响），返回文件路径
+
+    章节逐个读取并写入 zip，内存占用与卷的大小无关
+    """
+    writer = open_volume(epub_path, book_info, volume, volume_count, compression, level, cover)
+    try:
+        for entry in entries:
+            add_chapter(writer, entry, read_chapter_bytes(os.path.join(save_dir, entry.file)))
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
 
 class EpubOutput(BaseOutput):
+    """EPUB格式输出，章节较多时可按章节数或大小分卷
+
+    卷数不少于进程数时各卷在不同进程中同时生成；否则章节在进程池中分批渲染，
+    主进程按阅读顺序写入 zip。
+    """
+
+    def __init__(self, save_dir: str, book_info: Dict, chapters=None, index=None,
+                 volume_chapters: int = EPUB_VOLUME_CHAPTERS, volume_mb: float = EPUB_VOLUME_MB,
+                 workers: Optional[int] = EPUB_BUILD_WORKERS, compression: str = EPUB_COMPRESSION,
+                 level: int = EPUB_COMPRESS_LEVEL):
+        super().__init__(save_dir, book_info, chapters, index)
+        self.volume_chapters = volume_chapters
+        self.volume_bytes = int(volume_mb * 1024 * 1024)
+        self.workers = workers
+        self.compression = compression
+        self.level = level
+        self.cover = find_cover(save_dir)  # 下载时保存在小说目录中的封面
+
+    def volume_path(self, volume: int, volume_count: int) -> str:
+        title = self.book_info.get("title", "novel")
+        if volume_count == 1:
+            return os.path.join(self.save_dir, f'{title}.epub')
+        return os.path.join(self.save_dir, f'{title}_第{volume}卷.epub')
+
+    def split(self, entries: List[IndexEntry]) -> List[List[IndexEntry]]:
+        return split_volumes(entries, self.volume_chapters, self.volume_bytes) or [[]]
+
+    def write_volumes(self, entries: List[IndexEntry]) -> List[str]:
+        """分卷生成EPUB，返回生成的文件路径"""
+        volumes = self.split(entries)
+        count = len(volumes)
+        jobs = [(self.save_dir, self.book_info, volume, self.volume_path(number, count), number, count,
+                 self.compression, self.level, self.cover)
+                for number, volume in enumerate(volumes, 1)]
+
+        workers = self.workers or os.cpu_count() or 1
+        if count > 1 and count >= workers:
+            # 各卷相互独立，在多个进程中同时生成
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(build_volume, *job) for job in jobs]
+                paths = [future.result() for future in futures]
+        else:
+            # 卷数少于进程数（通常只有一卷），改为多进程渲染章节
+            with ChapterRenderer(workers) as renderer:
+                paths = [self._write_volume(renderer, volume, job) for volume, job in zip(volumes, jobs)]
+        if count > 1:
+            logging.info(f"EPUB已分为 {count} 卷")
+        return paths
+
+    def existing_volumes(self) -> List[str]:
+        """已生成的EPUB文件：不分卷时为完整文件，分卷时为按卷号排列的各卷"""
+        path = self.volume_path(1, 1)
+        if os.path.exists(path):
+            return [path]
+        volumes = []
+        while os.path.exists(self.volume_path(len(volumes) + 1, 2)):
+            volumes.append(self.volume_path(len(volumes) + 1, 2))
+        return volumes
+
+    def _write_volume(self, renderer: ChapterRenderer, entries: List[IndexEntry], job: tuple) -> str:
+        _, _, _, epub_path, volume, count, compression, level, cover = job
+        writer = open_volume(epub_path, self.book_info, volume, count, compression, level, cover)
+        return self._write_chapters(writer, renderer, entries)
+
+    def _write_chapters(self, writer: EpubWriter, renderer: ChapterRenderer,
+                        entries: List[IndexEntry]) -> str:
+        """渲染章节并按顺序写入，完成后关闭"""
+        try:
+            for entry in entries:
+                for chapter in renderer.feed(entry, read_chapter_bytes(self.chapter_path(entry))):
+                    add_rendered(writer, chapter)
+            for chapter in renderer.flush():
+                add_rendered(writer, chapter)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.close()
+
     def convert(self) -> bool:
         try:
-            # 创建epub书籍
-            book = epub.EpubBook()
-
-            # 设置书籍元数据
-            book.set_identifier(f'novel_{self.book_info.get("title", "unknown")}')
-            book.set_title(self.book_info.get('title', 'Unknown Title'))
-            book.set_language('zh-CN')
-            book.add_author(self.book_info.get('author', 'Unknown Author'))
-
-            # 添加简介
-            intro_content = self.book_info.get('intro', '')
-            intro = epub.EpubHtml(title='简介', file_name='intro.xhtml', lang='zh-CN')
-            intro.content = f'<html><body><h1>简介</h1><p>{intro_content}</p></body></html>'
-            book.add_item(intro)
-
-            # 获取所有章节文件并排序
-            chapter_files = glob.glob(os.path.join(self.save_dir, '[0-9]*.txt'))
-            chapter_files.sort(key=lambda x: get_chapter_number(x) or 0)
-
-            # 创建章节列表
-            chapters = []
-            spine = ['nav', intro]
-            toc = [epub.Link('intro.xhtml', '简介', 'intro')]
-
-            # 处理每个章节
-            for i, file_path in enumerate(chapter_files):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-
-                # 分离章节标题和内容
-                title = content.split('\n')[0]
-                text = content.split('='*40)[1].strip()
-
-                # 创建章节
-                chapter = epub.EpubHtml(
-                    title=title,
-                    file_name=f'chapter_{i+1:04d}.xhtml',
-                    lang='zh-CN'
-                )
-
-                formatted_text = text.replace("\n", "</p><p>")
-                chapter.content = (
-                    f'<html><body>'
-                    f'<h1>{title}</h1>'
-                    f'<p>{formatted_text}</p>'
-                    f'</body></html>'
-                )
-
-                book.add_item(chapter)
-                chapters.append(chapter)
-                spine.append(chapter)
-                toc.append(
-                    epub.Link(f'chapter_{i+1:04d}.xhtml', title, f'chapter_{i+1:04d}')
-                )
-
-            # 添加导航信息
-            book.toc = toc
-            book.spine = spine
-            book.add_item(epub.EpubNcx())
-            book.add_item(epub.EpubNav())
-
-            # 添加默认CSS样式
-            style = '''
-                @namespace epub "http://www.idpf.org/2007/ops";
-                body { font-family: SimSun, serif; }
-                h1 { text-align: center; padding: 10px; }
-                p { text-indent: 2em; line-height: 1.5; margin: 0.5em 0; }
-            '''
-            nav_css = epub.EpubItem(
-                uid="style_nav",
-                file_name="style/nav.css",
-                media_type="text/css",
-                content=style
-            )
-            book.add_item(nav_css)
-
-            # 生成epub文件
-            epub_path = os.path.join(self.save_dir, f'{self.book_info.get("title", "novel")}.epub')
-            epub.write_epub(epub_path, book, {})
-
-            # 删除原始章节文件
-            for file_path in chapter_files:
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    logging.error(f"删除章节文件 {file_path} 时出错: {str(e)}")
+            # 获取所有章节，分卷生成
+            entries = self.get_chapter_entries()
+            self.write_volumes(entries)
+
+            # 全部卷生成后再删除原始章节文件
+            self.remove_chapter_files([self.chapter_path(entry) for entry in entries])
 
             return True
 
         except Exception as e:
             logging.error(f"生成epub文件失败: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+
+    def append(self) -> bool:
+        """把新下载的章节追加到已生成的EPUB末尾，已在EPUB中的章节跳过
+
+        最后一卷达到分卷上限后新开一卷；新章节排在已有章节之前或之间时，
+        把已有章节和新章节按序号合并后整本重新生成。还没有生成过EPUB时生成完整的EPUB。
+        """
+        volumes = self.existing_volumes()
+        if not volumes:
+            return self.convert()
+        try:
+            entries = self.get_chapter_entries()
+            existing = [chapter for path in volumes for chapter in read_epub_chapters(path)]
+            present = {chapter.index for chapter in existing}
+            new_entries = [entry for entry in entries if entry.index not in present]
+            last = max(present, default=0)
+            if any(entry.index < last for entry in new_entries):
+                logging.info("新章节位于已有章节之前，合并后重新生成EPUB")
+                paths = self._rebuild(volumes, existing, new_entries)
+            else:
+                paths = self._append_in_order(volumes, existing, new_entries)
+            logging.info(f"已向EPUB追加 {len(new_entries)} 章（{'、'.join(os.path.basename(p) for p in paths)}）")
+
+            # 追加完成后删除原始章节文件
+            self.remove_chapter_files([self.chapter_path(entry) for entry in entries])
+
+            return True
+
+        except Exception as e:
+            logging.error(f"追加epub章节失败: {str(e)}")
+            return False
+
+    def _append_in_order(self, volumes: List[str], existing: List[EpubChapter],
+                         new_entries: List[IndexEntry]) -> List[str]:
+        """新章节都在已有章节之后：最后一卷放得下的直接追加，其余按分卷上限新开分卷"""
+        last_path = volumes[-1]
+        in_last = [IndexEntry(c.index, c.title, c.href, c.size) for c in existing if c.volume == last_path]
+        known = {entry.index for entry in in_last}
+        groups = self.split(in_last + new_entries)
+        # 与最后一卷已有章节分在同一组的新章节追加到最后一卷，之后的每组新开一卷
+        first = max((i for i, group in enumerate(groups) if any(e.index in known for e in group)), default=0)
+        groups = [[e for e in groups[first] if e.index not in known]] + groups[first + 1:]
+        count = len(volumes) + len(groups) - 1
+
+        paths = []
+        with ChapterRenderer(self.workers) as renderer:
+            writer = EpubWriter.append(last_path, self.compression, self.level)
+            if count > 1 and len(volumes) == 1:
+                # 原来没有分卷：完整文件改为第一卷
+                writer.metadata = volume_metadata(self.book_info, 1, count)
+                writer.path = self.volume_path(1, count)
+            paths.append(self._write_chapters(writer, renderer, groups[0]))
+            if writer.path != last_path:
+                os.remove(last_path)
+            for number, group in enumerate(groups[1:], len(volumes) + 1):
+                writer = open_volume(self.volume_path(number, count), self.book_info, number, count,
+                                     self.compression, self.level, self.cover)
+                paths.append(self._write_chapters(writer, renderer, group))
+        return paths
+
+    def _rebuild(self, volumes: List[str], existing: List[EpubChapter],
+                 new_entries: List[IndexEntry]) -> List[str]:
+        """把已生成的EPUB中的章节和新章节按序号合并，重新分卷生成
+
+        已有章节直接复制原来的 XHTML，不需要它们的章节文件
+        """
+        old = {chapter.index: chapter for chapter in existing}
+        merged = sorted([IndexEntry(c.index, c.title, c.href, c.size) for c in existing] + new_entries,
+                        key=lambda e: e.index)
+        groups = self.split(merged)
+        count = len(groups)
+
+        # 原文件先改名保留，从中复制已有章节，全部生成后再删除；出错时恢复
+        backups = {path: f'{path}.old' for path in volumes}
+        for path, backup in backups.items():
+            os.replace(path, backup)
+        sources: Dict[str, zipfile.ZipFile] = {}
+        paths: List[str] = []
+        try:
+            for path, backup in backups.items():
+                sources[path] = zipfile.ZipFile(backup)
+            for number, group in enumerate(groups, 1):
+                writer = open_volume(self.volume_path(number, count), self.book_info, number, count,
+                                     self.compression, self.level, self.cover)
+                try:
+                    for entry in group:
+                        chapter = old.get(entry.index)
+                        if chapter:
+                            writer.add_xhtml(chapter_id(entry.index), chapter.href, chapter.title,
+                                             sources[chapter.volume].read(f'EPUB/{chapter.href}'))
+                        else:
+                            add_chapter(writer, entry, read_chapter_bytes(self.chapter_path(entry)))
+                except BaseException:
+                    writer.abort()
+                    raise
+                paths.append(writer.close())
+        except BaseException:
+            for source in sources.values():
+                source.close()
+            for path in paths:
+                os.remove(path)
+            for path, backup in backups.items():
+                os.replace(backup, path)
+            raise
+        for source in sources.values():
+            source.close()
+        for backup in backups.values():
+            os.remove(backup)
+        return paths
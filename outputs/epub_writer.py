@@ -0,0 +1,252 @@
+import os
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from html import escape
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from config import EPUB_COMPRESSION, EPUB_COMPRESS_LEVEL
+from utils.helpers import copy_file_range
+
+CONTAINER_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="EPUB/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+'''
+
+STYLE_FILE = 'style/nav.css'
+COMPRESSION = {'deflate': zipfile.ZIP_DEFLATED, 'store': zipfile.ZIP_STORED}
+# close 时生成的文件，总是位于 zip 的末尾
+GENERATED = ('EPUB/nav.xhtml', 'EPUB/toc.ncx', 'EPUB/content.opf')
+NAMESPACES = {
+    'opf': 'http://www.idpf.org/2007/opf',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'xhtml': 'http://www.w3.org/1999/xhtml',
+}
+
+def xhtml_head(title: str) -> str:
+    """XHTML 文档开头（到 <body> 之前），title 为纯文本"""
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+        'lang="zh-CN" xml:lang="zh-CN">\n'
+        f'<head><title>{escape(title)}</title>'
+        f'<link href="{STYLE_FILE}" rel="stylesheet" type="text/css"/></head>\n'
+    )
+
+def xhtml_document(title: str, body: str) -> str:
+    """生成完整的 XHTML 文档，body 为已转义的 HTML"""
+    return f'{xhtml_head(title)}<body>{body}</body>\n</html>\n'
+
+class ManifestItem(NamedTuple):
+    id: str
+    href: str  # 相对于 EPUB 目录
+    media_type: str
+    title: Optional[str] = None  # 出现在目录中的标题，None 表示不进目录
+    in_spine: bool = True
+    properties: Optional[str] = None
+
+def read_package(epub: zipfile.ZipFile) -> Tuple[Dict[str, str], List[ManifestItem]]:
+    """从本工具生成的EPUB中读取元数据和清单，目录标题取自 nav.xhtml"""
+    package = ET.fromstring(epub.read('EPUB/content.opf'))
+    metadata = {
+        'identifier': package.findtext('opf:metadata/dc:identifier', '', NAMESPACES),
+        'title': package.findtext('opf:metadata/dc:title', '', NAMESPACES),
+        'author': package.findtext('opf:metadata/dc:creator', '', NAMESPACES),
+    }
+    for meta in package.iterfind('opf:metadata/opf:meta', NAMESPACES):
+        if meta.get('name') == 'calibre:series':
+            metadata['series'] = meta.get('content', '')
+        elif meta.get('name') == 'calibre:series_index':
+            metadata['series_index'] = meta.get('content', '1')
+
+    nav = ET.fromstring(epub.read('EPUB/nav.xhtml'))
+    titles = {link.get('href'): ''.join(link.itertext())
+              for link in nav.iter(f'{{{NAMESPACES["xhtml"]}}}a')}
+    spine = {ref.get('idref') for ref in package.iterfind('opf:spine/opf:itemref', NAMESPACES)}
+    items = []
+    for item in package.iterfind('opf:manifest/opf:item', NAMESPACES):
+        item_id, href = item.get('id'), item.get('href')
+        if item_id in ('nav', 'ncx'):
+            continue
+        items.append(ManifestItem(item_id, href, item.get('media-type'), titles.get(href),
+                                  item_id in spine, item.get('properties')))
+    return metadata, items
+
+class EpubWriter:
+    """流式写入 EPUB：每个文档生成后立即压缩写入 zip，内存中只保留清单和目录信息
+
+    先写入临时文件，close 时写入导航、目录和 content.opf 后再重命名为目标文件。
+    compression 为 'deflate' 或 'store'（不压缩，生成最快）。
+    """
+
+    def __init__(self, path: str, metadata: Dict[str, str], style: str = '',
+                 compression: str = EPUB_COMPRESSION, level: int = EPUB_COMPRESS_LEVEL):
+        self._open(path, metadata, [], 'w', compression, level)
+        # mimetype 必须是第一个文件且不压缩
+        self.zip.writestr(zipfile.ZipInfo('mimetype', time.localtime()[:6]), 'application/epub+zip',
+                          compress_type=zipfile.ZIP_STORED)
+        self.zip.writestr('META-INF/container.xml', CONTAINER_XML)
+        self.add_item('style_nav', STYLE_FILE, style.encode('utf-8'), 'text/css')
+
+    def _open(self, path: str, metadata: Dict[str, str], items: List[ManifestItem], mode: str,
+              compression: str, level: int) -> None:
+        if compression not in COMPRESSION:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.path = path
+        self.tmp_path = f'{path}.tmp'
+        self.metadata = metadata  # identifier / title / author，可选 series / series_index
+        self.items = items
+        compress_type = COMPRESSION[compression]
+        self.zip = zipfile.ZipFile(
+            self.tmp_path, mode, compress_type,
+            compresslevel=level if compress_type == zipfile.ZIP_DEFLATED else None
+        )
+
+    @classmethod
+    def append(cls, path: str, compression: str = EPUB_COMPRESSION,
+               level: int = EPUB_COMPRESS_LEVEL) -> 'EpubWriter':
+        """打开本工具生成的EPUB，继续在阅读顺序末尾添加文档
+
+        已有的文件按原始字节复制到临时文件（不解压、不重新压缩），只去掉末尾的导航、目录和
+        content.opf，close 时按新的清单重新生成，耗时只与新增的文档数有关。
+        """
+        with zipfile.ZipFile(path) as source:
+            metadata, items = read_package(source)
+            members = source.infolist()
+        generated = [info.header_offset for info in members if info.filename in GENERATED]
+        kept = [info.header_offset for info in members if info.filename not in GENERATED]
+        if len(generated) != len(GENERATED) or (kept and max(kept) > min(generated)):
+            raise ValueError(f"{os.path.basename(path)} 不是本工具生成的EPUB，无法追加")
+
+        writer = cls.__new__(cls)
+        tmp_path = f'{path}.tmp'
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            copy_file_range(src, dst, 0, os.path.getsize(path))
+        try:
+            writer._open(path, metadata, items, 'a', compression, level)
+            # 追加模式从 start_dir（原中央目录）处写入：改为从导航等文件处开始覆盖，
+            # 并从文件列表中去掉它们，关闭时写入的中央目录只包含保留的文件
+            zip_file = writer.zip
+            zip_file.start_dir = min(generated)
+            zip_file.filelist = [info for info in zip_file.filelist if info.filename not in GENERATED]
+            for name in GENERATED:
+                del zip_file.NameToInfo[name]
+        except BaseException:
+            if hasattr(writer, 'zip'):
+                writer.abort()
+            else:
+                os.remove(tmp_path)
+            raise
+        return writer
+
+    def add_item(self, item_id: str, href: str, data: bytes, media_type: str,
+                 properties: Optional[str] = None) -> None:
+        """添加不在阅读顺序中的资源（样式、图片等），图片已经压缩过，直接存储"""
+        compress_type = zipfile.ZIP_STORED if media_type.startswith('image/') else None
+        self.zip.writestr(f'EPUB/{href}', data, compress_type=compress_type)
+        self.items.append(ManifestItem(item_id, href, media_type, None, False, properties))
+
+    def add_document(self, item_id: str, href: str, title: str, body: str, in_toc: bool = True) -> None:
+        """添加一个 XHTML 文档并加入阅读顺序，body 为已转义的 HTML"""
+        self.add_xhtml(item_id, href, title, xhtml_document(title, body).encode('utf-8'), in_toc)
+
+    def add_xhtml(self, item_id: str, href: str, title: str, data: bytes, in_toc: bool = True) -> None:
+        """添加已生成的完整 XHTML 文档（如从其他EPUB中复制的章节）并加入阅读顺序"""
+        self.zip.writestr(f'EPUB/{href}', data)
+        self.items.append(ManifestItem(item_id, href, 'application/xhtml+xml',
+                                       title if in_toc else None))
+
+    def close(self) -> str:
+        """写入导航、目录和 content.opf，完成文件"""
+        try:
+            self._write_nav()
+            self._write_ncx()
+            self._write_opf()
+            self.zip.close()
+        except BaseException:
+            self.abort()
+            raise
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        """放弃写入，删除临时文件"""
+        try:
+            self.zip.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    @property
+    def toc(self) -> List[ManifestItem]:
+        return [item for item in self.items if item.title is not None]
+
+    def _write_nav(self) -> None:
+        with self.zip.open('EPUB/nav.xhtml', 'w') as f:
+            f.write(xhtml_head(self.metadata['title']).encode('utf-8'))
+            f.write(f'<body><nav epub:type="toc" id="toc"><h2>{escape(self.metadata["title"])}</h2><ol>'
+                    .encode('utf-8'))
+            for item in self.toc:
+                f.write(f'<li><a href="{item.href}">{escape(item.title)}</a></li>'.encode('utf-8'))
+            f.write(b'</ol></nav></body>\n</html>\n')
+
+    def _write_ncx(self) -> None:
+        """EPUB 2 目录，兼容较旧的阅读器"""
+        with self.zip.open('EPUB/toc.ncx', 'w') as f:
+            f.write((
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+                f'<head><meta content="{escape(self.metadata["identifier"])}" name="dtb:uid"/>'
+                '<meta content="1" name="dtb:depth"/></head>\n'
+                f'<docTitle><text>{escape(self.metadata["title"])}</text></docTitle>\n<navMap>\n'
+            ).encode('utf-8'))
+            for order, item in enumerate(self.toc, 1):
+                f.write((
+                    f'<navPoint id="{item.id}" playOrder="{order}"><navLabel><text>{escape(item.title)}'
+                    f'</text></navLabel><content src="{item.href}"/></navPoint>\n'
+                ).encode('utf-8'))
+            f.write(b'</navMap>\n</ncx>\n')
+
+    def _write_opf(self) -> None:
+        meta = self.metadata
+        modified = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        series = ''
+        cover = next((item for item in self.items if item.properties == 'cover-image'), None)
+        if cover:
+            # EPUB 2 阅读器通过这一项找到封面
+            series = f'<meta name="cover" content="{cover.id}"/>\n'
+        if meta.get('series'):
+            # 阅读器按系列和序号把分卷归在一起
+            series += (f'<meta name="calibre:series" content="{escape(meta["series"])}"/>\n'
+                      f'<meta name="calibre:series_index" content="{meta.get("series_index", 1)}"/>\n')
+        with self.zip.open('EPUB/content.opf', 'w') as f:
+            f.write((
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id" '
+                'xml:lang="zh-CN">\n'
+                '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">\n'
+                f'<dc:identifier id="id">{escape(meta["identifier"])}</dc:identifier>\n'
+                f'<dc:title>{escape(meta["title"])}</dc:title>\n'
+                '<dc:language>zh-CN</dc:language>\n'
+                f'<dc:creator id="creator">{escape(meta.get("author", ""))}</dc:creator>\n'
+                f'<meta property="dcterms:modified">{modified}</meta>\n'
+                f'{series}'
+                '</metadata>\n<manifest>\n'
+                '<item href="nav.xhtml" id="nav" media-type="application/xhtml+xml" properties="nav"/>\n'
+                '<item href="toc.ncx" id="ncx" media-type="application/x-dtbncx+xml"/>\n'
+            ).encode('utf-8'))
+            for item in self.items:
+                properties = f' properties="{item.properties}"' if item.properties else ''
+                f.write(f'<item href="{item.href}" id="{item.id}" media-type="{item.media_type}"{properties}/>\n'
+                        .encode('utf-8'))
+            f.write(b'</manifest>\n<spine toc="ncx">\n<itemref idref="nav"/>\n')
+            for item in self.items:
+                if item.in_spine:
+                    f.write(f'<itemref idref="{item.id}"/>\n'.encode('utf-8'))
+            f.write(b'</spine>\n</package>\n')
@@ -0,0 +1,127 @@
+"""按偏移索引读取合并后的TXT
+
+合并TXT旁边的 .idx.json 记录了每章的字节偏移，用内存映射直接截取任意章节范围，
+耗时只与截取的大小有关，章节文件删除后也能导出部分章节。
+
+用法:
+    python -m outputs.merged_txt 完整版.txt 起始章节 [结束章节]
+"""
+import os
+import sys
+import json
+import mmap
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from utils.helpers import write_all
+from config import MERGED_INDEX_SUFFIX
+
+class MergedChapter(NamedTuple):
+    index: int
+    title: str
+    offset: int
+    length: int
+
+class MergedTxt:
+    """带偏移索引的合并TXT文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + MERGED_INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.book_info: Dict = data.get('book', {})
+        self.chapters: List[MergedChapter] = [MergedChapter(*item) for item in data['chapters']]
+        self._numbers = [chapter.index for chapter in self.chapters]
+        self._file = open(path, 'rb')
+        try:
+            if os.fstat(self._file.fileno()).st_size != data['size']:
+                raise ValueError(f"偏移索引与文件不一致（文件已被修改）: {path}")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+
+    @classmethod
+    def open(cls, path: str) -> Optional['MergedTxt']:
+        """打开合并TXT，没有偏移索引或索引已失效时返回 None"""
+        if not os.path.exists(path + MERGED_INDEX_SUFFIX):
+            return None
+        try:
+            return cls(path)
+        except Exception as e:
+            logging.error(f"读取合并TXT的偏移索引失败: {str(e)}")
+            return None
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'MergedTxt':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _span(self, start_index: int, end_index: int) -> Optional[Tuple[int, int]]:
+        """范围内第一章和最后一章在章节列表中的位置"""
+        first = bisect_left(self._numbers, start_index)
+        last = bisect_right(self._numbers, end_index) - 1
+        if first > last:
+            return None
+        return first, last
+
+    def chapter(self, index: int) -> Optional[str]:
+        """读取单章正文（含标题行）"""
+        span = self._span(index, index)
+        if span is None:
+            return None
+        chapter = self.chapters[span[0]]
+        return self._map[chapter.offset:chapter.offset + chapter.length].decode('utf-8')
+
+    def read_range(self, start_index: int, end_index: int) -> Optional[memoryview]:
+        """返回范围内章节（含章节之间的分隔）在文件中的连续字节，不复制数据"""
+        span = self._span(start_index, end_index)
+        if span is None:
+            return None
+        first, last = self.chapters[span[0]], self.chapters[span[1]]
+        # 每章之后紧跟一个分隔，下一章的偏移即为本章分隔的结尾
+        end = self.chapters[span[1] + 1].offset if span[1] + 1 < len(self.chapters) else len(self._map)
+        return memoryview(self._map)[first.offset:end]
+
+    def export(self, start_index: int, end_index: int, output_path: str) -> bool:
+        """导出章节范围，格式与从章节文件合并（merge_chapters）相同"""
+        from outputs.txt_output import book_header, range_line
+
+        data = self.read_range(start_index, end_index)
+        if data is None:
+            logging.error("指定范围内没有找到任何章节")
+            return False
+        try:
+            with open(output_path, 'wb', buffering=0) as f:
+                write_all(f, book_header(self.book_info, range_line(start_index, end_index)).encode('utf-8'))
+                write_all(f, data)
+        finally:
+            data.release()
+        return True
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (2, 3) or not all(arg.isdigit() for arg in argv[1:]):
+        print(__doc__.strip().splitlines()[-1].strip(), file=sys.stderr)
+        return 2
+    path, start_index = argv[0], int(argv[1])
+    end_index = int(argv[2]) if len(argv) == 3 else start_index
+    merged = MergedTxt.open(path)
+    if merged is None:
+        print(f"没有可用的偏移索引: {path}{MERGED_INDEX_SUFFIX}", file=sys.stderr)
+        return 1
+    with merged:
+        title = merged.book_info.get('title') or 'novel'
+        output_path = os.path.join(os.path.dirname(path), f'{title}_{start_index}-{end_index}.txt')
+        if not merged.export(start_index, end_index, output_path):
+            return 1
+    print(output_path)
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
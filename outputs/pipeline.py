@@ -0,0 +1,271 @@
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+from queue import Queue
+from threading import Thread
+from typing import Dict, List, Optional, Sequence
+from core.chapter_index import ChapterIndex, IndexEntry
+from outputs.base import BaseOutput, read_chapter_bytes, split_chapter
+from outputs.txt_output import MergedTxtWriter, book_header, range_line
+from config import OUTPUT_FORMATS, OUTPUT_QUEUE_SIZE
+
+class OutputSink(ABC):
+    """输出管道中的一种格式：逐章接收内容，全部写完后提交"""
+
+    def __init__(self, save_dir: str, book_info: Dict, range_text: str):
+        self.save_dir = save_dir
+        self.book_info = book_info
+        self.range_text = range_text  # 完整版为 '_完整版'，部分章节为 '_起始-结束'
+
+    def output_path(self, suffix: str) -> str:
+        return os.path.join(self.save_dir, f'{self.book_info.get("title", "novel")}{self.range_text}{suffix}')
+
+    @abstractmethod
+    def open(self, header: str, entries: List[IndexEntry]) -> None:
+        """开始写入，entries 为将要写入的全部章节"""
+        pass
+
+    @abstractmethod
+    def write(self, entry: IndexEntry, content: bytes) -> None:
+        """写入一章（章节文件去掉首尾空白后的字节）"""
+        pass
+
+    @abstractmethod
+    def close(self) -> List[str]:
+        """提交输出，返回生成的文件"""
+        pass
+
+    def abort(self) -> None:
+        """出错时清理未完成的文件"""
+        pass
+
+class TxtSink(OutputSink):
+    """合并TXT（含偏移索引）"""
+
+    def open(self, header: str, entries: List[IndexEntry]) -> None:
+        self.writer = MergedTxtWriter(self.output_path('.txt'), header, self.book_info)
+
+    def write(self, entry: IndexEntry, content: bytes) -> None:
+        self.writer.add(entry, content)
+
+    def close(self) -> List[str]:
+        return [self.writer.close()]
+
+    def abort(self) -> None:
+        if hasattr(self, 'writer'):
+            self.writer.abort()
+
+class CompressedTxtSink(TxtSink):
+    """压缩TXT（txt.gz / txt.bz2 / txt.xz）"""
+
+    def __init__(self, save_dir: str, book_info: Dict, range_text: str, codec: str):
+        super().__init__(save_dir, book_info, range_text)
+        self.codec = codec
+
+    def open(self, header: str, entries: List[IndexEntry]) -> None:
+        from outputs.compressed_txt import CompressedTxtWriter
+        self.writer = CompressedTxtWriter(self.output_path(f'.txt.{self.codec}'), header,
+                                          self.book_info, self.codec)
+
+class JsonlSink(OutputSink):
+    """每行一章的 JSON：{"index", "title", "content"}，便于导入其他工具"""
+
+    def open(self, header: str, entries: List[IndexEntry]) -> None:
+        self.path = self.output_path('.jsonl')
+        self.file = open(self.path, 'w', encoding='utf-8')
+
+    def write(self, entry: IndexEntry, content: bytes) -> None:
+        title, text = split_chapter(content.decode('utf-8'))
+        record = {'index': entry.index, 'title': title, 'content': text}
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self) -> List[str]:
+        self.file.close()
+        return [self.path]
+
+    def abort(self) -> None:
+        if hasattr(self, 'file'):
+            self.file.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+class EpubSink(OutputSink):
+    """EPUB：章节在进程池中渲染后按顺序写入当前分卷，内存中只保留目录信息"""
+
+    def open(self, header: str, entries: List[IndexEntry]) -> None:
+        # EPUB 相关模块只在需要时导入
+        from outputs.epub_output import ChapterRenderer, EpubOutput
+        self.output = EpubOutput(self.save_dir, self.book_info, index=ChapterIndex(self.save_dir, entries))
+        volumes = self.output.split(entries)
+        self.volume_count = len(volumes)
+        self.volumes = {entry.index: number for number, volume in enumerate(volumes, 1) for entry in volume}
+        self.volume = 0
+        self.writer = None
+        self.paths: List[str] = []
+        self.renderer = ChapterRenderer(self.output.workers).__enter__()
+
+    def _open_volume(self, number: int) -> None:
+        from outputs.epub_output import open_volume
+        if self.writer:
+            self.paths.append(self.writer.close())
+        self.volume = number
+        path = self.output.volume_path(number, self.volume_count)
+        if self.range_text:
+            # 部分章节的 EPUB 带上范围，不覆盖完整版
+            root, ext = os.path.splitext(path)
+            path = f'{root}{self.range_text}{ext}'
+        self.writer = open_volume(path, self.book_info, number, self.volume_count,
+                                  self.output.compression, self.output.level, self.output.cover)
+
+    def _add(self, chapters) -> None:
+        from outputs.epub_output import add_rendered
+        for chapter in chapters:
+            add_rendered(self.writer, chapter)
+
+    def write(self, entry: IndexEntry, content: bytes) -> None:
+        number = self.volumes.get(entry.index, self.volume or 1)
+        if number != self.volume:
+            # 上一卷的章节渲染完、写入后才切换到新卷
+            self._add(self.renderer.flush())
+            self._open_volume(number)
+        self._add(self.renderer.feed(entry, content))
+
+    def close(self) -> List[str]:
+        if not self.writer:
+            self._open_volume(1)
+        self._add(self.renderer.flush())
+        self.renderer.__exit__(None, None, None)
+        self.paths.append(self.writer.close())
+        self.writer = None
+        return self.paths
+
+    def abort(self) -> None:
+        if getattr(self, 'renderer', None):
+            self.renderer.__exit__(None, None, None)
+        if getattr(self, 'writer', None):
+            self.writer.abort()
+        for path in getattr(self, 'paths', []):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def make_sink(output_format: str, save_dir: str, book_info: Dict, range_text: str) -> OutputSink:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}")
+    if output_format.startswith('txt.'):
+        return CompressedTxtSink(save_dir, book_info, range_text, output_format[len('txt.'):])
+    sinks = {'txt': TxtSink, 'epub': EpubSink, 'jsonl': JsonlSink}
+    return sinks[output_format](save_dir, book_info, range_text)
+
+class _SinkWorker:
+    """每种格式一个线程，通过有界队列接收章节，写得慢的格式会让读取等待"""
+
+    def __init__(self, name: str, sink: OutputSink, header: str, entries: List[IndexEntry],
+                 queue_size: int):
+        self.name = name
+        self.sink = sink
+        self.header = header
+        self.entries = entries
+        self.queue: Queue = Queue(maxsize=queue_size)
+        self.error: Optional[Exception] = None
+        self.paths: List[str] = []
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        try:
+            self.sink.open(self.header, self.entries)
+        except Exception as e:
+            self.error = e
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error:
+                # 出错后继续取出队列中的章节，不阻塞其他格式
+                continue
+            try:
+                self.sink.write(*item)
+            except Exception as e:
+                self.error = e
+        if not self.error:
+            try:
+                self.paths = self.sink.close()
+                return
+            except Exception as e:
+                self.error = e
+        self.sink.abort()
+
+class OutputPipeline(BaseOutput):
+    """一次读取章节、同时生成多种格式
+
+    每个章节文件只读取一次，分发给各格式的写入线程；所有格式都提交成功后才删除章节文件，
+    任一格式失败时保留章节文件，可以重新生成。
+    """
+
+    def __init__(self, save_dir: str, book_info: Dict, chapters=None, index=None,
+                 formats: Sequence[str] = ('txt',), queue_size: int = OUTPUT_QUEUE_SIZE):
+        super().__init__(save_dir, book_info, chapters, index)
+        self.formats = list(dict.fromkeys(formats))
+        self.queue_size = queue_size
+        self.outputs: Dict[str, List[str]] = {}  # 格式 -> 生成的文件
+
+    def convert(self) -> bool:
+        """生成完整版，完成后删除章节文件"""
+        return self._run()
+
+    def merge_chapters(self, start_index: int, end_index: int) -> bool:
+        """生成指定范围的各格式文件，保留章节文件"""
+        return self._run(start_index, end_index)
+
+    def _run(self, start_index: Optional[int] = None, end_index: Optional[int] = None) -> bool:
+        ranged = bool(start_index and end_index)
+        entries = self.get_chapter_entries(start_index, end_index)
+        if not entries:
+            logging.error("没有找到任何章节文件")
+            return False
+
+        range_text = f'_{start_index}-{end_index}' if ranged else '_完整版'
+        header = book_header(self.book_info, range_line(start_index, end_index) if ranged else '')
+        workers = []
+        for output_format in self.formats:
+            # 完整版的 EPUB 和 JSONL 直接以书名命名，与单独生成时相同
+            sink = make_sink(output_format, self.save_dir, self.book_info,
+                             '' if output_format in ('epub', 'jsonl') and not ranged else range_text)
+            workers.append(_SinkWorker(output_format, sink, header, entries, self.queue_size))
+        for worker in workers:
+            worker.thread.start()
+
+        try:
+            for entry in entries:
+                file_path = self.chapter_path(entry)
+                try:
+                    content = read_chapter_bytes(file_path)
+                except Exception as e:
+                    logging.error(f"处理章节文件 {file_path} 时出错: {str(e)}")
+                    continue
+                for worker in workers:
+                    worker.queue.put((entry, content))
+        finally:
+            for worker in workers:
+                worker.queue.put(None)
+            for worker in workers:
+                worker.thread.join()
+
+        failed = False
+        for worker in workers:
+            if worker.error:
+                failed = True
+                logging.error(f"生成 {worker.name} 格式失败: {str(worker.error)}")
+            else:
+                self.outputs[worker.name] = worker.paths
+        if failed:
+            return False
+
+        if not ranged:
+            # 所有格式都已提交，才删除章节文件
+            self.remove_chapter_files([self.chapter_path(entry) for entry in entries])
+        return True
@@ -1,117 +1,241 @@
 import os
-import glob
+import json
 import logging
-from typing import Dict
+from typing import Dict, List
+from core.chapter_index import IndexEntry
 from outputs.base import BaseOutput
-from utils.helpers import get_chapter_number
+from utils.helpers import atomic_write, copy_file_range, stripped_range, write_all
+from config import MERGED_INDEX_SUFFIX
+
+# 章节之间的分隔
+CHAPTER_SEPARATOR = f"\n\n{'='*50}\n\n".encode('utf-8')
+
+def book_header(book_info: Dict, extra: str = '') -> str:
+    """合并文件开头的书籍信息"""
+    return (
+        f"书名：{book_info.get('title', '')}\n"
+        f"作者：{book_info.get('author', '')}\n"
+        f"状态：{book_info.get('status', '')}\n"
+        f"{extra}"
+        f"\n简介：\n{book_info.get('intro', '')}\n"
+        f"\n{'='*50}\n\n"
+    )
+
+def range_line(start_index: int, end_index: int) -> str:
+    return f"章节范围：第{start_index}章 - 第{end_index}章\n"
 
 class TxtOutput(BaseOutput):
     """TXT格式输出处理器"""
-    
+
+    @property
+    def merged_path(self) -> str:
+        return os.path.join(self.save_dir, f'{self.book_info.get("title", "novel")}_完整版.txt')
+
     def convert(self) -> bool:
         """将多个章节文件合并为单个TXT文件"""
         try:
-            # 获取所有章节文件并排序
-            chapter_files = glob.glob(os.path.join(self.save_dir, '[0-9]*.txt'))
-            chapter_files.sort(key=lambda x: get_chapter_number(x) or 0)
-            
-            if not chapter_files:
+            # 获取所有章节（按章节顺序）
+            entries = self.get_chapter_entries()
+
+            if not entries:
                 logging.error("没有找到任何章节文件")
                 return False
-            
-            # 合并后的文件路径
-            output_path = os.path.join(self.save_dir, f'{self.book_info.get("title", "novel")}_完整版.txt')
-            
-            # 写入小说信息
-            with open(output_path, 'w', encoding='utf-8') as outfile:
-                # 写入书籍信息
-                info_text = (
-                    f"书名：{self.book_info.get('title', '')}\n"
-                    f"作者：{self.book_info.get('author', '')}\n"
-                    f"状态：{self.book_info.get('status', '')}\n"
-                    f"\n简介：\n{self.book_info.get('intro', '')}\n"
-                    f"\n{'='*50}\n\n"
-                )
-                outfile.write(info_text)
-                
-                # 合并所有章节
-                for file_path in chapter_files:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as infile:
-                            content = infile.read().strip()
-                            outfile.write(f"{content}\n\n{'='*50}\n\n")
-                    except Exception as e:
-                        logging.error(f"处理章节文件 {file_path} 时出错: {str(e)}")
-                        continue
-            
-            # 删除原始章节文件
-            for file_path in chapter_files:
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    logging.error(f"删除章节文件 {file_path} 时出错: {str(e)}")
-            
+
+            written = self._merge_files(self.merged_path, book_header(self.book_info), entries)
+
+            if len(written) < len(entries):
+                # 有章节没有写入合并文件，保留全部章节文件以便重新生成
+                logging.error(f"{len(entries) - len(written)} 个章节读取失败，已保留章节文件")
+                return False
+
+            # 删除已合并的章节文件
+            self.remove_chapter_files([self.chapter_path(entry) for entry in written])
+
             return True
-            
+
         except Exception as e:
             logging.error(f"生成完整TXT文件失败: {str(e)}")
             return False
 
-    def merge_chapters(self, start_index: int = None, end_index: int = None) -> bool:
-        """合并指定范围的章节"""
+    def append(self, start_index: int, end_index: int) -> bool:
+        """追更：把新下载的章节追加到完整版末尾，不重写已合并的章节
+
+        还没有完整版时生成完整版。完整版没有可用的偏移索引，或新章节排在已有章节之前时，
+        不改动完整版，只把指定范围合并为单独的文件并保留章节文件
+        """
+        if not os.path.exists(self.merged_path):
+            return self.convert()
         try:
-            # 获取所有章节文件并排序
-            chapter_files = glob.glob(os.path.join(self.save_dir, '[0-9]*.txt'))
-            chapter_files.sort(key=lambda x: get_chapter_number(x) or 0)
-            
-            if not chapter_files:
-                logging.error("没有找到任何章节文件")
-                return False
-            
-            # 如果指定了范围，过滤文件列表
-            if start_index is not None and end_index is not None:
-                chapter_files = [f for f in chapter_files 
-                               if start_index <= (get_chapter_number(f) or 0) <= end_index]
-            
-            if not chapter_files:
-                logging.error("指定范围内没有找到任何章节文件")
+            from outputs.merged_txt import MergedTxt
+            merged = MergedTxt.open(self.merged_path)
+            if merged is None:
+                logging.warning("完整版没有可用的偏移索引，新章节另存为单独的文件")
+                return self.merge_chapters(start_index, end_index)
+            with merged:
+                present = {chapter.index for chapter in merged.chapters}
+
+            entries = self.get_chapter_entries()
+            new_entries = [entry for entry in entries if entry.index not in present]
+            if any(entry.index < max(present, default=0) for entry in new_entries):
+                logging.warning("新章节位于完整版已有章节之前，另存为单独的文件")
+                return self.merge_chapters(start_index, end_index)
+
+            writer = MergedTxtWriter.append(self.merged_path, self.book_info)
+            written = self._add_files(writer, new_entries)
+            if len(written) < len(new_entries):
+                logging.error(f"{len(new_entries) - len(written)} 个章节读取失败，已保留章节文件")
                 return False
-            
+            logging.info(f"已向 {os.path.basename(self.merged_path)} 追加 {len(written)} 章")
+
+            # 删除已合并的章节文件
+            self.remove_chapter_files([self.chapter_path(entry) for entry in entries])
+
+            return True
+
+        except Exception as e:
+            logging.error(f"追加TXT章节失败: {str(e)}")
+            return False
+
+    def merge_chapters(self, start_index: int = None, end_index: int = None) -> bool:
+        """合并指定范围的章节
+
+        章节文件已在生成完整版时删除的，从完整版中按偏移索引截取
+        """
+        try:
+            # 获取章节，指定了范围时只取范围内的章节
+            entries = self.get_chapter_entries(start_index, end_index)
+
             # 生成输出文件名
-            range_text = f"_{start_index}-{end_index}" if start_index and end_index else ""
+            ranged = bool(start_index and end_index)
+            range_text = f"_{start_index}-{end_index}" if ranged else ""
             output_path = os.path.join(
-                self.save_dir, 
+                self.save_dir,
                 f'{self.book_info.get("title", "novel")}{range_text}.txt'
             )
-            
-            # 合并文件
-            with open(output_path, 'w', encoding='utf-8') as outfile:
-                # 写入书籍信息
-                info_text = (
-                    f"书名：{self.book_info.get('title', '')}\n"
-                    f"作者：{self.book_info.get('author', '')}\n"
-                    f"状态：{self.book_info.get('status', '')}\n"
-                )
-                if start_index and end_index:
-                    info_text += f"章节范围：第{start_index}章 - 第{end_index}章\n"
-                info_text += (
-                    f"\n简介：\n{self.book_info.get('intro', '')}\n"
-                    f"\n{'='*50}\n\n"
-                )
-                outfile.write(info_text)
-                
-                # 合并所有章节
-                for file_path in chapter_files:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as infile:
-                            content = infile.read().strip()
-                            outfile.write(f"{content}\n\n{'='*50}\n\n")
-                    except Exception as e:
-                        logging.error(f"处理章节文件 {file_path} 时出错: {str(e)}")
-                        continue
-            
+
+            if not entries and ranged:
+                from outputs.merged_txt import MergedTxt
+                merged = MergedTxt.open(self.merged_path)
+                if merged:
+                    with merged:
+                        return merged.export(start_index, end_index, output_path)
+
+            if not entries:
+                logging.error("指定范围内没有找到任何章节文件")
+                return False
+
+            header = book_header(self.book_info, range_line(start_index, end_index) if ranged else '')
+            self._merge_files(output_path, header, entries)
+
             return True
-            
+
         except Exception as e:
             logging.error(f"合并章节失败: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+
+    def _merge_files(self, output_path: str, header: str, entries: List[IndexEntry]) -> List[IndexEntry]:
+        """按字节拼接章节文件，并在同名的 .idx.json 中记录每章的字节偏移，返回实际写入的章节
+
+        章节内容不解码成字符串，去掉首尾空白后直接在内核中复制到输出文件（不支持时大块复制），
+        合并速度只受磁盘读写限制
+        """
+        return self._add_files(MergedTxtWriter(output_path, header, self.book_info), entries)
+
+    def _add_files(self, writer: 'MergedTxtWriter', entries: List[IndexEntry]) -> List[IndexEntry]:
+        """把章节文件逐个写入合并文件并关闭，返回实际写入的章节（读取失败的章节跳过）"""
+        written: List[IndexEntry] = []
+        try:
+            for entry in entries:
+                file_path = self.chapter_path(entry)
+                try:
+                    writer.add_file(entry, file_path)
+                except Exception as e:
+                    logging.error(f"处理章节文件 {file_path} 时出错: {str(e)}")
+                    continue
+                written.append(entry)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        return written
+
+class MergedTxtWriter:
+    """逐章写入合并TXT，关闭时在同名的 .idx.json 中写入每章的字节偏移"""
+
+    def __init__(self, output_path: str, header: str, book_info: Dict):
+        self.output_path = output_path
+        self.book_info = book_info
+        self.chapters: List[list] = []  # [序号, 标题, 偏移, 字节数]
+        header_bytes = header.encode('utf-8')
+        self.header_length = len(header_bytes)
+        self.file = open(output_path, 'wb', buffering=0)
+        write_all(self.file, header_bytes)
+        self.position = self.header_length
+        self.existing = 0  # 追加写入时原文件的大小，放弃写入时截回该大小
+
+    @classmethod
+    def append(cls, output_path: str, book_info: Dict) -> 'MergedTxtWriter':
+        """打开已有的合并TXT，在末尾继续写入章节，已有内容和偏移不变"""
+        with open(output_path + MERGED_INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        file = open(output_path, 'r+b', buffering=0)
+        if os.fstat(file.fileno()).st_size != data['size']:
+            file.close()
+            raise ValueError(f"偏移索引与文件不一致（文件已被修改）: {output_path}")
+        file.seek(data['size'])
+        writer = cls.__new__(cls)
+        writer.output_path = output_path
+        writer.book_info = book_info
+        writer.chapters = data['chapters']
+        writer.header_length = data['header']
+        writer.file = file
+        writer.position = writer.existing = data['size']
+        return writer
+
+    def add(self, entry: IndexEntry, data: bytes) -> None:
+        """追加一章已去掉首尾空白的内容"""
+        self._append(entry, lambda: write_all(self.file, data), len(data))
+
+    def add_file(self, entry: IndexEntry, file_path: str) -> None:
+        """直接从章节文件复制（去掉首尾空白），数据不经过 Python"""
+        offset, length = stripped_range(file_path)
+
+        def copy() -> None:
+            with open(file_path, 'rb') as infile:
+                copy_file_range(infile, self.file, offset, length)
+        self._append(entry, copy, length)
+
+    def _append(self, entry: IndexEntry, write, length: int) -> None:
+        try:
+            write()
+            write_all(self.file, CHAPTER_SEPARATOR)
+        except BaseException:
+            # 去掉写了一半的内容，保证偏移索引准确
+            self.file.truncate(self.position)
+            self.file.seek(self.position)
+            raise
+        self.chapters.append([entry.index, entry.title, self.position, length])
+        self.position += length + len(CHAPTER_SEPARATOR)
+
+    def close(self) -> str:
+        self.file.close()
+        index = {
+            'book': {key: self.book_info.get(key, '') for key in ('title', 'author', 'status', 'intro')},
+            'size': self.position,
+            'header': self.header_length,
+            'chapters': self.chapters,
+        }
+        atomic_write(self.output_path + MERGED_INDEX_SUFFIX, json.dumps(index, ensure_ascii=False))
+        return self.output_path
+
+    def abort(self) -> None:
+        """放弃写入，删除未完成的文件（追加写入时去掉新写入的内容）"""
+        if self.existing:
+            self.file.truncate(self.existing)
+            self.file.close()
+            return
+        self.file.close()
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
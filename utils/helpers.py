@@ -3,8 +3,13 @@ import os
 import logging
 import logging.config
 import sys
-from typing import Optional
-from config import LOG_CONFIG
+import argparse
+import tempfile
+import threading
+import importlib
+import importlib.util
+from typing import BinaryIO, Optional, Tuple, Union
+from config import LOG_CONFIG, OUTPUT_FORMATS
 
 def clean_filename(filename: str) -> str:
     """清理文件名中的非法字符"""
@@ -34,4 +39,164 @@ def ensure_dir(path: str) -> None:
 def get_chapter_number(filename: str) -> Optional[int]:
     """从文件名中提取章节号"""
     match = re.search(r'(\d+)', os.path.basename(filename))
-    return int(match.group(1)) if match else None 
\ No newline at end of file
+    return int(match.group(1)) if match else None
+
+def output_formats_arg(value: str) -> str:
+    """命令行参数：校验输出格式，多种格式用逗号分隔（如 txt,epub）"""
+    formats = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+    if not formats or unknown:
+        raise argparse.ArgumentTypeError(
+            f"不支持的输出格式: {value}（可选 {', '.join(OUTPUT_FORMATS)}，多种格式用逗号分隔）")
+    return ','.join(dict.fromkeys(formats))
+
+# 进程的 umask，只能通过设置来读取，在导入时读取一次
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def atomic_write(path: str, data: Union[str, bytes], fsync: bool = False) -> None:
+    """原子写入文件（先写临时文件再重命名，避免留下半截文件）
+
+    文件权限与直接 open 写入时相同：覆盖已有文件时保留原权限，否则为 0666 去掉 umask
+    """
+    dir_name = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=dir_name)
+    try:
+        # mkstemp 创建的文件权限为 0600
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        if isinstance(data, bytes):
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', encoding='utf-8')
+        with f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class LazyModule:
+    """延迟导入的模块：第一次访问属性时才真正 import
+
+    导入由锁保护，多个线程同时第一次访问时只导入一次，都能拿到完整的模块
+    （importlib.util.LazyLoader 在多线程下会让其他线程看到尚未初始化完的模块）
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        module = self._module or self._load()
+        return getattr(module, attr)
+
+def lazy_import(name: str):
+    """延迟导入模块：第一次访问模块属性时才真正加载
+
+    用于 requests、bs4 等较重的依赖，只做简单操作（如查看状态）时不必加载它们
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"找不到模块: {name}", name=name)
+    return LazyModule(name)
+
+COPY_CHUNK_SIZE = 1 << 20  # 无法在内核中复制时每次读写的字节数
+_WHITESPACE = b' \t\r\n\x0b\x0c'
+
+def stripped_range(path: str, probe: int = 4096) -> Tuple[int, int]:
+    """返回文件去掉首尾 ASCII 空白后的 (起始偏移, 长度)，只读取开头和结尾的少量字节"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(start)
+            block = f.read(probe)
+            skipped = len(block) - len(block.lstrip(_WHITESPACE))
+            start += skipped
+            if skipped < len(block):
+                break
+        end = size
+        while end > start:
+            f.seek(max(start, end - probe))
+            block = f.read(end - max(start, end - probe))
+            skipped = len(block) - len(block.rstrip(_WHITESPACE))
+            end -= skipped
+            if skipped < len(block):
+                break
+    return start, end - start
+
+def copy_file_range(src: BinaryIO, dst: BinaryIO, offset: int, count: int) -> None:
+    """把 src 中 [offset, offset + count) 的字节追加到 dst 的当前位置
+
+    优先使用 copy_file_range / sendfile 在内核中复制，数据不经过 Python；
+    平台不支持时退回到大块缓冲读写。dst 需为无缓冲的文件（open(..., buffering=0)）
+    """
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    end = offset + count
+    for name in ('copy_file_range', 'sendfile'):
+        func = getattr(os, name, None)
+        if func is None:
+            continue
+        try:
+            while offset < end:
+                if name == 'copy_file_range':
+                    sent = func(src_fd, dst_fd, end - offset, offset)
+                else:
+                    sent = func(dst_fd, src_fd, offset, end - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            if offset >= end:
+                return
+        except OSError:
+            # 跨文件系统、文件系统不支持或 sendfile 不接受普通文件时改用下一种方式
+            continue
+    src.seek(offset)
+    remaining = end - offset
+    while remaining > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        write_all(dst, chunk)
+        remaining -= len(chunk)
+
+def write_all(dst: BinaryIO, data: bytes) -> None:
+    """写入全部字节（无缓冲文件的 write 可能只写入一部分）"""
+    view = memoryview(data)
+    while view:
+        view = view[dst.write(view):]
+
+# 图片文件头 -> (媒体类型, 扩展名)
+_IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+    (b'GIF87a', 'image/gif', '.gif'),
+    (b'GIF89a', 'image/gif', '.gif'),
+)
+
+def image_type(data: bytes) -> Optional[Tuple[str, str]]:
+    """按文件头识别图片，返回 (媒体类型, 扩展名)，不是图片（如出错时返回的网页）时返回 None"""
+    for signature, media_type, ext in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return media_type, ext
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp', '.webp'
+    return None